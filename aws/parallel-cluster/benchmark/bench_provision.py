@@ -0,0 +1,830 @@
+#!/usr/bin/env python3
+
+"""
+Offline provisioning benchmark for scripts/weka-install.py.
+
+Starts a stub IMDS and a stub EC2 endpoint (with per-call latency and account-wide
+throttling) in this process, puts fake systemctl/mountpoint/weka binaries first on PATH,
+and boots N simulated nodes concurrently. Each node runs weka-install.py in its own
+process against a private root directory, so nothing on the host is touched and no root
+is needed. Reports boot-to-mount percentiles, per-phase timings and EC2/IMDS calls per
+node; --output and --compare make runs comparable across commits.
+
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INSTALLER = os.path.join(HERE, "..", "scripts", "weka-install.py")
+INSTALLER_ASSETS = ("weka_exporter.py", "weka_cpuset.sh")
+
+REGION = "us-east-1"
+SUBNET_ID = "subnet-bench"
+SECURITY_GROUP = "sg-bench"
+EC2_XMLNS = "http://ec2.amazonaws.com/doc/2016-11-15/"
+RESULT_PREFIX = "BENCH-RESULT "
+
+FAKE_BIN = {
+    # weka-mount@ is a oneshot unit, so `systemctl enable --now` returns once the mount is done
+    # (unless --no-block, as with --async-mount)
+    "systemctl": """#!/bin/bash
+case "$*" in
+  *--no-block*) ;;
+  *weka-mount@*) sleep "${BENCH_MOUNT_DELAY_S:-0}" ;;
+esac
+exit 0
+""",
+    "mountpoint": "#!/bin/bash\nexit 1\n",
+    # BENCH_CLIENT_NETS/BENCH_CLIENT_CORES simulate a DPDK client container that is already running
+    "weka": """#!/bin/bash
+case "$1 $2" in
+  "version "*|"--version "*) echo "${BENCH_WEKA_VERSION:-4.2.13}" ;;
+  "local ps")
+    if [ -n "${BENCH_CLIENT_NETS:-}" ]; then echo '[{"name": "client", "type": "client", "state": "Running"}]'; else echo '[]'; fi ;;
+  "local resources")
+    sep=""
+    printf '{"net_devices": ['
+    for n in ${BENCH_CLIENT_NETS:-}; do printf '%s{"name": "%s"}' "$sep" "$n"; sep=", "; done
+    printf '], "nodes": {"0": {"core_id": 65535, "roles": ["MANAGEMENT"]}'
+    i=1
+    for c in ${BENCH_CLIENT_CORES:-}; do printf ', "%d": {"core_id": %s, "roles": ["FRONTEND"]}' "$i" "$c"; i=$((i + 1)); done
+    echo "}}" ;;
+esac
+exit 0
+""",
+}
+
+
+# --- simulated cloud ---
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CloudError(Exception):
+    def __init__(self, code: str, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class Cloud:
+    """State shared by the stub EC2 and IMDS endpoints: instances, ENIs and call counters."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket(args.ec2_rate, args.ec2_burst)
+        self.nodes: Dict[str, Dict] = {}
+        self.enis: Dict[str, Dict] = {}
+        self.tokens: Dict[str, str] = {}
+        self.ec2_calls: Dict[str, int] = {}
+        self.ec2_throttled: Dict[str, int] = {}
+        self.imds_calls: Dict[str, int] = {}
+        self._seq = 0
+
+    def _next(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _new_eni(self, tags: Dict[str, str], groups: List[str], available_at: float) -> Dict:
+        n = self._next()
+        eni = {
+            "id": f"eni-{n:017x}",
+            "mac": "0e:%02x:%02x:%02x:%02x:%02x" % tuple((n >> s) & 0xFF for s in (32, 24, 16, 8, 0)),
+            "ip": f"10.{(n >> 16) & 0xFF}.{(n >> 8) & 0xFF}.{n & 0xFF}",
+            "tags": tags,
+            "groups": groups,
+            "available_at": available_at,
+            "attachment": None,
+        }
+        self.enis[eni["id"]] = eni
+        return eni
+
+    def add_node(self, node: str) -> None:
+        with self.lock:
+            instance_id = f"i-{self._next():017x}"
+            primary = self._new_eni({}, [SECURITY_GROUP], 0.0)
+            primary["attachment"] = {
+                "id": f"eni-attach-{primary['id'][4:]}", "instance": instance_id, "device": 0, "card": 0, "srd": (False, False),
+            }
+            self.nodes[node] = {"instance_id": instance_id, "primary": primary["id"]}
+
+    def add_pool(self, pool: str, count: int) -> None:
+        with self.lock:
+            for _ in range(count):
+                self._new_eni({"weka-eni-pool": pool}, [SECURITY_GROUP], 0.0)
+
+    @staticmethod
+    def status(eni: Dict) -> str:
+        if eni["attachment"]:
+            return "in-use"
+        return "pending" if time.monotonic() < eni["available_at"] else "available"
+
+    def node_interfaces(self, node: str) -> List[Dict]:
+        instance_id = self.nodes[node]["instance_id"]
+        with self.lock:
+            return [e for e in self.enis.values() if e["attachment"] and e["attachment"]["instance"] == instance_id]
+
+    # EC2 actions; `p` holds the flattened query parameters
+    def CreateNetworkInterface(self, node: str, p: Dict[str, str]) -> Dict:
+        token = p.get("ClientToken")
+        with self.lock:
+            if token and token in self.tokens:
+                eni = self.enis[self.tokens[token]]
+            else:
+                tags = {p[k]: p.get(k[:-3] + "Value", "") for k in p if re.fullmatch(r"TagSpecification\.1\.Tag\.\d+\.Key", k)}
+                groups = [v for k, v in sorted(p.items()) if k.startswith("SecurityGroupId.")]
+                eni = self._new_eni(tags, groups, time.monotonic() + self.args.eni_create_delay)
+                if token:
+                    self.tokens[token] = eni["id"]
+            return {"networkInterface": self._render(eni), "clientToken": token or ""}
+
+    def DescribeNetworkInterfaces(self, node: str, p: Dict[str, str]) -> Dict:
+        ids = {v for k, v in p.items() if k.startswith("NetworkInterfaceId.")}
+        filters: List[Tuple[str, List[str]]] = []
+        for k, name in p.items():
+            m = re.fullmatch(r"Filter\.(\d+)\.Name", k)
+            if m:
+                values = [v for kk, v in p.items() if kk.startswith(f"Filter.{m.group(1)}.Value.")]
+                filters.append((name, values))
+        with self.lock:
+            missing = ids - set(self.enis)
+            if missing:
+                raise CloudError("InvalidNetworkInterfaceID.NotFound", f"{sorted(missing)} not found")
+            found = [
+                self._render(e) for e in self.enis.values()
+                if (not ids or e["id"] in ids) and all(self._match(e, n, v) for n, v in filters)
+            ]
+        return {"networkInterfaceSet": found}
+
+    def AttachNetworkInterface(self, node: str, p: Dict[str, str]) -> Dict:
+        with self.lock:
+            eni = self._get(p["NetworkInterfaceId"])
+            if self.status(eni) != "available":
+                raise CloudError("IncorrectState", f"{eni['id']} is {self.status(eni)}")
+            card = int(p.get("NetworkCardIndex", "0"))
+            eni["attachment"] = {
+                "id": f"eni-attach-{eni['id'][4:]}",
+                "instance": p["InstanceId"],
+                "device": int(p["DeviceIndex"]),
+                "card": card,
+                "srd": self._srd(p),
+            }
+            return {"attachmentId": eni["attachment"]["id"], "networkCardIndex": card}
+
+    def DetachNetworkInterface(self, node: str, p: Dict[str, str]) -> Dict:
+        with self.lock:
+            for eni in self.enis.values():
+                if eni["attachment"] and eni["attachment"]["id"] == p["AttachmentId"]:
+                    eni["attachment"] = None
+        return {"return": True}
+
+    def DeleteNetworkInterface(self, node: str, p: Dict[str, str]) -> Dict:
+        with self.lock:
+            self._get(p["NetworkInterfaceId"])
+            del self.enis[p["NetworkInterfaceId"]]
+        return {"return": True}
+
+    def ModifyNetworkInterfaceAttribute(self, node: str, p: Dict[str, str]) -> Dict:
+        with self.lock:
+            eni = self._get(p["NetworkInterfaceId"])
+            if eni["attachment"] and any(k.startswith("EnaSrdSpecification.") for k in p):
+                eni["attachment"]["srd"] = self._srd(p)
+        return {"return": True}
+
+    def DescribeInstances(self, node: str, p: Dict[str, str]) -> Dict:
+        ids = {v for k, v in p.items() if k.startswith("InstanceId.")}
+        with self.lock:
+            instances = [
+                {
+                    "instanceId": n["instance_id"],
+                    "instanceType": self.args.instance_type,
+                    "subnetId": SUBNET_ID,
+                    "networkInterfaceSet": [
+                        self._render(e) for e in self.enis.values()
+                        if e["attachment"] and e["attachment"]["instance"] == n["instance_id"]
+                    ],
+                }
+                for n in self.nodes.values() if not ids or n["instance_id"] in ids
+            ]
+        return {"reservationSet": [{"reservationId": f"r-{i['instanceId'][2:]}", "instancesSet": [i]} for i in instances]}
+
+    def DescribeInstanceTypes(self, node: str, p: Dict[str, str]) -> Dict:
+        return {"instanceTypeSet": [{
+            "instanceType": v,
+            "networkInfo": {
+                "maximumNetworkInterfaces": 15,
+                "maximumNetworkCards": 1,
+                "networkCards": [{"networkCardIndex": 0, "maximumNetworkInterfaces": 15}],
+                "networkPerformance": "100 Gigabit",
+                "enaSrdSupported": True,
+            },
+        } for k, v in sorted(p.items()) if k.startswith("InstanceType.")]}
+
+    def CreateTags(self, node: str, p: Dict[str, str]) -> Dict:
+        tags = {p[k]: p.get(k[:-3] + "Value", "") for k in p if re.fullmatch(r"Tag\.\d+\.Key", k)}
+        with self.lock:
+            for k, v in p.items():
+                if k.startswith("ResourceId."):
+                    self._get(v)["tags"].update(tags)
+        return {"return": True}
+
+    def DeleteTags(self, node: str, p: Dict[str, str]) -> Dict:
+        keys = [v for k, v in p.items() if re.fullmatch(r"Tag\.\d+\.Key", k)]
+        with self.lock:
+            for k, v in p.items():
+                if k.startswith("ResourceId."):
+                    for key in keys:
+                        self._get(v)["tags"].pop(key, None)
+        return {"return": True}
+
+    @staticmethod
+    def _srd(p: Dict[str, str]) -> Tuple[bool, bool]:
+        """(SRD, UDP over SRD) from an EnaSrdSpecification query parameter."""
+        return (
+            p.get("EnaSrdSpecification.EnaSrdEnabled") == "true",
+            p.get("EnaSrdSpecification.EnaSrdUdpSpecification.EnaSrdUdpEnabled") == "true",
+        )
+
+    def _get(self, eni_id: str) -> Dict:
+        if eni_id not in self.enis:
+            raise CloudError("InvalidNetworkInterfaceID.NotFound", f"{eni_id} not found")
+        return self.enis[eni_id]
+
+    def _match(self, eni: Dict, name: str, values: List[str]) -> bool:
+        if name == "status":
+            return self.status(eni) in values
+        if name == "subnet-id":
+            return SUBNET_ID in values
+        if name == "attachment.instance-id":
+            return bool(eni["attachment"]) and eni["attachment"]["instance"] in values
+        if name.startswith("tag:"):
+            return eni["tags"].get(name[4:]) in values
+        return True
+
+    def _render(self, eni: Dict) -> Dict:
+        out = {
+            "networkInterfaceId": eni["id"],
+            "subnetId": SUBNET_ID,
+            "macAddress": eni["mac"],
+            "privateIpAddress": eni["ip"],
+            "status": self.status(eni),
+            "groupSet": [{"groupId": g, "groupName": g} for g in eni["groups"]],
+            "tagSet": [{"key": k, "value": v} for k, v in eni["tags"].items()],
+        }
+        att = eni["attachment"]
+        if att:
+            out["attachment"] = {
+                "attachmentId": att["id"],
+                "instanceId": att["instance"],
+                "deviceIndex": att["device"],
+                "networkCardIndex": att["card"],
+                "status": "attached",
+                "enaSrdSpecification": {
+                    "enaSrdEnabled": att["srd"][0],
+                    "enaSrdUdpSpecification": {"enaSrdUdpEnabled": att["srd"][1]},
+                },
+            }
+        return out
+
+
+def to_xml(value) -> str:
+    if isinstance(value, dict):
+        return "".join(f"<{k}>{to_xml(v)}</{k}>" for k, v in value.items())
+    if isinstance(value, list):
+        return "".join(f"<item>{to_xml(v)}</item>" for v in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def make_handlers(cloud: Cloud):
+    args = cloud.args
+
+    class EC2Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a) -> None:
+            pass
+
+        def _reply(self, status: int, body: str) -> None:
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            p = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+            # each node signs with its own access key, which identifies it here
+            m = re.search(r"Credential=([^/]+)/", self.headers.get("Authorization", ""))
+            node = m.group(1) if m else "?"
+            action = p.get("Action", "")
+            request_id = str(uuid.uuid4())
+            with cloud.lock:
+                cloud.ec2_calls[node] = cloud.ec2_calls.get(node, 0) + 1
+            time.sleep(max(0.0, random.gauss(args.ec2_latency_ms, args.ec2_jitter_ms)) / 1000)
+            try:
+                if not cloud.bucket.take():
+                    with cloud.lock:
+                        cloud.ec2_throttled[node] = cloud.ec2_throttled.get(node, 0) + 1
+                    raise CloudError("RequestLimitExceeded", "Request limit exceeded.", 503)
+                op = getattr(cloud, action, None) if action[:1].isupper() else None
+                if op is None:
+                    raise CloudError("InvalidAction", f"{action} is not supported by the benchmark stub")
+                body = to_xml(op(node, p))
+                self._reply(200, f'<?xml version="1.0" encoding="UTF-8"?><{action}Response xmlns="{EC2_XMLNS}">'
+                                 f"<requestId>{request_id}</requestId>{body}</{action}Response>")
+            except CloudError as e:
+                self._reply(e.status, f'<?xml version="1.0" encoding="UTF-8"?><Response><Errors><Error>'
+                                      f"<Code>{e.code}</Code><Message>{to_xml(str(e))}</Message></Error></Errors>"
+                                      f"<RequestID>{request_id}</RequestID></Response>")
+
+    class IMDSHandler(BaseHTTPRequestHandler):
+        def log_message(self, *a) -> None:
+            pass
+
+        def _reply(self, status: int, body: str) -> None:
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _node(self) -> Tuple[str, str]:
+            # paths look like /<node>/latest/...
+            _, node, rest = self.path.split("/", 2)
+            with cloud.lock:
+                cloud.imds_calls[node] = cloud.imds_calls.get(node, 0) + 1
+            time.sleep(args.imds_latency_ms / 1000)
+            return node, rest[len("latest"):]
+
+        def do_PUT(self) -> None:
+            self._node()
+            self._reply(200, uuid.uuid4().hex)
+
+        def do_GET(self) -> None:
+            node, path = self._node()
+            if node not in cloud.nodes:
+                return self._reply(404, "")
+            info = cloud.nodes[node]
+            interfaces = cloud.node_interfaces(node)
+            primary = cloud.enis[info["primary"]]
+            if path == "/dynamic/instance-identity/document":
+                return self._reply(200, json.dumps({
+                    "instanceId": info["instance_id"],
+                    "region": REGION,
+                    "availabilityZone": f"{REGION}a",
+                    "privateIp": primary["ip"],
+                    "instanceType": args.instance_type,
+                }))
+            flat = {
+                "/meta-data/instance-id": info["instance_id"],
+                "/meta-data/local-ipv4": primary["ip"],
+                "/meta-data/placement/availability-zone": f"{REGION}a",
+                "/meta-data/instance-type": args.instance_type,
+            }
+            if path in flat:
+                return self._reply(200, flat[path])
+            if path == "/meta-data/network/interfaces/macs/":
+                return self._reply(200, "\n".join(f"{e['mac']}/" for e in interfaces))
+            m = re.fullmatch(r"/meta-data/network/interfaces/macs/([0-9a-f:]+)/([a-z0-9-]+)", path)
+            for eni in interfaces if m else []:
+                if eni["mac"] == m.group(1):
+                    values = {
+                        "interface-id": eni["id"],
+                        "device-number": eni["attachment"]["device"],
+                        "network-card": eni["attachment"]["card"],
+                        "subnet-id": SUBNET_ID,
+                        "local-ipv4s": eni["ip"],
+                    }
+                    if m.group(2) in values:
+                        return self._reply(200, str(values[m.group(2)]))
+            self._reply(404, "")
+
+    return EC2Handler, IMDSHandler
+
+
+def serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- one simulated node (runs in its own process) ---
+def run_node(args: argparse.Namespace) -> None:
+    # installers from before AWS_EC2_METADATA_SERVICE_ENDPOINT was honoured call IMDS directly
+    import requests
+    session_request = requests.Session.request
+    imds_url = os.environ["AWS_EC2_METADATA_SERVICE_ENDPOINT"]
+
+    def request(self, method, url, *a, **kwargs):
+        if url.startswith("http://169.254.169.254/"):
+            url = imds_url + url[len("http://169.254.169.254"):]
+        return session_request(self, method, url, *a, **kwargs)
+    requests.Session.request = request
+
+    spec = importlib.util.spec_from_file_location("weka_install", args.installer)
+    wi = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(wi)
+
+    root = args.node_root
+    for name, rel in (
+        ("SYSTEMD_TEMPLATE_UNIT_PATH", "etc/systemd/system/weka-mount@.service"),
+        ("ENV_DIR", "etc/weka/mount.d"),
+        ("MOUNT_SH_PATH", "usr/local/bin/weka_mount.sh"),
+        ("UMOUNT_SH_PATH", "usr/local/bin/weka_umount.sh"),
+        ("EXPORTER_PY_PATH", "usr/local/bin/weka_exporter.py"),
+        ("EXPORTER_UNIT_PATH", "etc/systemd/system/weka-exporter.service"),
+        ("CATALOG_PATH", "etc/weka/instance-catalog.json"),
+        ("STATE_PATH", "etc/weka/mounter-state.json"),
+        ("SPANS_PATH", "var/log/weka-mounter/spans.jsonl"),
+        ("TEXTFILE_DIR", "var/lib/node_exporter/textfile_collector"),
+        ("HUGEPAGES_SH_PATH", "usr/local/bin/weka_hugepages.sh"),
+        ("HUGEPAGES_UNIT_PATH", "etc/systemd/system/weka-hugepages.service"),
+        ("HUGEPAGES_DROPIN_PATH", "etc/systemd/system/weka-mount@.service.d/hugepages.conf"),
+        ("HUGEPAGES_CONF_PATH", "etc/weka/hugepages.conf"),
+        ("HUGEPAGES_STATUS_PATH", "run/weka/hugepages.status"),
+        ("NETTUNE_SH_PATH", "usr/local/bin/weka_nettune.sh"),
+        ("NETTUNE_UNIT_PATH", "etc/systemd/system/weka-nettune.service"),
+        ("NETTUNE_DROPIN_PATH", "etc/systemd/system/weka-mount@.service.d/nettune.conf"),
+        ("NETTUNE_CONF_PATH", "etc/weka/nettune.conf"),
+        ("NETTUNE_STATUS_PATH", "run/weka/nettune.status"),
+        ("CPUSET_SH_PATH", "usr/local/bin/weka_cpuset.sh"),
+        ("CPUSET_VERIFY_UNIT_PATH", "etc/systemd/system/weka-cpuset-verify.service"),
+        ("CPUSET_VERIFY_TIMER_PATH", "etc/systemd/system/weka-cpuset-verify.timer"),
+        ("CPUSET_STATUS_PATH", "run/weka/cpuset.status"),
+        ("MOUNT_NOTIFY_DROPIN_PATH", "etc/systemd/system/weka-mount@{instance}.service.d/notify.conf"),
+        ("MOUNT_ORDER_DROPIN_PATH", "etc/systemd/system/weka-mount@{instance}.service.d/order.conf"),
+        ("SLURMD_DROPIN_PATH", "etc/systemd/system/slurmd.service.d/weka-mount-{instance}.conf"),
+    ):
+        # older installers lack the later paths; they never write those files
+        if not hasattr(wi, name):
+            continue
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        setattr(wi, name, path)
+    if hasattr(wi, "INSTALLER_CACHE_DIRS"):
+        wi.INSTALLER_CACHE_DIRS = [os.path.join(root, "var/cache/weka-installer")]
+    wi.ensure_root = lambda: None
+
+    # a single-NUMA-node CPU topology, and ENIs that show up as sim<N> after --nic-delay
+    sysfs = os.path.join(root, "sys")
+    os.makedirs(os.path.join(sysfs, "devices/system/cpu"), exist_ok=True)
+    with open(os.path.join(sysfs, "devices/system/cpu/online"), "w") as f:
+        f.write(f"0-{args.cpus - 1}\n")
+    if hasattr(wi, "CpuTopology"):
+        topology = wi.CpuTopology
+        wi.CpuTopology = lambda sysfs=sysfs: topology(sysfs)
+
+    def resolve_eni_ifnames(imds, eni_ids, *a, **kwargs):
+        time.sleep(args.nic_delay)
+        return [f"sim{i}" for i in range(len(eni_ids))]
+    wi.resolve_eni_ifnames = resolve_eni_ifnames
+
+    # the fake client is already installed; --install-delay stands in for download + install.sh
+    ensure_weka_installed = wi.ensure_weka_installed
+
+    def slow_install(*a, **kwargs):
+        time.sleep(args.install_delay)
+        return ensure_weka_installed(*a, **kwargs)
+    wi.ensure_weka_installed = slow_install
+
+    sys.argv = ["weka-install.py", *args.installer_args]
+    result: Dict = {"ok": True}
+    # installers without the span recorder only report boot-to-mount
+    spans = getattr(wi, "SPANS", None)
+    try:
+        with spans.span("main") if spans else contextlib.nullcontext():
+            wi.main()
+    except BaseException as e:
+        result.update(ok=False, error=str(e) or type(e).__name__)
+    finally:
+        if spans:
+            spans.finish()
+    phases: Dict[str, float] = {}
+    for rec in spans.spans if spans else []:
+        phases[rec["name"]] = phases.get(rec["name"], 0.0) + rec["duration_s"]
+    result["phases"] = phases
+    ec2_layer = getattr(wi, "EC2_LAYER", None)
+    result["ec2_retries"] = sum(st.retries for st in ec2_layer.stats.values()) if ec2_layer else 0
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+# --- driver ---
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def installer_args_for(args: argparse.Namespace) -> List[str]:
+    """
+    weka-install.py arguments for this run, limited to what the installer under test accepts
+    (read from its --help), so installers from earlier commits can be benchmarked too.
+    """
+    cp = subprocess.run([sys.executable, args.installer, "--help"], capture_output=True, text=True)
+    if cp.returncode != 0:
+        raise SystemExit(f"{args.installer} --help failed: {cp.stderr.strip()[-500:]}")
+    flags = set(re.findall(r"--[a-z0-9][a-z0-9-]*", cp.stdout))
+    installer_args = ["--alb-dns-name", "bench-alb.invalid"]
+    if "--weka-version" in flags:
+        installer_args += ["--weka-version", "4.2.13"]
+    if "--force" in flags:
+        installer_args += ["--force"]
+    if args.dpdk_nics:
+        # --cores auto[:N] came later; older installers take an explicit core list
+        if "auto[:N]" in cp.stdout:
+            cores = f"auto:{args.dpdk_nics}"
+        else:
+            cores = ",".join(str(args.cpus - 1 - n) for n in range(args.dpdk_nics))
+        installer_args += ["--cores", cores, "--security-groups", SECURITY_GROUP]
+    if args.eni_pool:
+        if "--eni-pool" not in flags:
+            raise SystemExit(f"--eni-pool: {args.installer} has no --eni-pool")
+        installer_args += ["--eni-pool", "bench"]
+    return installer_args + args.installer_args
+
+
+def installer_commit(installer: str) -> str:
+    repo = os.path.dirname(os.path.abspath(installer))
+    try:
+        head = subprocess.run(["git", "-C", repo, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", repo, "status", "--porcelain", "--", os.path.abspath(installer)], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return head + ("-dirty" if dirty else "")
+
+
+def installer_at_rev(installer: str, rev: str, workdir: str) -> Tuple[str, str]:
+    """Write `installer` as of git commit `rev` into `workdir`; (short commit, path)."""
+    path = os.path.abspath(installer)
+    repo = os.path.dirname(path)
+    try:
+        commit = subprocess.run(
+            ["git", "-C", repo, "rev-parse", "--short", f"{rev}^{{commit}}"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        prefix = subprocess.run(
+            ["git", "-C", repo, "rev-parse", "--show-prefix"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        files = {"weka-install.py": git_show(repo, commit, prefix + os.path.basename(path))}
+        # the scripts it reads from --assets (default: beside it), where that commit has them
+        for name in INSTALLER_ASSETS:
+            content = git_show(repo, commit, prefix + name, missing_ok=True)
+            if content is not None:
+                files[name] = content
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise SystemExit(f"--rev {rev}: {getattr(e, 'stderr', '') or e}")
+    for name, content in files.items():
+        with open(os.path.join(workdir, name), "w") as f:
+            f.write(content)
+    return commit, os.path.join(workdir, "weka-install.py")
+
+
+def git_show(repo: str, commit: str, path: str, missing_ok: bool = False) -> Optional[str]:
+    """Content of repo-relative `path` at `commit`, following symlinks."""
+    for _ in range(8):
+        entry = subprocess.run(
+            ["git", "-C", repo, "ls-tree", "--full-tree", commit, "--", path], capture_output=True, text=True, check=True,
+        ).stdout.split()
+        if not entry:
+            if missing_ok:
+                return None
+            raise subprocess.CalledProcessError(128, "git ls-tree", stderr=f"{path} not found in {commit}")
+        content = subprocess.run(
+            ["git", "-C", repo, "cat-file", "blob", entry[2]], capture_output=True, text=True, check=True,
+        ).stdout
+        if entry[0] != "120000":
+            return content
+        path = os.path.normpath(os.path.join(os.path.dirname(path), content))
+    raise subprocess.CalledProcessError(128, "git ls-tree", stderr=f"{path}: too many symlinks")
+
+
+def boot_nodes(args: argparse.Namespace, cloud: Cloud, ec2_url: str, imds_url: str, workdir: str) -> List[Dict]:
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir)
+    for name, content in FAKE_BIN.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+
+    installer_args = installer_args_for(args)
+
+    def boot(i: int) -> Dict:
+        node = f"node{i:04d}"
+        root = os.path.join(workdir, node)
+        env = dict(
+            os.environ,
+            PATH=f"{bin_dir}:{os.environ.get('PATH', '')}",
+            AWS_ACCESS_KEY_ID=node,
+            AWS_SECRET_ACCESS_KEY="bench",
+            AWS_DEFAULT_REGION=REGION,
+            AWS_ENDPOINT_URL_EC2=ec2_url,
+            AWS_EC2_METADATA_SERVICE_ENDPOINT=f"{imds_url}/{node}",
+            BENCH_MOUNT_DELAY_S=str(args.mount_delay),
+            BENCH_CLIENT_NETS=" ".join(f"sim{n}" for n in range(args.running_client)),
+            BENCH_CLIENT_CORES=" ".join(str(args.cpus - 1 - n) for n in range(args.running_client)),
+        )
+        env.pop("AWS_PROFILE", None)
+        time.sleep(i * args.stagger_ms / 1000)
+        t0 = time.monotonic()
+        cp = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--node-root", root, "--installer", args.installer,
+             "--nic-delay", str(args.nic_delay), "--install-delay", str(args.install_delay), "--cpus", str(args.cpus), "--", *installer_args],
+            env=env, capture_output=True, text=True,
+        )
+        elapsed = time.monotonic() - t0
+        lines = [l for l in cp.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+        res = json.loads(lines[-1][len(RESULT_PREFIX):]) if lines else {"ok": False, "error": cp.stderr.strip()[-500:]}
+        if cp.returncode != 0:
+            res["ok"] = False
+        if not res["ok"] and args.verbose:
+            sys.stderr.write(f"--- {node} ---\n{cp.stderr}\n{node}: {res.get('error', '')}\n")
+        res.update(node=node, boot_to_mount_s=elapsed)
+        return res
+
+    for i in range(args.nodes):
+        cloud.add_node(f"node{i:04d}")
+    if args.eni_pool:
+        cloud.add_pool("bench", args.eni_pool)
+    with ThreadPoolExecutor(max_workers=args.nodes) as pool:
+        results = list(pool.map(boot, range(args.nodes)))
+    for res in results:
+        res["ec2_calls"] = cloud.ec2_calls.get(res["node"], 0)
+        res["ec2_throttled"] = cloud.ec2_throttled.get(res["node"], 0)
+        res["imds_calls"] = cloud.imds_calls.get(res["node"], 0)
+    return results
+
+
+def summarize(results: List[Dict]) -> Dict:
+    ok = [r for r in results if r["ok"]]
+    times = [r["boot_to_mount_s"] for r in ok]
+    summary: Dict = {
+        "nodes": len(results),
+        "failed": len(results) - len(ok),
+        "boot_to_mount_p50_s": percentile(times, 50),
+        "boot_to_mount_p90_s": percentile(times, 90),
+        "boot_to_mount_p99_s": percentile(times, 99),
+        "boot_to_mount_max_s": max(times, default=0.0),
+        "ec2_calls_per_node": sum(r["ec2_calls"] for r in results) / max(len(results), 1),
+        "ec2_calls_per_node_max": max((r["ec2_calls"] for r in results), default=0),
+        "ec2_throttled_total": sum(r["ec2_throttled"] for r in results),
+        "imds_calls_per_node": sum(r["imds_calls"] for r in results) / max(len(results), 1),
+        "phases_p50_s": {},
+        "phases_p99_s": {},
+    }
+    names = sorted({n for r in ok for n in r.get("phases", {})})
+    for name in names:
+        values = [r["phases"][name] for r in ok if name in r.get("phases", {})]
+        summary["phases_p50_s"][name] = percentile(values, 50)
+        summary["phases_p99_s"][name] = percentile(values, 99)
+    return summary
+
+
+def print_report(report: Dict, baseline: Optional[Dict]) -> None:
+    s = report["summary"]
+    base = baseline["summary"] if baseline else {}
+
+    def row(label: str, key: str, fmt: str = "{:.3f}") -> None:
+        line = f"  {label:<28}{fmt.format(s[key]):>12}"
+        if key in base and isinstance(base[key], (int, float)):
+            delta = s[key] - base[key]
+            pct = f" ({delta / base[key] * 100:+.1f}%)" if base[key] else ""
+            line += f"   was {fmt.format(base[key])}{pct}"
+        print(line)
+
+    print(f"weka-install.py @ {report['commit']}: {s['nodes']} nodes, {s['failed']} failed")
+    if baseline:
+        print(f"baseline @ {baseline['commit']}")
+    row("boot-to-mount p50 (s)", "boot_to_mount_p50_s")
+    row("boot-to-mount p90 (s)", "boot_to_mount_p90_s")
+    row("boot-to-mount p99 (s)", "boot_to_mount_p99_s")
+    row("boot-to-mount max (s)", "boot_to_mount_max_s")
+    row("EC2 calls/node", "ec2_calls_per_node", "{:.1f}")
+    row("EC2 calls/node (max)", "ec2_calls_per_node_max", "{:d}")
+    row("EC2 throttled (total)", "ec2_throttled_total", "{:d}")
+    row("IMDS requests/node", "imds_calls_per_node", "{:.1f}")
+    print("  phase                           p50 (s)     p99 (s)")
+    for name, p50 in s["phases_p50_s"].items():
+        print(f"  {name:<28}{p50:>11.3f}{s['phases_p99_s'][name]:>12.3f}")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark weka-install.py against stub IMDS/EC2/systemd.")
+    p.add_argument("--nodes", type=int, default=16, help="Simulated nodes booting concurrently")
+    p.add_argument("--stagger-ms", type=float, default=0.0, help="Delay between node starts")
+    p.add_argument("--dpdk-nics", type=int, default=0, help="DPDK NICs per node (0 = UDP mode, no ENIs)")
+    p.add_argument("--eni-pool", type=int, default=0, help="Pre-create this many pool ENIs and pass --eni-pool")
+    p.add_argument("--instance-type", default="c5n.18xlarge", help="Instance type reported by IMDS")
+    p.add_argument("--cpus", type=int, default=72, help="Online CPUs of the simulated instance")
+    p.add_argument("--ec2-latency-ms", type=float, default=80.0, help="Mean EC2 API latency")
+    p.add_argument("--ec2-jitter-ms", type=float, default=30.0, help="Standard deviation of the EC2 API latency")
+    p.add_argument("--ec2-rate", type=float, default=20.0, help="Account-wide EC2 requests/s before throttling (0 = unlimited)")
+    p.add_argument("--ec2-burst", type=int, default=40, help="Account-wide EC2 request burst")
+    p.add_argument("--eni-create-delay", type=float, default=1.0, help="Seconds until a created ENI is available")
+    p.add_argument("--imds-latency-ms", type=float, default=1.0, help="IMDS latency")
+    p.add_argument("--nic-delay", type=float, default=0.5, help="Seconds until attached ENIs show up as interfaces")
+    p.add_argument(
+        "--running-client", type=int, default=0,
+        help="Simulate a DPDK client container already running with this many NICs/cores (reused for the mount)",
+    )
+    p.add_argument("--install-delay", type=float, default=0.0, help="Seconds the WEKA client download and install take")
+    p.add_argument("--mount-delay", type=float, default=2.0, help="Seconds `systemctl enable --now weka-mount@` takes")
+    p.add_argument("--installer", default=INSTALLER, help="weka-install.py to benchmark")
+    p.add_argument("--rev", help="Benchmark --installer as of this git commit (e.g. an earlier one) instead of the working tree")
+    p.add_argument("--seed", type=int, default=1, help="Random seed for the latency jitter")
+    p.add_argument("--output", help="Write the results as JSON")
+    p.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    p.add_argument("--keep", action="store_true", help="Keep the node root directories")
+    p.add_argument("--verbose", action="store_true", help="Print the log of failed nodes")
+    p.add_argument("--node-root", help=argparse.SUPPRESS)
+    p.add_argument("installer_args", nargs="*", help="Extra weka-install.py arguments (after --)")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.node_root:
+        run_node(args)
+        return
+
+    random.seed(args.seed)
+    commit = installer_commit(args.installer)
+    workdir = tempfile.mkdtemp(prefix="weka-bench-")
+    cloud = Cloud(args)
+    ec2_handler, imds_handler = make_handlers(cloud)
+    ec2 = serve(ec2_handler)
+    imds = serve(imds_handler)
+    try:
+        if args.rev:
+            commit, args.installer = installer_at_rev(args.installer, args.rev, workdir)
+        results = boot_nodes(
+            args, cloud,
+            f"http://127.0.0.1:{ec2.server_address[1]}",
+            f"http://127.0.0.1:{imds.server_address[1]}",
+            workdir,
+        )
+    finally:
+        ec2.shutdown()
+        imds.shutdown()
+        if args.keep:
+            print(f"node roots kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep", "verbose", "node_root", "installer", "rev")}
+    report = {"commit": commit, "params": params, "summary": summarize(results), "nodes": results}
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if report["summary"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
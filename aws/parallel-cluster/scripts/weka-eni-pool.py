@@ -0,0 +1,157 @@
+#!/opt/weka-temp-venv/bin/python
+
+"""
+Pre-warm a pool of DPDK ENIs for weka-install.py --eni-pool.
+
+Pool ENIs are ordinary ENIs tagged weka-eni-pool=<name> in the subnet the DPDK nodes boot in.
+Booting nodes claim free ones instead of calling CreateNetworkInterface, which is the slowest
+and most throttle-prone EC2 call during large scale-outs.
+
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import boto3  # type: ignore
+except ImportError as e:
+    raise SystemExit(
+        f"Missing dependency: boto3 ({e}). "
+        "Install boto3/botocore or use an AWS AMI that includes them."
+    )
+
+
+# --- config ---
+# the pool tags and claim timeout come from weka-install.py next to this script, which owns the
+# claim protocol (it is deployed as a single file, so this script imports from it, not vice versa)
+def _load_installer():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weka-install.py")
+    spec = importlib.util.spec_from_file_location("weka_install", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_installer = _load_installer()
+POOL_TAG = _installer.POOL_TAG
+POOL_CLAIM_TAG = _installer.POOL_CLAIM_TAG
+POOL_CLAIM_STALE_S = _installer.POOL_CLAIM_STALE_S
+EC2_MAX_WORKERS = _installer.EC2_MAX_WORKERS
+
+
+# --- logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+log = logging.getLogger("weka-eni-pool")
+
+
+def claim_is_free(tags: Dict[str, str]) -> bool:
+    claim = tags.get(POOL_CLAIM_TAG, "")
+    if not claim:
+        return True
+    try:
+        return time.time() - int(claim.split("/")[1]) > POOL_CLAIM_STALE_S
+    except (IndexError, ValueError):
+        return True
+
+
+def free_pool_enis(ec2_client, pool: str, subnet_id: str, security_groups: Optional[List[str]]) -> List[str]:
+    filters = [
+        {"Name": "subnet-id", "Values": [subnet_id]},
+        {"Name": "status", "Values": ["available"]},
+        {"Name": f"tag:{POOL_TAG}", "Values": [pool]},
+    ]
+    want_groups = set(security_groups or [])
+    free: List[str] = []
+    for page in ec2_client.get_paginator("describe_network_interfaces").paginate(Filters=filters):
+        for ni in page["NetworkInterfaces"]:
+            tags = {t["Key"]: t["Value"] for t in ni.get("TagSet", [])}
+            groups = {g["GroupId"] for g in ni.get("Groups", [])}
+            if want_groups and groups != want_groups:
+                continue
+            if claim_is_free(tags):
+                free.append(ni["NetworkInterfaceId"])
+    return free
+
+
+def create_pool_eni(ec2_client, pool: str, subnet_id: str, security_groups: Optional[List[str]], name: str) -> str:
+    params: Dict = {
+        "SubnetId": subnet_id,
+        "Description": f"Weka DPDK pool ENI ({pool})",
+        "TagSpecifications": [{
+            "ResourceType": "network-interface",
+            "Tags": [
+                {"Key": "Name", "Value": name},
+                {"Key": "CreatedBy", "Value": "weka-mounter"},
+                {"Key": POOL_TAG, "Value": pool},
+            ],
+        }],
+    }
+    if security_groups:
+        params["Groups"] = security_groups
+    eni_id = ec2_client.create_network_interface(**params)["NetworkInterface"]["NetworkInterfaceId"]
+    log.info("Created pool ENI %s", eni_id)
+    return eni_id
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Pre-warm a pool of DPDK ENIs for weka-install.py --eni-pool.")
+    p.add_argument("--pool", required=True, help="Pool name (value of the weka-eni-pool tag)")
+    p.add_argument("--subnet-id", required=True, help="Subnet the DPDK nodes are launched in")
+    p.add_argument("--target", type=int, required=True, help="Number of free ENIs the pool should hold")
+    p.add_argument("--security-groups", type=lambda x: x.split(","), help="Comma-separated security group IDs")
+    p.add_argument("--region", default=None, help="AWS region (default: from the AWS config/environment)")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    log.setLevel(getattr(logging, args.log_level))
+
+    ec2_client = boto3.client("ec2", region_name=args.region)
+    free = free_pool_enis(ec2_client, args.pool, args.subnet_id, args.security_groups)
+    shortfall = args.target - len(free)
+    log.info("Pool %s in %s: free=%d target=%d", args.pool, args.subnet_id, len(free), args.target)
+    if shortfall <= 0:
+        log.info("Pool is at or above target; nothing to do")
+        return
+    if args.dry_run:
+        log.info("DRY RUN: would create %d ENIs", shortfall)
+        return
+
+    run_id = int(time.time())
+    errors: List[Exception] = []
+    with ThreadPoolExecutor(max_workers=min(shortfall, EC2_MAX_WORKERS)) as pool:
+        futures = [
+            pool.submit(
+                create_pool_eni, ec2_client, args.pool, args.subnet_id, args.security_groups,
+                f"weka-dpdk-pool-{args.pool}-{run_id}-{i+1}",
+            )
+            for i in range(shortfall)
+        ]
+        for fut in futures:
+            try:
+                fut.result()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {shortfall} ENI creations failed: {errors[0]}")
+    log.info("Pool %s now holds %d free ENIs", args.pool, args.target)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        log.error("Fatal: %s", e)
+        sys.exit(1)
@@ -6,34 +6,61 @@ Provision ENIs (optional, for DPDK) and mount a WEKA filesystem via a systemd te
 """
 
 import argparse
+import contextlib
+import fcntl
+import hashlib
+import ipaddress
+import json
 import logging
 import os
+import random
 import re
+import select
 import shutil
+import socket
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
-from typing import Dict, List, Optional, Set, Tuple
-
-# AMI dependency safety checks (fail fast)
-try:
-    import boto3  # type: ignore
-except ImportError as e:
-    raise SystemExit(
-        f"Missing dependency: boto3 ({e}). "
-        "Install boto3/botocore or use an AWS AMI that includes them."
-    )
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# boto3/requests are imported by load_cloud_deps() rather than at module load, so an
+# unchanged rerun (see MounterState) can exit without paying for them.
+boto3 = None
+requests = None
+ClientError = None
+BotoConfig = None
+HTTPAdapter = None
+
+
+def load_cloud_deps() -> None:
+    """AMI dependency safety checks (fail fast)."""
+    global boto3, requests, ClientError, BotoConfig, HTTPAdapter
+    if boto3 is not None and requests is not None:
+        return
+    try:
+        import boto3  # type: ignore
+    except ImportError as e:
+        raise SystemExit(
+            f"Missing dependency: boto3 ({e}). "
+            "Install boto3/botocore or use an AWS AMI that includes them."
+        )
 
-try:
-    import requests  # type: ignore
-except ImportError as e:
-    raise SystemExit(
-        f"Missing dependency: requests ({e}). "
-        "Install requests or use an AWS AMI that includes it."
-    )
+    try:
+        import requests  # type: ignore
+    except ImportError as e:
+        raise SystemExit(
+            f"Missing dependency: requests ({e}). "
+            "Install requests or use an AWS AMI that includes it."
+        )
 
-from botocore.exceptions import ClientError
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+    from requests.adapters import HTTPAdapter
 
 
 # --- config ---
@@ -41,6 +68,106 @@ SYSTEMD_TEMPLATE_UNIT_PATH = "/etc/systemd/system/weka-mount@.service"
 ENV_DIR = "/etc/weka/mount.d"
 MOUNT_SH_PATH = "/usr/local/bin/weka_mount.sh"
 UMOUNT_SH_PATH = "/usr/local/bin/weka_umount.sh"
+EXPORTER_PY_PATH = "/usr/local/bin/weka_exporter.py"
+# scripts shared with aws/sagemaker-hyperpod/LifecycleScripts, read from --assets at run time
+EXPORTER_PY_ASSET = "weka_exporter.py"
+CPUSET_SH_ASSET = "weka_cpuset.sh"
+EXPORTER_UNIT_PATH = "/etc/systemd/system/weka-exporter.service"
+TEXTFILE_DIR = "/var/lib/node_exporter/textfile_collector"
+SPANS_PATH = "/var/log/weka-mounter/spans.jsonl"
+HUGEPAGES_SH_PATH = "/usr/local/bin/weka_hugepages.sh"
+HUGEPAGES_UNIT_PATH = "/etc/systemd/system/weka-hugepages.service"
+HUGEPAGES_DROPIN_PATH = "/etc/systemd/system/weka-mount@.service.d/hugepages.conf"
+HUGEPAGES_CONF_PATH = "/etc/weka/hugepages.conf"
+HUGEPAGES_STATUS_PATH = "/run/weka/hugepages.status"
+NETTUNE_SH_PATH = "/usr/local/bin/weka_nettune.sh"
+NETTUNE_UNIT_PATH = "/etc/systemd/system/weka-nettune.service"
+NETTUNE_DROPIN_PATH = "/etc/systemd/system/weka-mount@.service.d/nettune.conf"
+NETTUNE_CONF_PATH = "/etc/weka/nettune.conf"
+NETTUNE_STATUS_PATH = "/run/weka/nettune.status"
+CPUSET_SH_PATH = "/usr/local/bin/weka_cpuset.sh"
+CPUSET_VERIFY_UNIT_PATH = "/etc/systemd/system/weka-cpuset-verify.service"
+CPUSET_VERIFY_TIMER_PATH = "/etc/systemd/system/weka-cpuset-verify.timer"
+CPUSET_STATUS_PATH = "/run/weka/cpuset.status"
+# --async-mount: weka-mount@ becomes Type=notify and slurmd waits for its readiness
+MOUNT_NOTIFY_DROPIN_PATH = "/etc/systemd/system/weka-mount@{instance}.service.d/notify.conf"
+MOUNT_ORDER_DROPIN_PATH = "/etc/systemd/system/weka-mount@{instance}.service.d/order.conf"
+SLURMD_DROPIN_PATH = "/etc/systemd/system/slurmd.service.d/weka-mount-{instance}.conf"
+
+# DPDK client hugepage sizing (see hugepage_plan); the client's memory_mb goes to the NUMA
+# nodes of its cores, plus per-core and per-NIC DPDK overhead on the core's/NIC's node
+HUGEPAGE_KB = 2048
+WEKA_CLIENT_MEMORY_MB = 1400  # wekafs default when memory_mb is not given
+HUGEPAGE_PER_CORE_MB = 64
+HUGEPAGE_PER_NIC_MB = 128
+HUGEPAGE_COMPACT_RETRIES = 3
+
+# UDP-mode data interface tuning ("max" = the hardware maximum reported by ethtool)
+NIC_MTU = 9001  # jumbo frames within the VPC
+NIC_RINGS = "max"
+NIC_QUEUES = "max"
+
+# ENA Express: SRD for TCP and UDP; traffic above this MTU bypasses SRD
+ENA_SRD_SPEC = {"EnaSrdEnabled": True, "EnaSrdUdpSpecification": {"EnaSrdUdpEnabled": True}}
+ENA_EXPRESS_MAX_MTU = 8900
+
+# named wekafs mount-option profiles (--mount-profile / profile=<name> in --filesystem)
+MOUNT_PROFILES: Dict[str, List[str]] = {
+    # large sequential/random reads of a mostly static dataset
+    "training-read": ["readcache", "dentry_max_age_positive=60000", "inode_bits=64"],
+    # bursty large writes that must not stall the training loop
+    "checkpoint-write": ["writecache", "memory_mb=4096"],
+    # many small files and frequent lookups
+    "metadata-heavy": ["readcache", "dentry_max_age_positive=10000", "dentry_max_age_negative=2000", "inode_bits=64"],
+}
+
+# WEKA client release tarballs; searched in order (prebaked AMI path first), misses
+# are stored in the first writable directory
+INSTALLER_CACHE_DIRS = ["/opt/weka/installer-cache", "/var/cache/weka-installer"]
+INSTALLER_RELEASE_URL = "https://{host}:14000/dist/v1/release/{version}.tar"
+
+EC2_MAX_WORKERS = 8  # concurrent ENI create calls
+ENI_POLL_INITIAL_S = 0.5
+ENI_POLL_MAX_S = 5.0
+ENI_WAIT_TIMEOUT_S = 120.0
+
+EC2_RATE = 5.0  # requests/s per node (client-side token bucket)
+EC2_BURST = 10
+EC2_MAX_RETRIES = 8
+EC2_BACKOFF_BASE_S = 0.5
+EC2_BACKOFF_CAP_S = 20.0
+
+POOL_TAG = "weka-eni-pool"
+POOL_CLAIM_TAG = "weka-eni-pool-claim"
+POOL_CLAIM_SETTLE_S = 2.0
+POOL_CLAIM_STALE_S = 120
+
+IMDS_POOL_SIZE = 8
+IMDS_TOKEN_TTL_S = 21600
+IMDS_TOKEN_REFRESH_MARGIN_S = 60
+IMDS_SNAPSHOT_TTL_S = 30.0
+IMDS_MAC_KEYS = ("interface-id", "device-number", "network-card", "subnet-id", "local-ipv4s")
+
+CATALOG_PATH = "/etc/weka/instance-catalog.json"
+STATE_PATH = "/etc/weka/mounter-state.json"
+STATE_SCHEMA_VERSION = 1
+
+# backend selection: candidates are probed in parallel, mounts try them fastest first
+BACKEND_PORT = 14000
+BACKEND_PROBE_TIMEOUT_S = 2.0
+BACKEND_PROBE_WORKERS = 16
+MOUNT_ATTEMPT_TIMEOUT_S = 120  # per backend, capped by its share of what is left of the start budget
+MOUNT_START_TIMEOUT_S = 300  # TimeoutStartSec of weka-mount@
+MOUNT_START_MARGIN_S = 10  # kept back from TimeoutStartSec for the probes and reporting
+
+# weka_umount.sh: phases run in order within a hard time budget until the mount is gone
+UMOUNT_PHASES = ("flush", "umount", "kill", "lazy", "force")
+UMOUNT_BUDGET_S = 60  # well below TimeoutStopSec
+
+NIC_RESOLVE_TIMEOUT_S = 120.0
+NIC_RECHECK_S = 0.2  # udev settle re-check while no link events arrive
+NIC_IMDS_RECHECK_S = 2.0  # only for ENIs whose MAC is not already known
+NIC_SETTLE_TIMEOUT_S = 10  # weka_mount.sh: udev settle when a recorded MAC is not (yet) a netdev
 
 
 TEMPLATE_UNIT = f"""[Unit]
@@ -54,7 +181,7 @@ Type=oneshot
 RemainAfterExit=yes
 ExecStart={MOUNT_SH_PATH} %i
 ExecStop={UMOUNT_SH_PATH} %i
-TimeoutStartSec=300
+TimeoutStartSec={MOUNT_START_TIMEOUT_S}
 TimeoutStopSec=300
 
 [Install]
@@ -64,11 +191,29 @@ WantedBy=multi-user.target
 MOUNT_SH = f"""#!/bin/bash
 set -euo pipefail
 
+# TimeoutStartSec runs from here; the mount attempts share what is left of it
+start=$(date +%s)
+budget=$(( {MOUNT_START_TIMEOUT_S} - {MOUNT_START_MARGIN_S} ))
+
 log() {{
   logger -t weka_mount "$1"
   echo "$1" >&2
 }}
 
+# with the --async-mount drop-in (Type=notify), systemd-notify reports progress and readiness
+notify() {{
+  if [ -n "${{NOTIFY_SOCKET:-}}" ]; then systemd-notify "$@" || true; fi
+}}
+
+ready() {{
+  if [ -n "${{NOTIFY_SOCKET:-}}" ]; then
+    systemd-notify --ready --status="$1"
+    # the main process must outlive READY=1; systemd ends it after ExecStop
+    exec sleep infinity
+  fi
+  exit 0
+}}
+
 if [ $# -ne 1 ]; then
   log "Usage: $0 <fs_instance>"
   exit 1
@@ -95,7 +240,7 @@ done
 
 if mountpoint -q "$MOUNT_POINT"; then
   log "Already mounted: $MOUNT_POINT"
-  exit 0
+  ready "Already mounted: $MOUNT_POINT"
 fi
 
 mkdir -p "$MOUNT_POINT"
@@ -107,7 +252,42 @@ if [ "$MODE" = "dpdk" ]; then
     log "DPDK mode requires DPDK_NETS and CORES"
     exit 1
   fi
-  for nic in $DPDK_NETS; do
+  # DPDK_ENIS ("<eni>=<mac> ...", in DPDK_NETS order) is authoritative: kernel names can change
+  # across reboots and stop/start, MACs cannot. Re-resolve the names locally, without EC2 or IMDS.
+  nets=($DPDK_NETS)
+  if [ -n "${{DPDK_ENIS:-}}" ]; then
+    resolve_nets() {{
+      local i=0 pair mac addr dev
+      missing=()
+      for pair in $DPDK_ENIS; do
+        mac="${{pair#*=}}"
+        dev=""
+        for addr in /sys/class/net/*/address; do
+          if [ "$(cat "$addr" 2>/dev/null)" = "$mac" ]; then
+            dev="$(basename "$(dirname "$addr")")"
+            break
+          fi
+        done
+        if [ -n "$dev" ]; then nets[$i]="$dev"; else missing+=("$pair"); fi
+        i=$((i + 1))
+      done
+    }}
+    resolve_nets
+    if [ "${{#missing[@]}}" -gt 0 ]; then
+      udevadm settle --timeout={NIC_SETTLE_TIMEOUT_S} 2>/dev/null || true
+      resolve_nets
+    fi
+    # a NIC already handed to DPDK (client container running) is no longer a netdev: keep its name
+    if [ "${{#missing[@]}}" -gt 0 ]; then
+      log "No netdev for ${{missing[*]}}; using the recorded names for them"
+    fi
+    if [ "${{nets[*]}}" != "$DPDK_NETS" ]; then
+      log "DPDK NICs renamed: $DPDK_NETS -> ${{nets[*]}}"
+    fi
+  fi
+  mkdir -p /run/weka/mount.d
+  echo "${{nets[*]}}" > "/run/weka/mount.d/${{FS_INSTANCE}}.nets"
+  for nic in "${{nets[@]}}"; do
     cmd+=("-o" "net=${{nic}}")
   done
   for core in $CORES; do
@@ -117,12 +297,79 @@ else
   cmd+=("-o" "net=udp")
 fi
 
-cmd+=("${{ALB_HOST}}/${{FS_NAME}}" "${{MOUNT_POINT}}")
+if [ "$MODE" != "dpdk" ] && [ -n "${{UDP_CORES:-}}" ]; then
+  cmd+=("-o" "num_cores=${{UDP_CORES}}")
+fi
+
+# profile options first, so explicit MOUNT_OPTIONS override them
+IFS=',' read -r -a extra_opts <<< "${{PROFILE_OPTIONS:-}},${{MOUNT_OPTIONS:-}}"
+for opt in "${{extra_opts[@]}}"; do
+  if [ -n "$opt" ]; then cmd+=("-o" "$opt"); fi
+done
+
+# backend candidates: BACKENDS (ranked by the installer) plus the ALB, re-probed on every start
+candidates=()
+for b in ${{BACKENDS:-}} "$ALB_HOST"; do
+  case " ${{candidates[*]:-}} " in *" $b "*) ;; *) candidates+=("$b") ;; esac
+done
 
-log "Executing: ${{cmd[*]}}"
-"${{cmd[@]}}"
+probe() {{
+  # prints "<connect ms> <host>", nothing if unreachable
+  local t0 t1
+  t0=$(date +%s%N)
+  if timeout {BACKEND_PROBE_TIMEOUT_S:g} bash -c 'exec 3<>"/dev/tcp/$1/{BACKEND_PORT}"' probe "$1" 2>/dev/null; then
+    t1=$(date +%s%N)
+    echo "$(( (t1 - t0) / 1000000 )) $1"
+  fi
+}}
 
-log "Mounted ${{ALB_HOST}}/${{FS_NAME}} at ${{MOUNT_POINT}}"
+ranked=("${{candidates[@]}}")
+if [ "${{#candidates[@]}}" -gt 1 ]; then
+  probe_out="$(mktemp)"
+  for b in "${{candidates[@]}}"; do
+    probe "$b" >> "$probe_out" &
+  done
+  wait
+  mapfile -t ranked < <(sort -n "$probe_out" | awk '{{print $2}}')
+  log "Backend latency (ms): $(sort -n "$probe_out" | tr '\n' ' ')"
+  rm -f "$probe_out"
+  # unreachable candidates go last, they may just be slow to answer
+  for b in "${{candidates[@]}}"; do
+    case " ${{ranked[*]:-}} " in *" $b "*) ;; *) ranked+=("$b") ;; esac
+  done
+fi
+
+base=("${{cmd[@]}}")
+attempt_timeout="${{MOUNT_ATTEMPT_TIMEOUT:-{MOUNT_ATTEMPT_TIMEOUT_S}}}"
+for i in "${{!ranked[@]}}"; do
+  b="${{ranked[$i]}}"
+  remaining=$(( start + budget - $(date +%s) ))
+  if [ "$remaining" -le 0 ]; then
+    log "Start budget used up; not tried: ${{ranked[*]:$i}}"
+    break
+  fi
+  # split what is left evenly over the backends still to try, at most MOUNT_ATTEMPT_TIMEOUT
+  # each except for the last, so every candidate is tried before systemd stops the unit
+  slice=$(( remaining / (${{#ranked[@]}} - i) ))
+  if [ "$i" -lt $(( ${{#ranked[@]}} - 1 )) ] && [ "$slice" -gt "$attempt_timeout" ]; then
+    slice="$attempt_timeout"
+  fi
+  [ "$slice" -gt 0 ] || slice=1
+  cmd=("${{base[@]}}" "${{b}}/${{FS_NAME}}" "${{MOUNT_POINT}}")
+  log "Executing (timeout ${{slice}}s): ${{cmd[*]}}"
+  notify --status="Mounting ${{b}}/${{FS_NAME}}"
+  rc=0; timeout "$slice" "${{cmd[@]}}" || rc=$?
+  if [ "$rc" -eq 0 ] || mountpoint -q "$MOUNT_POINT"; then
+    mkdir -p /run/weka/mount.d
+    echo "$b" > "/run/weka/mount.d/${{FS_INSTANCE}}.backend"
+    log "Mounted ${{b}}/${{FS_NAME}} at ${{MOUNT_POINT}}"
+    ready "Mounted ${{b}}/${{FS_NAME}} at ${{MOUNT_POINT}}"
+  fi
+  log "Mount via $b failed (rc=$rc)"
+done
+
+log "Mount failed on all backends: ${{ranked[*]}}"
+exit 1
 """
 
 UMOUNT_SH = f"""#!/bin/bash
@@ -154,40 +401,449 @@ if [ -z "${{MOUNT_POINT:-}}" ]; then
   exit 1
 fi
 
-if ! mountpoint -q "$MOUNT_POINT"; then
+# /proc/self/mountinfo instead of mountpoint(1), which stats the mount point and can hang on it
+is_mounted() {{
+  awk -v mp="$MOUNT_POINT" '$5 == mp {{ found = 1 }} END {{ exit !found }}' /proc/self/mountinfo
+}}
+
+if ! is_mounted; then
   log "Not mounted: $MOUNT_POINT"
   exit 0
 fi
 
-check_network() {{
-  local host
-  host="$(weka local ps 2>/dev/null | grep -oP 'host=\\K[^ ]+' | head -1 || true)"
-  [ -n "$host" ] || return 1
-  ping -c 1 "$host" >/dev/null 2>&1
+now_ms() {{
+  echo $(( $(date +%s%N) / 1000000 ))
 }}
 
-do_umount() {{
-  local mp="$1"
-  local force="$2"
-  local opts=()
-  [ "$force" = "force" ] && opts+=("-f")
-  umount "${{opts[@]}}" "$mp"
+# run "$@" for at most $1 ms; a child stuck in uninterruptible I/O is abandoned, not waited for
+run_bounded() {{
+  local ms="$1"; shift
+  "$@" &
+  local pid=$! end=$(( $(now_ms) + ms ))
+  while kill -0 "$pid" 2>/dev/null; do
+    if [ "$(now_ms)" -ge "$end" ]; then
+      disown "$pid" 2>/dev/null || true
+      kill -KILL "$pid" 2>/dev/null || true
+      return 124
+    fi
+    sleep 0.1
+  done
+  wait "$pid"
+}}
+
+# pids with a cwd, root or open file under the mount point (readlink only, never touches the fs)
+holders() {{
+  local p link
+  for p in /proc/[0-9]*; do
+    [ "${{p#/proc/}}" = "$$" ] && continue
+    for link in "$p"/cwd "$p"/root "$p"/fd/*; do
+      link="$(readlink "$link" 2>/dev/null)" || continue
+      case "$link" in
+        "$MOUNT_POINT"|"$MOUNT_POINT"/*) echo "${{p#/proc/}}"; break ;;
+      esac
+    done
+  done
 }}
 
-log "Unmounting $MOUNT_POINT"
-if ! check_network; then
-  log "Network down/WEKA unavailable -> force unmount"
-  do_umount "$MOUNT_POINT" "force"
-  exit $?
+handle_holders() {{
+  local pids pid
+  pids="$(holders)"
+  [ -n "$pids" ] || return 0
+  for pid in $pids; do
+    log "Holder of $MOUNT_POINT: pid=$pid comm=$(cat "/proc/$pid/comm" 2>/dev/null || echo '?')"
+  done
+  [ "${{UMOUNT_HOLDERS:-kill}}" = "kill" ] || return 0
+  kill -TERM $pids 2>/dev/null || true
+  sleep 1
+  kill -KILL $pids 2>/dev/null || true
+}}
+
+phase() {{
+  case "$1" in
+    flush)  sync -f "$MOUNT_POINT" ;;
+    umount) umount "$MOUNT_POINT" ;;
+    kill)   handle_holders ;;
+    lazy)   umount -l "$MOUNT_POINT" ;;
+    force)  umount -f "$MOUNT_POINT" ;;
+    *)      log "Unknown unmount phase: $1"; return 1 ;;
+  esac
+}}
+
+budget_ms=$(( ${{UMOUNT_BUDGET:-{UMOUNT_BUDGET_S}}} * 1000 ))
+read -r -a phases <<< "${{UMOUNT_PHASES:-{" ".join(UMOUNT_PHASES)}}}"
+start=$(now_ms)
+timings=()
+result="still mounted"
+
+log "Unmounting $MOUNT_POINT (budget ${{budget_ms}}ms, phases: ${{phases[*]}})"
+for i in "${{!phases[@]}}"; do
+  remaining=$(( start + budget_ms - $(now_ms) ))
+  [ "$remaining" -gt 0 ] || break
+  # split what is left of the budget evenly over the phases still to run
+  slice=$(( remaining / (${{#phases[@]}} - i) ))
+  t0=$(now_ms)
+  rc=0; run_bounded "$slice" phase "${{phases[$i]}}" || rc=$?
+  timings+=("${{phases[$i]}}=$(( $(now_ms) - t0 ))ms/rc=$rc")
+  if ! is_mounted; then
+    result="unmounted"
+    break
+  fi
+done
+
+log "Unmount $MOUNT_POINT: $result in $(( $(now_ms) - start ))ms [${{timings[*]}}]"
+[ "$result" = "unmounted" ]
+"""
+
+HUGEPAGES_SH = f"""#!/bin/bash
+# Reserve the DPDK client's hugepages per NUMA node (never shrinking the pool) and fail,
+# before any mount is attempted, if the kernel cannot provide them.
+set -euo pipefail
+
+log() {{
+  logger -t weka_hugepages "$1"
+  echo "$1" >&2
+}}
+
+# HUGEPAGE_KB, NODE_PAGES="<node>:<pages> ..."
+# shellcheck disable=SC1091
+source "{HUGEPAGES_CONF_PATH}"
+
+mkdir -p "$(dirname "{HUGEPAGES_STATUS_PATH}")"
+: > "{HUGEPAGES_STATUS_PATH}"
+short=()
+for entry in $NODE_PAGES; do
+  node="${{entry%%:*}}"
+  want="${{entry#*:}}"
+  f="/sys/devices/system/node/node${{node}}/hugepages/hugepages-${{HUGEPAGE_KB}}kB/nr_hugepages"
+  if [ ! -w "$f" ]; then
+    log "node $node: no ${{HUGEPAGE_KB}}kB hugepage pool at $f"
+    short+=("node${{node}}:0/${{want}}")
+    echo "$node $want 0" >> "{HUGEPAGES_STATUS_PATH}"
+    continue
+  fi
+  have=$(cat "$f")
+  attempt=0
+  while [ "$have" -lt "$want" ] && [ "$attempt" -le {HUGEPAGE_COMPACT_RETRIES} ]; do
+    if [ "$attempt" -gt 0 ]; then
+      # fragmented memory: drop clean page cache and compact before asking again
+      sync
+      echo 1 > /proc/sys/vm/drop_caches
+      echo 1 > /proc/sys/vm/compact_memory
+    fi
+    echo "$want" > "$f" || true
+    have=$(cat "$f")
+    attempt=$((attempt + 1))
+  done
+  echo "$node $want $have" >> "{HUGEPAGES_STATUS_PATH}"
+  if [ "$have" -lt "$want" ]; then
+    short+=("node${{node}}:${{have}}/${{want}}")
+  else
+    log "node $node: $have x ${{HUGEPAGE_KB}}kB hugepages (need $want)"
+  fi
+done
+
+if [ "${{#short[@]}}" -gt 0 ]; then
+  log "Hugepage shortfall (have/need pages of ${{HUGEPAGE_KB}}kB): ${{short[*]}}"
+  exit 1
 fi
+"""
 
-if do_umount "$MOUNT_POINT" ""; then
-  log "Unmounted cleanly: $MOUNT_POINT"
-  exit 0
+# early in boot, before memory fragments; weka-mount@ requires it through HUGEPAGES_DROPIN
+HUGEPAGES_UNIT = f"""[Unit]
+Description=Reserve hugepages for the WEKA DPDK client
+DefaultDependencies=no
+After=local-fs.target
+Before=sysinit.target shutdown.target
+Conflicts=shutdown.target
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+ExecStart={HUGEPAGES_SH_PATH}
+
+[Install]
+WantedBy=sysinit.target
+"""
+
+HUGEPAGES_DROPIN = """[Unit]
+Requires=weka-hugepages.service
+After=weka-hugepages.service
+"""
+
+NETTUNE_SH = f"""#!/bin/bash
+# Tune what WEKA traffic depends on: keep IRQs (and irqbalance) off the DPDK polling cores, and
+# give the UDP-mode data interface all hardware queues, maximum rings and jumbo MTU.
+# `apply` only changes what differs and then verifies; `verify` only checks. Results go to STATUS.
+set -uo pipefail
+
+log() {{
+  logger -t weka_nettune "$1"
+  echo "$1" >&2
+}}
+
+# WEKA_CORES, ALLOWED_CPUS, WEKA_CPU_MASK, UDP_MGMT_IP, MTU, RINGS, QUEUES
+# shellcheck disable=SC1091
+source "{NETTUNE_CONF_PATH}"
+
+action="${{1:-apply}}"
+STATUS="{NETTUNE_STATUS_PATH}"
+UNMOVABLE="$STATUS.unmovable"
+mkdir -p "$(dirname "$STATUS")"
+: > "$STATUS"
+failed=0
+
+status() {{
+  # status <ok|warn|fail> <what> <detail...>
+  echo "$*" >> "$STATUS"
+  if [ "$1" = "fail" ]; then failed=1; fi
+  if [ "$1" != "ok" ]; then log "$*"; fi
+}}
+
+expand_cpus() {{
+  local part
+  for part in ${{1//,/ }}; do
+    if [[ "$part" == *-* ]]; then seq "${{part%-*}}" "${{part#*-}}"; else echo "$part"; fi
+  done
+}}
+
+declare -A weka_core=()
+for c in $(expand_cpus "$WEKA_CORES"); do weka_core[$c]=1; done
+
+on_weka_cores() {{
+  local c
+  for c in $(expand_cpus "$1"); do
+    if [ -n "${{weka_core[$c]:-}}" ]; then return 0; fi
+  done
+  return 1
+}}
+
+irq_name() {{
+  awk -v irq="$1:" '$1 == irq {{print $NF}}' /proc/interrupts
+}}
+
+set_var() {{
+  # set_var <file> <key> <value>; returns 0 if the file changed
+  local line="$2=\\"$3\\""
+  if grep -qxF "$line" "$1"; then return 1; fi
+  if grep -q "^#\\?$2=" "$1"; then
+    sed -i "s|^#\\?$2=.*|$line|" "$1"
+  else
+    echo "$line" >> "$1"
+  fi
+}}
+
+apply_irqs() {{
+  local d restart=0 f
+  : > "$UNMOVABLE"
+  for d in /proc/irq/[0-9]*; do
+    [ -f "$d/smp_affinity_list" ] || continue
+    if on_weka_cores "$(cat "$d/smp_affinity_list")"; then
+      # kernel-managed IRQs (e.g. NVMe queues) refuse new affinities
+      echo "$ALLOWED_CPUS" 2>/dev/null > "$d/smp_affinity_list" || echo "${{d##*/}}" >> "$UNMOVABLE"
+    fi
+  done
+  for f in /etc/sysconfig/irqbalance /etc/default/irqbalance; do
+    [ -f "$f" ] || continue
+    # CPULIST for irqbalance >= 1.8, the mask for older versions
+    if set_var "$f" IRQBALANCE_BANNED_CPULIST "$WEKA_CORES"; then restart=1; fi
+    if set_var "$f" IRQBALANCE_BANNED_CPUS "$WEKA_CPU_MASK"; then restart=1; fi
+  done
+  if [ "$restart" = 1 ] && systemctl is-active -q irqbalance; then
+    systemctl restart irqbalance
+  fi
+}}
+
+verify_irqs() {{
+  local d irq bad=() managed=()
+  for d in /proc/irq/[0-9]*; do
+    [ -f "$d/smp_affinity_list" ] || continue
+    irq="${{d##*/}}"
+    if on_weka_cores "$(cat "$d/smp_affinity_list")"; then
+      if grep -qx "$irq" "$UNMOVABLE" 2>/dev/null; then
+        managed+=("$irq:$(irq_name "$irq")")
+      else
+        bad+=("$irq:$(irq_name "$irq")")
+      fi
+    fi
+  done
+  if [ "${{#bad[@]}}" -gt 0 ]; then
+    status fail irqs "IRQs on WEKA cores $WEKA_CORES: ${{bad[*]}}"
+  else
+    status ok irqs "no movable IRQ on WEKA cores $WEKA_CORES"
+  fi
+  if [ "${{#managed[@]}}" -gt 0 ]; then
+    status warn irqs "kernel-managed IRQs on WEKA cores: ${{managed[*]}}"
+  fi
+}}
+
+udp_iface() {{
+  ip -o -4 addr show | awk -v ip="$UDP_MGMT_IP" '{{split($4, a, "/")}} a[1] == ip {{print $2; exit}}'
+}}
+
+ethtool_get() {{
+  # ethtool_get <-l|-g> <iface> <max|cur> <field>
+  local section="^Pre-set maximums"
+  if [ "$3" = "cur" ]; then section="^Current hardware settings"; fi
+  ethtool "$1" "$2" 2>/dev/null | awk -v s="$section" -v f="$4:" '$0 ~ s {{on=1; next}} /^[A-Z].*:$/ {{on=0}} on && $1 == f {{print $2; exit}}'
+}}
+
+want() {{
+  # want <setting> <hardware max>
+  if [ "$1" = "max" ]; then echo "$2"; else echo "$1"; fi
+}}
+
+nic_settings() {{
+  # prints "<what> <current> <wanted> <ethtool args>" for every setting to enforce
+  local iface="$1" max cur dir
+  if [ -n "$QUEUES" ]; then
+    max=$(ethtool_get -l "$iface" max Combined)
+    cur=$(ethtool_get -l "$iface" cur Combined)
+    if [[ "$max" =~ ^[0-9]+$ ]]; then
+      echo "queues $cur $(want "$QUEUES" "$max") -L combined"
+    fi
+  fi
+  if [ -n "$RINGS" ]; then
+    for dir in RX TX; do
+      max=$(ethtool_get -g "$iface" max "$dir")
+      cur=$(ethtool_get -g "$iface" cur "$dir")
+      if [[ "$max" =~ ^[0-9]+$ ]]; then
+        echo "ring_${{dir,,}} $cur $(want "$RINGS" "$max") -G ${{dir,,}}"
+      fi
+    done
+  fi
+}}
+
+apply_nic() {{
+  local iface="$1" what cur wanted opt key
+  while read -r what cur wanted opt key; do
+    if [ "$cur" != "$wanted" ]; then
+      ethtool "$opt" "$iface" "$key" "$wanted" || log "ethtool $opt $iface $key $wanted failed"
+    fi
+  done < <(nic_settings "$iface")
+  if [ -n "$MTU" ] && [ "$(cat "/sys/class/net/$iface/mtu")" != "$MTU" ]; then
+    ip link set dev "$iface" mtu "$MTU" || log "Setting MTU $MTU on $iface failed"
+  fi
+}}
+
+verify_nic() {{
+  local iface="$1" what cur wanted rest mtu
+  while read -r what cur wanted rest; do
+    if [ "$cur" = "$wanted" ]; then
+      status ok "$what" "$iface $cur"
+    else
+      status fail "$what" "$iface is $cur, want $wanted"
+    fi
+  done < <(nic_settings "$iface")
+  if [ -n "$MTU" ]; then
+    mtu=$(cat "/sys/class/net/$iface/mtu")
+    if [ "$mtu" = "$MTU" ]; then
+      status ok mtu "$iface $mtu"
+    else
+      status fail mtu "$iface is $mtu, want $MTU"
+    fi
+  fi
+}}
+
+if [ -n "$WEKA_CORES" ]; then
+  if [ "$action" = "apply" ]; then apply_irqs; fi
+  verify_irqs
 fi
 
-log "Clean unmount failed -> force unmount"
-do_umount "$MOUNT_POINT" "force"
+if [ -n "$UDP_MGMT_IP" ]; then
+  iface="$(udp_iface)"
+  if [ -z "$iface" ]; then
+    status fail nic "no interface holds $UDP_MGMT_IP"
+  else
+    if [ "$action" = "apply" ]; then apply_nic "$iface"; fi
+    verify_nic "$iface"
+  fi
+fi
+
+exit "$failed"
+"""
+
+NETTUNE_UNIT = f"""[Unit]
+Description=Tune NIC IRQs, queues, rings and MTU for WEKA
+After=network-online.target irqbalance.service
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+ExecStart={NETTUNE_SH_PATH} apply
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+# Wants, not Requires: a tuning failure is reported but does not block the mount
+NETTUNE_DROPIN = """[Unit]
+Wants=weka-nettune.service
+After=weka-nettune.service
+"""
+
+# --async-mount: the unit is active once weka_mount.sh sends READY=1 after the mount, so units
+# ordered after it (slurmd, the other filesystems) wait for the mount, not just for the start
+MOUNT_NOTIFY_DROPIN = """[Service]
+Type=notify
+NotifyAccess=all
+RemainAfterExit=no
+"""
+
+
+def mount_order_dropin(first_unit: str) -> str:
+    """Start an additional filesystem once the first one, which brings up the client container, is ready."""
+    return f"""[Unit]
+After={first_unit}
+"""
+
+
+def slurmd_dropin(unit: str) -> str:
+    """Hold slurmd until the mount is ready; Wants, so stopping or restarting the mount leaves slurmd running."""
+    return f"""[Unit]
+Wants={unit}
+After={unit}
+"""
+
+
+CPUSET_VERIFY_TIMER = """[Unit]
+Description=Periodic WEKA core isolation check
+
+[Timer]
+OnBootSec=5min
+OnUnitActiveSec=5min
+
+[Install]
+WantedBy=timers.target
+"""
+
+
+def cpuset_verify_unit(cores: List[str], textfile_dir: str) -> str:
+    return f"""[Unit]
+Description=Verify that only WEKA runs on the WEKA client cores
+After=weka-agent.service
+
+[Service]
+Type=oneshot
+Environment=TEXTFILE_DIR={textfile_dir}
+ExecStart={CPUSET_SH_PATH} verify "{" ".join(cores)}"
+"""
+
+
+def exporter_unit(textfile_dir: str) -> str:
+    return f"""[Unit]
+Description=WEKA client metrics exporter (node_exporter textfile)
+After=weka-agent.service
+
+[Service]
+Type=simple
+ExecStart=/usr/bin/python3 {EXPORTER_PY_PATH} --textfile-dir {textfile_dir} --env-dir {ENV_DIR}
+Restart=always
+RestartSec=15
+Nice=10
+
+[Install]
+WantedBy=multi-user.target
 """
 
 
@@ -199,10 +855,150 @@ logging.basicConfig(
 log = logging.getLogger("weka-mounter")
 
 
+# --- timing ---
+def uptime_s() -> Optional[float]:
+    try:
+        with open("/proc/uptime", "r") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SpanRecorder:
+    """
+    Structured timing of the provisioning phases. Every finished span (name, start, end,
+    duration, outcome, attributes) is appended to a JSON-lines file; finish() writes the
+    per-phase totals as Prometheus textfile metrics and optionally logs a summary. The
+    SageMaker HyperPod lifecycle scripts record their steps in the same format.
+    """
+
+    def __init__(self) -> None:
+        self.spans: List[Dict] = []
+        self.path: Optional[str] = None
+        self.textfile_dir: Optional[str] = None
+        self.summary = False
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self._lock = threading.Lock()
+
+    def configure(self, path: Optional[str], textfile_dir: Optional[str], summary: bool) -> None:
+        self.path = path
+        self.textfile_dir = textfile_dir
+        self.summary = summary
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict]:
+        """Time the enclosed block; the yielded dict takes extra attributes."""
+        rec: Dict = {"run_id": self.run_id, "name": name, "start": time.time(), "uptime_s": uptime_s(), "attrs": attrs}
+        t0 = time.monotonic()
+        outcome = "ok"
+        try:
+            yield rec["attrs"]
+        except BaseException as e:
+            outcome = "error"
+            rec["error"] = str(e)[:200]
+            raise
+        finally:
+            rec.update(end=time.time(), duration_s=round(time.monotonic() - t0, 6), outcome=outcome)
+            with self._lock:
+                self.spans.append(rec)
+                self._write_line(rec)
+
+    def _write_line(self, rec: Dict) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(rec, sort_keys=True) + "\n")
+        except OSError as e:
+            log.debug("Cannot write span to %s: %s", self.path, e)
+
+    def write_prometheus(self) -> None:
+        totals: Dict[Tuple[str, str], List[float]] = {}
+        for rec in self.spans:
+            t = totals.setdefault((rec["name"], rec["outcome"]), [0.0, 0])
+            t[0] += rec["duration_s"]
+            t[1] += 1
+        lines = [
+            "# HELP weka_boot_phase_duration_seconds Time spent in each provisioning phase during the last run",
+            "# TYPE weka_boot_phase_duration_seconds gauge",
+        ]
+        lines += [
+            f'weka_boot_phase_duration_seconds{{phase="{n}",outcome="{o}"}} {t[0]!r}'
+            for (n, o), t in sorted(totals.items())
+        ]
+        lines += [
+            "# HELP weka_boot_phase_count Spans recorded for each phase during the last run",
+            "# TYPE weka_boot_phase_count gauge",
+        ]
+        lines += [f'weka_boot_phase_count{{phase="{n}",outcome="{o}"}} {t[1]}' for (n, o), t in sorted(totals.items())]
+        up = uptime_s()
+        if up is not None:
+            lines += [
+                "# HELP weka_boot_uptime_at_finish_seconds System uptime when the last run finished (boot-to-mount)",
+                "# TYPE weka_boot_uptime_at_finish_seconds gauge",
+                f"weka_boot_uptime_at_finish_seconds {up!r}",
+            ]
+        os.makedirs(self.textfile_dir, exist_ok=True)
+        path = os.path.join(self.textfile_dir, "weka_boot.prom")
+        write_file(f"{path}.tmp", "\n".join(lines) + "\n", 0o644)
+        os.replace(f"{path}.tmp", path)
+
+    def finish(self) -> None:
+        if not self.spans:
+            return
+        if self.textfile_dir:
+            try:
+                self.write_prometheus()
+            except OSError as e:
+                log.warning("Cannot write boot timings to %s: %s", self.textfile_dir, e)
+        if self.summary:
+            log.info("Timings: phase duration_ms outcome")
+            for rec in sorted(self.spans, key=lambda r: r["start"]):
+                log.info("  %s %.0f %s", rec["name"], rec["duration_s"] * 1000, rec["outcome"])
+
+
+# one recorder per process, like EC2_LAYER
+SPANS = SpanRecorder()
+
+
 # --- helpers ---
-def sh(cmd: List[str], *, check: bool = True, capture: bool = False) -> subprocess.CompletedProcess:
+def sh(
+    cmd: List[str], *, check: bool = True, capture: bool = False, cwd: Optional[str] = None
+) -> subprocess.CompletedProcess:
     log.debug("cmd: %s", " ".join(cmd))
-    return subprocess.run(cmd, check=check, text=True, capture_output=capture)
+    return subprocess.run(cmd, check=check, text=True, capture_output=capture, cwd=cwd)
+
+
+class PhaseCancelled(Exception):
+    """Raised by a phase that stops early because a concurrent phase failed."""
+
+
+def check_cancelled(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise PhaseCancelled("cancelled")
+
+
+def read_asset(assets: str, name: str) -> Optional[str]:
+    """
+    A script shipped beside weka-install.py, read from `assets` (a directory or an
+    s3://bucket/prefix/ URL); None if it is not there.
+    """
+    if not assets.startswith("s3://"):
+        try:
+            with open(os.path.join(assets, name), "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    load_cloud_deps()
+    bucket, _, prefix = assets[len("s3://"):].partition("/")
+    key = f"{prefix.strip('/')}/{name}" if prefix.strip("/") else name
+    try:
+        return boto3.client("s3").get_object(Bucket=bucket, Key=key)["Body"].read().decode()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise RuntimeError(f"Cannot read {assets.rstrip('/')}/{name}: {e}")
 
 
 def write_file(path: str, content: str, mode: int) -> None:
@@ -225,6 +1021,78 @@ def sanitize_instance_name(s: str) -> str:
     return re.sub(r"[^A-Za-z0-9._-]", "_", s.strip())
 
 
+def validate_mount_options(options: List[str]) -> List[str]:
+    # values end up inside a double-quoted shell assignment in the env file
+    for opt in options:
+        if not re.fullmatch(r"[A-Za-z0-9_.:/=+-]+", opt):
+            raise ValueError(f"invalid mount option '{opt}'")
+    return options
+
+
+def mount_option_arg(s: str) -> str:
+    try:
+        return validate_mount_options([s])[0]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def umount_phases_arg(s: str) -> List[str]:
+    phases = [p.strip() for p in s.split(",") if p.strip()]
+    bad = [p for p in phases if p not in UMOUNT_PHASES]
+    if bad or not phases:
+        raise argparse.ArgumentTypeError(f"invalid unmount phases '{s}' (from: {','.join(UMOUNT_PHASES)})")
+    return phases
+
+
+def valid_host(host: str) -> bool:
+    """An IP address or a DNS hostname; hosts end up in weka_mount.sh's probes and mount sources."""
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        pass
+    label = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+    return len(host) <= 253 and re.fullmatch(rf"{label}(?:\.{label})*", host) is not None
+
+
+def backends_arg(s: str) -> List[str]:
+    hosts = [h.strip() for h in s.split(",") if h.strip()]
+    bad = [h for h in hosts if not valid_host(h)]
+    if bad:
+        raise argparse.ArgumentTypeError(f"invalid backend hosts {','.join(bad)} (expected hostnames or IPs)")
+    return hosts
+
+
+class FilesystemSpec:
+    """One --filesystem value: name:mountpoint[:options]; options may include profile=<name>."""
+
+    def __init__(self, name: str, mount_point: str, options: str = "") -> None:
+        self.name = name
+        self.instance = sanitize_instance_name(name)
+        self.mount_point = mount_point
+        self.options = options
+        self.profile: Optional[str] = None
+        self.mount_options: List[str] = []
+        for opt in (o.strip() for o in options.split(",") if o.strip()):
+            if opt.startswith("profile="):
+                self.profile = opt.partition("=")[2]
+                if self.profile not in MOUNT_PROFILES:
+                    raise ValueError(f"unknown mount profile '{self.profile}'")
+            else:
+                self.mount_options.append(opt)
+        validate_mount_options(self.mount_options)
+
+    @classmethod
+    def parse(cls, s: str) -> "FilesystemSpec":
+        parts = s.split(":", 2)
+        if len(parts) < 2 or not parts[1].startswith("/"):
+            raise argparse.ArgumentTypeError(f"expected name:/mount/point[:options], got '{s}'")
+        try:
+            return cls(parts[0], parts[1], parts[2] if len(parts) == 3 else "")
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+
+
 def parse_semver(s: str) -> Tuple[int, int, int]:
     s = s.strip().lstrip("vV")
     m = re.search(r"(\d+)(?:\.(\d+))?(?:\.(\d+))?", s)
@@ -233,7 +1101,125 @@ def parse_semver(s: str) -> Tuple[int, int, int]:
     return (int(m.group(1)), int(m.group(2) or 0), int(m.group(3) or 0))
 
 
-def ensure_weka_installed(alb_host: str, min_version: Optional[str]) -> None:
+class InstallerCache:
+    """
+    Content-addressed store for WEKA client release tarballs, searched across several
+    directories (e.g. a prebaked AMI path, a shared filesystem, a local cache):
+
+        <dir>/blobs/<sha256>.tar   the tarball, named by its digest
+        <dir>/versions/<version>   the digest of that version's tarball
+
+    Every hit is re-hashed before use. Misses are downloaded once per directory under an
+    exclusive lock, so nodes sharing a cache path do not all hit the backends at once.
+    """
+
+    def __init__(self, dirs: List[str], pinned_sha256: Optional[str] = None) -> None:
+        self.dirs = dirs
+        self.pinned_sha256 = pinned_sha256.lower() if pinned_sha256 else None
+
+    @staticmethod
+    def _sha256(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _lookup_in(self, d: str, version: str) -> Optional[str]:
+        try:
+            with open(os.path.join(d, "versions", version), "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        if self.pinned_sha256 and digest != self.pinned_sha256:
+            log.warning("Installer cache %s: %s has sha256 %s, expected %s", d, version, digest, self.pinned_sha256)
+            return None
+        blob = os.path.join(d, "blobs", f"{digest}.tar")
+        if not os.path.isfile(blob):
+            return None
+        actual = self._sha256(blob)
+        if actual != digest:
+            log.warning("Installer cache %s: checksum mismatch for %s (%s != %s)", d, blob, actual, digest)
+            return None
+        return blob
+
+    def lookup(self, version: str) -> Optional[str]:
+        for d in self.dirs:
+            blob = self._lookup_in(d, version)
+            if blob:
+                log.info("Installer cache hit: %s -> %s", version, blob)
+                return blob
+        return None
+
+    def fetch(self, version: str, url: str) -> Optional[str]:
+        """Download `url` into the first writable cache directory; None if that is not possible."""
+        for d in self.dirs:
+            try:
+                os.makedirs(os.path.join(d, "blobs"), exist_ok=True)
+                os.makedirs(os.path.join(d, "versions"), exist_ok=True)
+                lock = open(os.path.join(d, f".lock-{version}"), "w")
+            except OSError:
+                continue
+            with lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # another node may have filled the cache while we waited for the lock
+                blob = self._lookup_in(d, version)
+                if blob:
+                    log.info("Installer cache hit after wait: %s -> %s", version, blob)
+                    return blob
+                tmp = os.path.join(d, "blobs", f".{version}.{os.getpid()}.part")
+                log.info("Installer cache miss: downloading %s into %s", url, d)
+                cp = sh(["curl", "--fail", "-k", "-L", "-s", "-S", "-o", tmp, url], check=False)
+                if cp.returncode != 0:
+                    if os.path.exists(tmp):
+                        os.unlink(tmp)
+                    log.warning("Download of %s failed (rc=%d)", url, cp.returncode)
+                    return None
+                digest = self._sha256(tmp)
+                if self.pinned_sha256 and digest != self.pinned_sha256:
+                    os.unlink(tmp)
+                    raise RuntimeError(f"Downloaded {url} has sha256 {digest}, expected {self.pinned_sha256}")
+                blob = os.path.join(d, "blobs", f"{digest}.tar")
+                os.replace(tmp, blob)
+                write_file(os.path.join(d, "versions", version), digest + "\n", 0o644)
+                return blob
+        return None
+
+
+def backend_version_from_script(script: str) -> Optional[str]:
+    """Find the release version the backend's install script is going to fetch."""
+    for pattern in (
+        r'VERSION\s*=\s*["\']?v?(\d+\.\d+\.\d+(?:\.\d+)?)',
+        r"weka-(\d+\.\d+\.\d+(?:\.\d+)?)",
+        r"/release/v?(\d+\.\d+\.\d+(?:\.\d+)?)",
+    ):
+        m = re.search(pattern, script)
+        if m:
+            return m.group(1)
+    return None
+
+
+def install_from_tarball(tarball: str) -> None:
+    with tempfile.TemporaryDirectory(prefix="weka-install-") as td:
+        sh(["tar", "-xf", tarball, "-C", td], check=True)
+        dirs = [e for e in os.listdir(td) if os.path.isfile(os.path.join(td, e, "install.sh"))]
+        if not dirs:
+            raise RuntimeError(f"No install.sh found in {tarball}")
+        sh(["./install.sh"], check=True, cwd=os.path.join(td, dirs[0]))
+
+
+def ensure_weka_installed(
+    alb_host: str,
+    min_version: Optional[str],
+    cache_dirs: Optional[List[str]] = None,
+    version: Optional[str] = None,
+    pinned_sha256: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[int, int, int]:
+    """
+    Install the WEKA client unless a recent enough one is present. With `cancel`, no
+    further download or install step starts once it is set (a running one finishes).
+    """
     want = parse_semver(min_version) if min_version else None
 
     def installed_version() -> Optional[Tuple[int, int, int]]:
@@ -249,19 +1235,43 @@ def ensure_weka_installed(alb_host: str, min_version: Optional[str]) -> None:
                     return None
         return None
 
-    have = installed_version()
+    with SPANS.span("install.check"):
+        have = installed_version()
     if have and (want is None or have >= want):
         log.info("WEKA already installed (version=%s)", have)
-        return
+        return have
 
     url = f"https://{alb_host}:14000/dist/v1/install"
-    log.info("Installing WEKA from %s", url)
+    cache = InstallerCache(cache_dirs or INSTALLER_CACHE_DIRS, pinned_sha256)
 
     with tempfile.TemporaryDirectory(prefix="weka-install-") as td:
         script_path = os.path.join(td, "install_script.sh")
-        sh(["curl", "--fail", "-k", "-L", "-o", script_path, url], check=True)
-        sh(["chmod", "+x", script_path], check=True)
-        sh([script_path], check=True)
+        with SPANS.span("install.cache_lookup") as sp:
+            tarball = cache.lookup(version) if version else None
+            sp["hit"] = bool(tarball)
+        if not tarball:
+            check_cancelled(cancel)
+            with SPANS.span("install.script_download", host=alb_host):
+                sh(["curl", "--fail", "-k", "-L", "-o", script_path, url], check=True)
+            with open(script_path, "r", errors="replace") as f:
+                version = version or backend_version_from_script(f.read())
+            if version:
+                tarball = cache.lookup(version)
+                if not tarball:
+                    check_cancelled(cancel)
+                    with SPANS.span("install.download", host=alb_host, version=version):
+                        tarball = cache.fetch(version, INSTALLER_RELEASE_URL.format(host=alb_host, version=version))
+
+        check_cancelled(cancel)
+        if tarball:
+            log.info("Installing WEKA %s from %s", version, tarball)
+            with SPANS.span("install.run", source="tarball", version=version):
+                install_from_tarball(tarball)
+        else:
+            log.info("Installing WEKA from %s", url)
+            with SPANS.span("install.run", source="script"):
+                sh(["chmod", "+x", script_path], check=True)
+                sh([script_path], check=True)
 
     have2 = installed_version()
     if not have2:
@@ -269,67 +1279,802 @@ def ensure_weka_installed(alb_host: str, min_version: Optional[str]) -> None:
     if want and have2 < want:
         raise RuntimeError(f"Installed WEKA version {have2} is below required {want}")
     log.info("WEKA installed (version=%s)", have2)
+    return have2
+
+
+def weka_json(cmd: List[str]) -> Optional[object]:
+    """Run a `weka ... -J` command; None if it fails or prints no JSON."""
+    cp = sh(["weka", *cmd, "-J"], check=False, capture=True)
+    if cp.returncode != 0:
+        return None
+    try:
+        return json.loads(cp.stdout)
+    except ValueError:
+        return None
+
+
+def client_resources(res: object) -> Tuple[List[str], List[str]]:
+    """(nets, cores) from `weka local resources -J`: its network devices and non-management cores."""
+    nets: List[str] = []
+    cores: Set[int] = set()
+    if not isinstance(res, dict):
+        return nets, []
+    for dev in res.get("net_devices") or []:
+        if isinstance(dev, dict) and (dev.get("name") or dev.get("device")):
+            nets.append(str(dev.get("name") or dev.get("device")))
+    nodes = res.get("nodes") or {}
+    for node in nodes.values() if isinstance(nodes, dict) else nodes:
+        if not isinstance(node, dict) or "MANAGEMENT" in (node.get("roles") or []):
+            continue
+        core = node.get("core_id")
+        if isinstance(core, int) and 0 <= core < 65535:  # the management process reports "any core"
+            cores.add(core)
+    return nets, [str(c) for c in sorted(cores)]
+
+
+def running_client_container() -> Optional[Dict]:
+    """Name, nets and cores of the running WEKA client container (`weka local ps`/`resources`), if any."""
+    if not shutil.which("weka"):
+        return None
+    ps = weka_json(["local", "ps"])
+    for c in ps if isinstance(ps, list) else []:
+        if not isinstance(c, dict):
+            continue
+        name = str(c.get("name") or c.get("container") or "")
+        state = str(c.get("state") or c.get("runStatus") or c.get("status") or "").lower()
+        kind = str(c.get("type") or c.get("containerType") or name).lower()
+        if name and state in ("running", "ready") and "client" in kind:
+            nets, cores = client_resources(weka_json(["local", "resources", "-C", name]))
+            return {"name": name, "nets": nets, "cores": cores}
+    return None
 
 
 # --- IMDS ---
-class EC2MetadataClient:
-    def __init__(self) -> None:
-        self.base = "http://169.254.169.254/latest"  # HTTP only (IMDS)
-        self.token = self._token()
+class MetadataSnapshot:
+    """Point-in-time view of the instance identity and the network/interfaces/macs tree."""
+
+    def __init__(self, identity: Dict, interfaces: Dict[str, Dict[str, str]], taken_at: float) -> None:
+        self.identity = identity
+        self.interfaces = interfaces  # mac -> {key: value}
+        self.taken_at = taken_at
+
+    @property
+    def instance_id(self) -> str:
+        return self.identity["instanceId"]
+
+    @property
+    def region(self) -> str:
+        return self.identity["region"]
+
+    @property
+    def private_ip(self) -> str:
+        return self.identity["privateIp"]
+
+    @property
+    def instance_type(self) -> str:
+        return self.identity["instanceType"]
+
+    def primary_interface(self) -> Dict[str, str]:
+        for vals in self.interfaces.values():
+            if vals.get("device-number") == "0" and vals.get("network-card", "0") == "0":
+                return vals
+        return {}
+
+    def eni_to_mac(self) -> Dict[str, str]:
+        return {v["interface-id"]: mac for mac, v in self.interfaces.items() if v.get("interface-id")}
+
+
+def imds_attached_macs() -> Optional[Set[str]]:
+    """
+    MACs of the ENIs attached to this instance (network/interfaces/macs), or None if IMDS does not
+    answer. Uses urllib, not EC2MetadataClient, so the rerun drift check stays free of requests.
+    """
+    endpoint = os.environ.get("AWS_EC2_METADATA_SERVICE_ENDPOINT", "http://169.254.169.254")
+    base = f"{endpoint.rstrip('/')}/latest"
+    try:
+        req = urllib.request.Request(
+            f"{base}/api/token", method="PUT", headers={"X-aws-ec2-metadata-token-ttl-seconds": "60"}
+        )
+        with urllib.request.urlopen(req, timeout=2) as r:
+            token = r.read().decode()
+        req = urllib.request.Request(
+            f"{base}/meta-data/network/interfaces/macs/", headers={"X-aws-ec2-metadata-token": token}
+        )
+        with urllib.request.urlopen(req, timeout=2) as r:
+            body = r.read().decode()
+    except OSError as e:
+        log.warning("IMDS MAC list unavailable: %s", e)
+        return None
+    return {m.strip("/").lower() for m in body.splitlines() if m.strip()}
+
 
-    def _token(self) -> str:
+class EC2MetadataClient:
+    def __init__(self, snapshot_ttl_s: float = IMDS_SNAPSHOT_TTL_S) -> None:
+        load_cloud_deps()
+        # AWS_EC2_METADATA_SERVICE_ENDPOINT is the SDKs' standard override (used by benchmark/)
+        endpoint = os.environ.get("AWS_EC2_METADATA_SERVICE_ENDPOINT", "http://169.254.169.254")
+        self.base = f"{endpoint.rstrip('/')}/latest"  # HTTP only (IMDS)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=IMDS_POOL_SIZE))
+        self.snapshot_ttl_s = snapshot_ttl_s
+
+        self._lock = threading.Lock()
+        self._token = ""
+        self._token_expires = 0.0
+        self._snapshot: Optional[MetadataSnapshot] = None
+
+    def _fetch_token(self) -> None:
         try:
-            r = requests.put(
+            r = self.session.put(
                 f"{self.base}/api/token",
-                headers={"X-aws-ec2-metadata-token-ttl-seconds": "21600"},
+                headers={"X-aws-ec2-metadata-token-ttl-seconds": str(IMDS_TOKEN_TTL_S)},
                 timeout=2,
             )
             r.raise_for_status()
-            return r.text
         except requests.RequestException as e:
             raise SystemExit(f"IMDS token error: {e}")
-
-    def get(self, path: str) -> str:
+        self._token = r.text
+        self._token_expires = time.monotonic() + IMDS_TOKEN_TTL_S - IMDS_TOKEN_REFRESH_MARGIN_S
+
+    @property
+    def token(self) -> str:
+        with self._lock:
+            if not self._token or time.monotonic() >= self._token_expires:
+                self._fetch_token()
+            return self._token
+
+    def _invalidate_token(self) -> None:
+        with self._lock:
+            self._token_expires = 0.0
+
+    def _request(self, url: str) -> "requests.Response":
+        r = self.session.get(url, headers={"X-aws-ec2-metadata-token": self.token}, timeout=2)
+        if r.status_code == 401:
+            # token expired or was revoked; fetch a new one and retry once
+            self._invalidate_token()
+            r = self.session.get(url, headers={"X-aws-ec2-metadata-token": self.token}, timeout=2)
+        return r
+
+    def _get(self, url: str, what: str) -> str:
         try:
-            r = requests.get(
-                f"{self.base}/meta-data/{path}",
-                headers={"X-aws-ec2-metadata-token": self.token},
-                timeout=2,
-            )
+            r = self._request(url)
             r.raise_for_status()
             return r.text
         except requests.RequestException as e:
-            raise SystemExit(f"IMDS get error ({path}): {e}")
+            raise SystemExit(f"IMDS get error ({what}): {e}")
+
+    def get(self, path: str) -> str:
+        return self._get(f"{self.base}/meta-data/{path}", path)
+
+    def dynamic(self, path: str) -> str:
+        return self._get(f"{self.base}/dynamic/{path}", path)
+
+    def snapshot(self, max_age: Optional[float] = None) -> MetadataSnapshot:
+        """
+        Return the cached snapshot if it is younger than `max_age` (default: the client TTL),
+        otherwise refetch it. MAC entries already known are reused, since an ENI's MAC and
+        interface-id never change; only newly appeared MACs are fetched.
+        """
+        ttl = self.snapshot_ttl_s if max_age is None else max_age
+        prev = self._snapshot
+        if prev and time.monotonic() - prev.taken_at < ttl:
+            return prev
+
+        identity = prev.identity if prev else json.loads(self.dynamic("instance-identity/document"))
+        macs = [m.strip("/").lower() for m in self.get("network/interfaces/macs/").splitlines() if m.strip()]
+        known = prev.interfaces if prev else {}
+        interfaces = {mac: known[mac] for mac in macs if mac in known}
+
+        def fetch(mac: str) -> Tuple[str, Dict[str, str]]:
+            vals: Dict[str, str] = {}
+            for key in IMDS_MAC_KEYS:
+                path = f"network/interfaces/macs/{mac}/{key}"
+                try:
+                    r = self._request(f"{self.base}/meta-data/{path}")
+                except requests.RequestException as e:
+                    raise SystemExit(f"IMDS get error ({path}): {e}")
+                if r.status_code == 404:
+                    # optional keys (e.g. network-card) are absent on some instance types
+                    continue
+                if not r.ok:
+                    raise SystemExit(f"IMDS get error ({path}): HTTP {r.status_code}")
+                vals[key] = r.text.strip()
+            return mac, vals
+
+        new_macs = [m for m in macs if m not in interfaces]
+        if new_macs:
+            with ThreadPoolExecutor(max_workers=min(len(new_macs), IMDS_POOL_SIZE)) as pool:
+                for mac, vals in pool.map(fetch, new_macs):
+                    interfaces[mac] = vals
+
+        self._snapshot = MetadataSnapshot(identity, interfaces, time.monotonic())
+        return self._snapshot
+
+
+# --- CPU topology ---
+def parse_cpulist(s: str) -> List[int]:
+    """Parse a kernel cpulist such as '0-3,8,10-11'."""
+    cpus: List[int] = []
+    for part in s.strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+class CoreSpec:
+    """--cores value: an explicit core list, or `auto[:N]` (N NICs; default one per NUMA node)."""
+
+    def __init__(self, cores: Optional[List[str]] = None, auto: bool = False, count: int = 0) -> None:
+        self.cores = cores or []
+        self.auto = auto
+        self.count = count
+
+    @classmethod
+    def parse(cls, s: str) -> "CoreSpec":
+        s = s.strip()
+        if s == "auto" or s.startswith("auto:"):
+            n = s.partition(":")[2]
+            if n and (not n.isdigit() or int(n) < 1):
+                raise argparse.ArgumentTypeError(f"invalid core count in '{s}'")
+            return cls(auto=True, count=int(n or 0))
+        cores = [c.strip() for c in s.split(",") if c.strip()]
+        if not cores or not all(c.isdigit() for c in cores):
+            raise argparse.ArgumentTypeError(f"expected comma-separated core IDs or auto[:N], got '{s}'")
+        return cls(cores=cores)
+
+
+class CpuTopology:
+    """Online CPUs, their NUMA nodes and hyperthread siblings, read from sysfs."""
+
+    def __init__(self, sysfs: str = "/sys") -> None:
+        self.sysfs = sysfs
+        cpu_dir = os.path.join(sysfs, "devices/system/cpu")
+        with open(os.path.join(cpu_dir, "online"), "r") as f:
+            self.online = set(parse_cpulist(f.read()))
+
+        self.cpu_node: Dict[int, int] = {}
+        node_dir = os.path.join(sysfs, "devices/system/node")
+        if os.path.isdir(node_dir):
+            for name in os.listdir(node_dir):
+                if not re.fullmatch(r"node\d+", name):
+                    continue
+                with open(os.path.join(node_dir, name, "cpulist"), "r") as f:
+                    for cpu in parse_cpulist(f.read()):
+                        self.cpu_node[cpu] = int(name[4:])
+        for cpu in self.online:
+            self.cpu_node.setdefault(cpu, 0)
+
+        self.siblings: Dict[int, List[int]] = {}
+        for cpu in self.online:
+            try:
+                with open(os.path.join(cpu_dir, f"cpu{cpu}/topology/thread_siblings_list"), "r") as f:
+                    self.siblings[cpu] = sorted(parse_cpulist(f.read()))
+            except FileNotFoundError:
+                self.siblings[cpu] = [cpu]
+
+    @property
+    def nodes(self) -> List[int]:
+        return sorted(set(self.cpu_node[c] for c in self.online))
+
+    def physical_cores(self, node: int) -> List[int]:
+        """One CPU (the lowest sibling) per physical core on `node`, excluding core 0's siblings."""
+        return sorted(
+            c for c in self.online
+            if self.cpu_node[c] == node and self.siblings[c][0] == c and 0 not in self.siblings[c]
+        )
+
+    def nic_node(self, ifname: str) -> int:
+        """NUMA node of a NIC's PCI device; -1 (unknown) is reported as node 0."""
+        try:
+            with open(os.path.join(self.sysfs, f"class/net/{ifname}/device/numa_node"), "r") as f:
+                return max(int(f.read().strip()), 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def select_dpdk_cores(self, nic_nodes: List[int]) -> List[str]:
+        """
+        Pick one physical core per NIC on the NIC's NUMA node, highest-numbered first,
+        never two hyperthreads of the same core and never core 0.
+        """
+        taken: Set[int] = set()
+        picked: List[str] = []
+        for node in nic_nodes:
+            free = [c for c in self.physical_cores(node) if c not in taken]
+            if not free:
+                raise RuntimeError(f"No free physical core left on NUMA node {node} for DPDK")
+            core = free[-1]
+            taken.add(core)
+            picked.append(str(core))
+        return picked
+
+    def check_cores(self, cores: List[str]) -> None:
+        """Validate a hand-picked core list: hard errors for unusable cores, warnings for shared cores."""
+        ids = [int(c) for c in cores]
+        if len(set(ids)) != len(ids):
+            raise RuntimeError(f"Duplicate cores in --cores: {cores}")
+        offline = [c for c in ids if c not in self.online]
+        if offline:
+            raise RuntimeError(f"Cores not online on this instance: {offline}")
+        seen: Dict[int, int] = {}
+        for c in ids:
+            phys = self.siblings[c][0]
+            if phys in seen:
+                log.warning("Cores %d and %d are hyperthread siblings of the same physical core", seen[phys], c)
+            seen[phys] = c
+            if 0 in self.siblings[c]:
+                log.warning("Core %d shares a physical core with CPU 0", c)
+
+    def check_numa(self, cores: List[str], nic_nodes: List[int]) -> None:
+        core_nodes = sorted(self.cpu_node[int(c)] for c in cores)
+        if core_nodes != sorted(nic_nodes):
+            log.warning("DPDK core NUMA nodes %s do not match NIC NUMA nodes %s", core_nodes, sorted(nic_nodes))
+
+
+def cpu_mask(cpus: List[int]) -> str:
+    """CPUs as a kernel hex mask in comma-separated 32-bit words, e.g. "00000000,00000c00"."""
+    mask = sum(1 << c for c in set(cpus))
+    words = [f"{mask & 0xFFFFFFFF:08x}"]
+    while mask >> 32:
+        mask >>= 32
+        words.append(f"{mask & 0xFFFFFFFF:08x}")
+    return ",".join(reversed(words))
+
+
+def client_memory_mb(option_lists: List[List[str]]) -> int:
+    """The client's memory_mb: the largest one given for any filesystem (they share one client)."""
+    sizes = [
+        int(opt.partition("=")[2])
+        for opts in option_lists for opt in opts
+        if opt.startswith("memory_mb=") and opt.partition("=")[2].isdigit()
+    ]
+    return max(sizes, default=WEKA_CLIENT_MEMORY_MB)
+
+
+def hugepage_plan(topo: CpuTopology, cores: List[str], ifnames: List[str], memory_mb: int) -> Dict[int, int]:
+    """Hugepages (of HUGEPAGE_KB) needed per NUMA node by a DPDK client on `cores` and `ifnames`."""
+    core_nodes = [topo.cpu_node[int(c)] for c in cores]
+    nodes = sorted(set(core_nodes))
+    mb: Dict[int, float] = {n: memory_mb / len(nodes) for n in nodes}
+    for n in core_nodes:
+        mb[n] += HUGEPAGE_PER_CORE_MB
+    for ifname in ifnames:
+        n = topo.nic_node(ifname)
+        mb[n] = mb.get(n, 0.0) + HUGEPAGE_PER_NIC_MB
+    return {n: -(-int(v * 1024) // HUGEPAGE_KB) for n, v in sorted(mb.items())}
+
+
+# --- EC2 request layer ---
+# error codes that mean "slow down"; these are always safe to retry
+EC2_THROTTLE_CODES = {
+    "RequestLimitExceeded",
+    "Throttling",
+    "ThrottlingException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "EC2ThrottledException",
+}
+# transient server-side errors, retried only for read-only calls
+EC2_TRANSIENT_CODES = {"InternalError", "InternalFailure", "ServiceUnavailable", "Unavailable"}
+
+
+class TokenBucket:
+    """Client-side rate limit shared by every EC2 call in this process."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the time waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class EC2CallStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failed = 0
+        self.latency_s = 0.0
+        self.max_latency_s = 0.0
+        self.rate_wait_s = 0.0
+
+
+class EC2RequestLayer:
+    """
+    Every EC2 call made by this script goes through here: it takes a token from the
+    client-side bucket, and is retried with decorrelated-jitter backoff when EC2 throttles
+    (or, for describe calls, fails transiently). botocore's own retries are disabled so the
+    two policies do not stack. Per-operation latency and retry counts are kept for
+    log_summary().
+    """
+
+    def __init__(
+        self,
+        rate: float = EC2_RATE,
+        burst: int = EC2_BURST,
+        max_retries: int = EC2_MAX_RETRIES,
+        backoff_base_s: float = EC2_BACKOFF_BASE_S,
+        backoff_cap_s: float = EC2_BACKOFF_CAP_S,
+    ) -> None:
+        self.configure(rate, burst, max_retries, backoff_base_s, backoff_cap_s)
+        self.stats: Dict[str, EC2CallStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def configure(
+        self,
+        rate: float,
+        burst: int,
+        max_retries: int,
+        backoff_base_s: float = EC2_BACKOFF_BASE_S,
+        backoff_cap_s: float = EC2_BACKOFF_CAP_S,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+
+    def client(self, region: str, service: str = "ec2") -> "ThrottledEC2Client":
+        load_cloud_deps()
+        raw = boto3.client(service, region_name=region, config=BotoConfig(retries={"total_max_attempts": 1}))
+        return ThrottledEC2Client(raw, self)
+
+    def _stats_for(self, op: str) -> EC2CallStats:
+        with self._stats_lock:
+            return self.stats.setdefault(op, EC2CallStats())
+
+    def call(self, op: str, fn: Callable, **kwargs):
+        st = self._stats_for(op)
+        read_only = op.startswith(("describe_", "get_", "list_"))
+        sleep_s = self.backoff_base_s
+        attempt = 0
+        while True:
+            st.rate_wait_s += self.bucket.acquire()
+            n = attempt + 1
+            t0 = time.monotonic()
+            try:
+                return fn(**kwargs)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code", "")
+                retryable = code in EC2_THROTTLE_CODES or (read_only and code in EC2_TRANSIENT_CODES)
+                if code in EC2_THROTTLE_CODES:
+                    st.throttled += 1
+                if not retryable or attempt >= self.max_retries:
+                    st.failed += 1
+                    raise
+                attempt += 1
+                st.retries += 1
+                sleep_s = min(self.backoff_cap_s, random.uniform(self.backoff_base_s, sleep_s * 3))
+                log.debug("ec2 %s: %s, retry %d/%d in %.2fs", op, code, attempt, self.max_retries, sleep_s)
+            finally:
+                elapsed = time.monotonic() - t0
+                st.calls += 1
+                st.latency_s += elapsed
+                st.max_latency_s = max(st.max_latency_s, elapsed)
+                log.debug("ec2 %s took %.0fms (attempt %d)", op, elapsed * 1000, n)
+            time.sleep(sleep_s)
+
+    def log_summary(self) -> None:
+        if not self.stats:
+            return
+        log.info("EC2 calls: op calls retries throttled failed avg_ms max_ms rate_wait_ms")
+        for op, st in sorted(self.stats.items()):
+            log.info(
+                "  %s %d %d %d %d %.0f %.0f %.0f",
+                op, st.calls, st.retries, st.throttled, st.failed,
+                st.latency_s / max(st.calls, 1) * 1000, st.max_latency_s * 1000, st.rate_wait_s * 1000,
+            )
+
+
+class ThrottledEC2Client:
+    """boto3 EC2 client proxy whose operations and paginators go through an EC2RequestLayer."""
+
+    def __init__(self, client, layer: EC2RequestLayer) -> None:
+        self._client = client
+        self._layer = layer
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr) or name in ("can_paginate", "get_waiter"):
+            return attr
+
+        def call(**kwargs):
+            return self._layer.call(name, attr, **kwargs)
+        return call
+
+    def get_paginator(self, op: str) -> "_ThrottledPaginator":
+        return _ThrottledPaginator(self, op)
+
+
+class _ThrottledPaginator:
+    def __init__(self, client: ThrottledEC2Client, op: str) -> None:
+        self.client = client
+        self.op = op
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = getattr(self.client, self.op)(**kwargs, **({"NextToken": token} if token else {}))
+            yield page
+            token = page.get("NextToken")
+            if not token:
+                return
+
+
+# one layer per process, so the rate budget covers every client
+EC2_LAYER = EC2RequestLayer()
+
+
+# --- backend selection ---
+def discover_backends(region: str, alb_host: str, port: int = BACKEND_PORT) -> List[str]:
+    """Return the private IPs of the healthy targets behind the ALB whose DNS name is alb_host."""
+    elb = EC2_LAYER.client(region, "elbv2")
+    lb_arn = None
+    marker = None
+    while lb_arn is None:
+        page = elb.describe_load_balancers(**({"Marker": marker} if marker else {}))
+        for lb in page["LoadBalancers"]:
+            if lb["DNSName"].lower() == alb_host.lower().rstrip("."):
+                lb_arn = lb["LoadBalancerArn"]
+        marker = page.get("NextMarker")
+        if not marker:
+            break
+    if lb_arn is None:
+        log.warning("No load balancer with DNS name %s; cannot discover backends", alb_host)
+        return []
+
+    ips: List[str] = []
+    instance_ids: List[str] = []
+    for tg in elb.describe_target_groups(LoadBalancerArn=lb_arn)["TargetGroups"]:
+        if tg.get("Port") != port:
+            continue
+        for th in elb.describe_target_health(TargetGroupArn=tg["TargetGroupArn"])["TargetHealthDescriptions"]:
+            if th["TargetHealth"]["State"] != "healthy":
+                continue
+            target_id = th["Target"]["Id"]
+            (instance_ids if target_id.startswith("i-") else ips).append(target_id)
+    if instance_ids:
+        ec2 = EC2_LAYER.client(region)
+        for page in ec2.get_paginator("describe_instances").paginate(InstanceIds=sorted(set(instance_ids))):
+            for r in page["Reservations"]:
+                ips.extend(i["PrivateIpAddress"] for i in r["Instances"] if i.get("PrivateIpAddress"))
+    ips = list(dict.fromkeys(ips))
+    log.info("Discovered %d healthy backends behind %s", len(ips), alb_host)
+    return ips
+
+
+def probe_backend(host: str, port: int = BACKEND_PORT, timeout_s: float = BACKEND_PROBE_TIMEOUT_S) -> Optional[float]:
+    """TCP connect time to host:port in seconds, None if unreachable."""
+    t0 = time.monotonic()
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s):
+            return time.monotonic() - t0
+    except OSError as e:
+        log.debug("Backend %s:%d unreachable: %s", host, port, e)
+        return None
+
+
+def rank_backends(hosts: List[str]) -> List[str]:
+    """
+    Probe all hosts in parallel and return them fastest first, unreachable ones last.
+    Raises RuntimeError if none answers.
+    """
+    with ThreadPoolExecutor(max_workers=min(len(hosts), BACKEND_PROBE_WORKERS)) as pool:
+        rtts = list(pool.map(probe_backend, hosts))
+    for host, rtt in zip(hosts, rtts):
+        log.info("Backend %s: %s", host, "unreachable" if rtt is None else f"{rtt * 1000:.1f}ms")
+    healthy = [h for _, h in sorted((rtt, h) for h, rtt in zip(hosts, rtts) if rtt is not None)]
+    if not healthy:
+        raise RuntimeError(f"No backend reachable on port {BACKEND_PORT}: {', '.join(hosts)}")
+    return healthy + [h for h, rtt in zip(hosts, rtts) if rtt is None]
+
+
+# --- instance-type catalog ---
+# Network facts per instance type, so booting nodes do not need describe_instance_types.
+# Entries: max_enis, network_cards, card_max_enis (per card index) and ena_srd (ENA Express
+# support; looked up when missing and --ena-express is used). Refresh with --refresh-catalog.
+CATALOG_SCHEMA_VERSION = 1
+
+BUNDLED_CATALOG: Dict = {
+    "version": CATALOG_SCHEMA_VERSION,
+    "generated": "bundled",
+    "types": {
+        "c5.large": {"max_enis": 3, "network_cards": 1, "card_max_enis": [3]},
+        "c5n.18xlarge": {"max_enis": 15, "network_cards": 1, "card_max_enis": [15]},
+        "c6a.4xlarge": {"max_enis": 8, "network_cards": 1, "card_max_enis": [8]},
+        "c6in.32xlarge": {"max_enis": 16, "network_cards": 2, "card_max_enis": [8, 8]},
+        "c7a.16xlarge": {"max_enis": 15, "network_cards": 1, "card_max_enis": [15]},
+        "g5.48xlarge": {"max_enis": 7, "network_cards": 1, "card_max_enis": [7]},
+        "hpc6a.48xlarge": {"max_enis": 2, "network_cards": 1, "card_max_enis": [2]},
+        "hpc7a.96xlarge": {"max_enis": 4, "network_cards": 2, "card_max_enis": [2, 2]},
+        "p4d.24xlarge": {"max_enis": 60, "network_cards": 4, "card_max_enis": [15] * 4},
+        "p5.48xlarge": {"max_enis": 64, "network_cards": 32, "card_max_enis": [2] * 32},
+        "trn1.32xlarge": {"max_enis": 40, "network_cards": 8, "card_max_enis": [5] * 8},
+    },
+}
+
+
+def catalog_entry_from_api(info: Dict) -> Dict:
+    """Convert a describe_instance_types NetworkInfo block into a catalog entry."""
+    cards = sorted(info.get("NetworkCards", []), key=lambda c: c.get("NetworkCardIndex", 0))
+    return {
+        "max_enis": info["MaximumNetworkInterfaces"],
+        "network_cards": info.get("MaximumNetworkCards", 1),
+        "card_max_enis": [c.get("MaximumNetworkInterfaces", 0) for c in cards],
+        "ena_srd": bool(info.get("EnaSrdSupported", False)),
+    }
+
+
+class InstanceCatalog:
+    """Bundled catalog overlaid with the on-disk one; entries fetched from the API are persisted back."""
+
+    def __init__(self, path: str = CATALOG_PATH) -> None:
+        self.path = path
+        self.types: Dict[str, Dict] = dict(BUNDLED_CATALOG["types"])
+        self.generated = BUNDLED_CATALOG["generated"]
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable instance catalog %s: %s", path, e)
+            return
+        if data.get("version") != CATALOG_SCHEMA_VERSION:
+            log.warning("Ignoring instance catalog %s (version=%s, want %d)", path, data.get("version"), CATALOG_SCHEMA_VERSION)
+            return
+        self.types.update(data.get("types", {}))
+        self.generated = data.get("generated", "")
+
+    def get(self, instance_type: str) -> Optional[Dict]:
+        return self.types.get(instance_type)
+
+    def put(self, instance_type: str, entry: Dict) -> None:
+        self.types[instance_type] = entry
+
+    def save(self) -> None:
+        data = {"version": CATALOG_SCHEMA_VERSION, "generated": self.generated, "types": self.types}
+        write_file(self.path, json.dumps(data, indent=1, sort_keys=True) + "\n", 0o644)
+
+    def refresh_from_api(self, ec2_client) -> int:
+        """Replace the catalog with every instance type offered in the client's region."""
+        types: Dict[str, Dict] = {}
+        for page in ec2_client.get_paginator("describe_instance_types").paginate():
+            for it in page["InstanceTypes"]:
+                types[it["InstanceType"]] = catalog_entry_from_api(it["NetworkInfo"])
+        self.types = types
+        self.generated = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.save()
+        return len(types)
 
 
 # --- ENI management ---
+class SlotPlanner:
+    """
+    Plans (device_index, card_index) attachment slots for new ENIs from a single snapshot of
+    the slots already in use. ENIs are spread round-robin across network cards, least
+    loaded card first, so DPDK traffic uses every card's bandwidth. Device index 0 is
+    never used.
+    """
+
+    def __init__(
+        self,
+        used: Set[Tuple[int, int]],
+        max_enis: int,
+        network_card_count: int,
+        card_max_enis: Optional[List[int]] = None,
+    ) -> None:
+        self.used = set(used)
+        self.max_enis = max_enis
+        self.network_card_count = network_card_count
+        if card_max_enis and len(card_max_enis) == network_card_count:
+            self.card_max_enis = list(card_max_enis)
+        else:
+            self.card_max_enis = [max_enis] * network_card_count
+
+    def _card_load(self, card: int) -> int:
+        return sum(1 for _, c in self.used if c == card)
+
+    def plan(self, count: int) -> List[Tuple[int, int]]:
+        taken = set(self.used)
+        load = {c: self._card_load(c) for c in range(self.network_card_count)}
+        cards = sorted(load, key=lambda c: (load[c], c))
+        slots: List[Tuple[int, int]] = []
+        while len(slots) < count:
+            progressed = False
+            for card in cards:
+                if len(slots) == count:
+                    break
+                if load[card] >= self.card_max_enis[card]:
+                    continue
+                di = next((d for d in range(1, self.max_enis) if (d, card) not in taken), None)
+                if di is None:
+                    continue
+                taken.add((di, card))
+                load[card] += 1
+                slots.append((di, card))
+                progressed = True
+            if not progressed:
+                raise RuntimeError(
+                    f"No attachment slots available: need {count}, planned {len(slots)} (used={sorted(self.used)})"
+                )
+        return slots
+
+
 class EC2NetworkInterfaceManager:
-    def __init__(self, imds: EC2MetadataClient):
+    def __init__(self, imds: EC2MetadataClient, catalog: Optional[InstanceCatalog] = None, ena_express: bool = False):
+        load_cloud_deps()
         self.imds = imds
-        self.instance_id = imds.get("instance-id").strip()
-        self.region = imds.get("placement/availability-zone").strip()[:-1]
+        snap = imds.snapshot()
+        self.instance_id = snap.instance_id
+        self.region = snap.region
+        self.catalog = catalog or InstanceCatalog()
 
-        self.ec2_client = boto3.client("ec2", region_name=self.region)
-        self.ec2 = boto3.resource("ec2", region_name=self.region)
+        self.ec2_client = EC2_LAYER.client(self.region)
 
         self.instance_type = ""
         self.network_card_count = 1
         self.max_enis = 0
+        self.current_enis = 0
         self.subnet_id = ""
+        self.eni_macs: Dict[str, str] = {}
+        self.ena_express = ena_express
+        self.cancel: Optional[threading.Event] = None  # set by a failed concurrent phase
+        self.attached: List[Tuple[str, str]] = []
+        self.pooled: List[str] = []
+        self.created: List[str] = []
 
         self.refresh()
 
     def refresh(self) -> None:
-        inst = self.ec2.Instance(self.instance_id)
-        self.instance_type = inst.instance_type
-        self.subnet_id = inst.subnet_id
-
-        info = self.ec2_client.describe_instance_types(InstanceTypes=[self.instance_type])["InstanceTypes"][0]["NetworkInfo"]
-        self.network_card_count = info.get("MaximumNetworkCards", 1)
-        self.max_enis = info["MaximumNetworkInterfaces"]
-
-        # trigger fetch of ENIs
-        _ = inst.network_interfaces
+        """
+        Load instance and instance-type network facts from IMDS and the local catalog.
+        EC2 is only called when IMDS lacks the subnet or the type is not in the catalog (or its
+        ENA Express support is unknown and --ena-express is used).
+        """
+        snap = self.imds.snapshot()
+        self.instance_type = snap.instance_type
+        self.subnet_id = snap.primary_interface().get("subnet-id", "")
+        self.current_enis = len(snap.interfaces)
+        if not self.subnet_id:
+            inst = self.ec2_client.describe_instances(InstanceIds=[self.instance_id])["Reservations"][0]["Instances"][0]
+            self.subnet_id = inst["SubnetId"]
+            self.current_enis = len(inst["NetworkInterfaces"])
+
+        entry = self.catalog.get(self.instance_type)
+        if entry is None or (self.ena_express and "ena_srd" not in entry):
+            log.info("Instance type %s not (fully) in catalog; querying EC2", self.instance_type)
+            info = self.ec2_client.describe_instance_types(InstanceTypes=[self.instance_type])["InstanceTypes"][0]["NetworkInfo"]
+            entry = {**(entry or {}), **catalog_entry_from_api(info)}
+            self.catalog.put(self.instance_type, entry)
+            try:
+                self.catalog.save()
+            except OSError as e:
+                log.warning("Could not persist instance catalog: %s", e)
+        self.network_card_count = entry.get("network_cards", 1)
+        self.max_enis = entry["max_enis"]
+        if self.ena_express and not entry.get("ena_srd"):
+            log.warning("Instance type %s does not support ENA Express; continuing without it", self.instance_type)
+            self.ena_express = False
 
         log.info(
             "Instance=%s type=%s cards=%d max_enis=%d current_enis=%d",
@@ -337,9 +2082,14 @@ class EC2NetworkInterfaceManager:
             self.instance_type,
             self.network_card_count,
             self.max_enis,
-            len(inst.network_interfaces),
+            self.current_enis,
         )
 
+    def _record_attached(self, count: int) -> None:
+        # in-memory update instead of re-describing the instance after attach
+        self.current_enis += count
+        log.info("Instance=%s current_enis=%d (after attaching %d)", self.instance_id, self.current_enis, count)
+
     def _used_pairs(self) -> Set[Tuple[int, int]]:
         used: Set[Tuple[int, int]] = set()
         resp = self.ec2_client.describe_network_interfaces(
@@ -356,103 +2106,463 @@ class EC2NetworkInterfaceManager:
             used.add((di, ci))
         return used
 
-    def _next_slot(self) -> Optional[Tuple[int, int]]:
-        # policy: skip device index 0, iterate 1..max-1, spread across cards
-        used = self._used_pairs()
-        for device_index in range(1, self.max_enis):
-            for card_index in range(self.network_card_count):
-                if (device_index, card_index) not in used:
-                    return (device_index, card_index)
-        return None
+    def _snapshot_used_pairs(self) -> Set[Tuple[int, int]]:
+        # IMDS already lists every attached interface with its device/card index
+        snap = self.imds.snapshot(max_age=0)
+        used: Set[Tuple[int, int]] = set()
+        for vals in snap.interfaces.values():
+            if "device-number" not in vals:
+                return self._used_pairs()
+            ci = 0 if self.network_card_count == 1 else int(vals.get("network-card", "0"))
+            used.add((int(vals["device-number"]), ci))
+        return used
 
-    def _wait_eni_status(self, eni_id: str, want: str, attempts: int = 40, sleep_s: int = 3) -> None:
-        for _ in range(attempts):
-            resp = self.ec2_client.describe_network_interfaces(NetworkInterfaceIds=[eni_id])
-            status = resp["NetworkInterfaces"][0]["Status"]
-            if status == want:
-                return
-            time.sleep(sleep_s)
-        raise RuntimeError(f"Timeout waiting for ENI {eni_id} to reach {want}")
+    def plan_slots(self, count: int) -> List[Tuple[int, int]]:
+        """Plan attachment slots for `count` new ENIs and log the placement."""
+        entry = self.catalog.get(self.instance_type) or {}
+        used = self._snapshot_used_pairs()
+        slots = SlotPlanner(used, self.max_enis, self.network_card_count, entry.get("card_max_enis")).plan(count)
+        log.info("ENI attachment plan (used=%s):", sorted(used))
+        for i, (di, ci) in enumerate(slots, 1):
+            log.info("  ENI #%d -> device=%d card=%s", i, di, ci if self.network_card_count > 1 else "N/A")
+        return slots
+
+    def _describe_statuses(self, eni_ids: List[str]) -> Dict[str, str]:
+        try:
+            resp = self.ec2_client.describe_network_interfaces(NetworkInterfaceIds=eni_ids)
+        except ClientError as e:
+            # freshly created ENIs may not be visible yet (eventual consistency)
+            if e.response.get("Error", {}).get("Code") == "InvalidNetworkInterfaceID.NotFound":
+                return {}
+            raise
+        return {ni["NetworkInterfaceId"]: ni["Status"] for ni in resp["NetworkInterfaces"]}
 
-    def create_enis(self, count: int, security_groups: Optional[List[str]]) -> List[str]:
-        inst = self.ec2.Instance(self.instance_id)
-        current = len(inst.network_interfaces)
+    def _wait_enis_status(
+        self,
+        eni_ids: List[str],
+        want: str,
+        on_ready: Optional[Callable[[str], None]] = None,
+        timeout_s: float = ENI_WAIT_TIMEOUT_S,
+    ) -> None:
+        """Poll all ENIs with one describe call per round, backing off between rounds."""
+        pending = list(eni_ids)
+        delay = ENI_POLL_INITIAL_S
+        deadline = time.monotonic() + timeout_s
+        while pending:
+            check_cancelled(self.cancel)
+            statuses = self._describe_statuses(pending)
+            for eni_id in [e for e in pending if statuses.get(e) == want]:
+                pending.remove(eni_id)
+                if on_ready:
+                    on_ready(eni_id)
+            if not pending:
+                return
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Timeout waiting for ENIs {pending} to reach {want}")
+            time.sleep(delay)
+            delay = min(delay * 2, ENI_POLL_MAX_S)
+
+    def _create_eni(self, name: str, security_groups: Optional[List[str]]) -> str:
+        params: Dict = {
+            "SubnetId": self.subnet_id,
+            "Description": f"Weka DPDK ENI for {self.instance_id}",
+            # idempotency token: a retried create cannot produce a second ENI
+            "ClientToken": f"{name}-{os.urandom(4).hex()}",
+            "TagSpecifications": [{
+                "ResourceType": "network-interface",
+                "Tags": [
+                    {"Key": "Name", "Value": name},
+                    {"Key": "CreatedBy", "Value": "weka-mounter"},
+                ],
+            }],
+        }
+        if security_groups:
+            params["Groups"] = security_groups
+
+        ni = self.ec2_client.create_network_interface(**params)["NetworkInterface"]
+        eni_id = ni["NetworkInterfaceId"]
+        self.eni_macs[eni_id] = ni["MacAddress"]
+        log.info("Created ENI %s (mac=%s)", eni_id, ni["MacAddress"])
+        return eni_id
+
+    def _create_concurrently(self, count: int, security_groups: Optional[List[str]]) -> List[str]:
+        # ENIs attached earlier in this run (claimed pool ENIs) are not in the IMDS count yet
+        current = self.current_enis + len(self.attached)
         if current + count > self.max_enis:
             raise RuntimeError(f"ENI limit: current={current} + new={count} > max={self.max_enis}")
 
-        created: List[str] = []
         run_id = int(time.time())
-        try:
-            for i in range(count):
-                params: Dict = {
-                    "SubnetId": self.subnet_id,
-                    "Description": f"Weka DPDK ENI for {self.instance_id}",
-                    "TagSpecifications": [{
-                        "ResourceType": "network-interface",
-                        "Tags": [
-                            {"Key": "Name", "Value": f"weka-dpdk-{self.instance_id}-{run_id}-{i+1}"},
-                            {"Key": "CreatedBy", "Value": "weka-mounter"},
-                        ],
-                    }],
-                }
-                if security_groups:
-                    params["Groups"] = security_groups
-
-                eni = self.ec2.create_network_interface(**params)
-                created.append(eni.id)
-                log.info("Created ENI %s", eni.id)
-                self._wait_eni_status(eni.id, "available")
-            return created
-        except Exception:
-            for eni_id in created:
+        created: List[str] = []
+        errors: List[Exception] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(count, EC2_MAX_WORKERS))) as pool:
+            futures = [
+                pool.submit(self._create_eni, f"weka-dpdk-{self.instance_id}-{run_id}-{i+1}", security_groups)
+                for i in range(count)
+            ]
+            for fut in futures:
                 try:
-                    self.ec2.NetworkInterface(eni_id).delete()
-                    log.info("Deleted ENI %s (cleanup)", eni_id)
-                except Exception:
-                    pass
-            raise
+                    created.append(fut.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            self._delete_enis(created)
+            raise errors[0]
+        return created
+
+    def _delete_enis(self, eni_ids: List[str]) -> None:
+        for eni_id in eni_ids:
+            try:
+                self.ec2_client.delete_network_interface(NetworkInterfaceId=eni_id)
+                log.info("Deleted ENI %s (cleanup)", eni_id)
+            except Exception:
+                pass
+
+    def _detach_enis(self, attached: List[Tuple[str, str]]) -> None:
+        for eni_id, att_id in attached:
+            try:
+                self.ec2_client.detach_network_interface(AttachmentId=att_id, Force=True)
+                log.info("Detached ENI %s (cleanup)", eni_id)
+            except Exception:
+                pass
 
-    def attach_enis(self, eni_ids: List[str]) -> None:
-        attached: List[Tuple[str, str]] = []
+    def _attach_eni(
+        self,
+        eni_id: str,
+        slot: Tuple[int, int],
+        attached: List[Tuple[str, str]],
+        delete_on_termination: bool = True,
+    ) -> str:
+        """Attach into `slot`; (eni_id, attachment_id) is recorded in `attached` as soon as EC2 accepts it."""
+        di, ci = slot
+
+        params: Dict = {"NetworkInterfaceId": eni_id, "InstanceId": self.instance_id, "DeviceIndex": di}
+        if self.network_card_count > 1:
+            params["NetworkCardIndex"] = ci
+        if self.ena_express:
+            params["EnaSrdSpecification"] = ENA_SRD_SPEC
+
+        att_id = self.ec2_client.attach_network_interface(**params)["AttachmentId"]
+        # recorded before the modify call, so a failure there still detaches it and frees the slot
+        attached.append((eni_id, att_id))
+        self.ec2_client.modify_network_interface_attribute(
+            NetworkInterfaceId=eni_id,
+            Attachment={"AttachmentId": att_id, "DeleteOnTermination": delete_on_termination},
+        )
+        log.info("Attached ENI %s at device=%d card=%s", eni_id, di, ci if self.network_card_count > 1 else "N/A")
+        return att_id
+
+    def enable_ena_express(self, eni_ids: List[str]) -> None:
+        """Turn on ENA Express (SRD, including UDP) for already attached ENIs, e.g. the primary one."""
+        for eni_id in eni_ids:
+            self.ec2_client.modify_network_interface_attribute(NetworkInterfaceId=eni_id, EnaSrdSpecification=ENA_SRD_SPEC)
+
+    def verify_ena_express(self, eni_ids: List[str]) -> bool:
+        """True if every ENI's attachment reports SRD and UDP-over-SRD enabled."""
+        resp = self.ec2_client.describe_network_interfaces(NetworkInterfaceIds=eni_ids)
+        enabled = set()
+        for ni in resp["NetworkInterfaces"]:
+            spec = ni.get("Attachment", {}).get("EnaSrdSpecification", {})
+            if spec.get("EnaSrdEnabled") and spec.get("EnaSrdUdpSpecification", {}).get("EnaSrdUdpEnabled"):
+                enabled.add(ni["NetworkInterfaceId"])
+        missing = [e for e in eni_ids if e not in enabled]
+        if missing:
+            log.warning("ENA Express is not enabled on %s", " ".join(missing))
+            return False
+        log.info("ENA Express (SRD, UDP) enabled on %s", " ".join(eni_ids))
+        return True
+
+    def _claim_token(self) -> str:
+        return f"{self.instance_id}/{int(time.time())}/{os.urandom(4).hex()}"
+
+    @staticmethod
+    def _claim_is_free(tags: Dict[str, str]) -> bool:
+        claim = tags.get(POOL_CLAIM_TAG, "")
+        if not claim:
+            return True
         try:
-            for eni_id in eni_ids:
-                slot = self._next_slot()
-                if not slot:
-                    raise RuntimeError("No attachment slots available")
-                di, ci = slot
-
-                params: Dict = {"NetworkInterfaceId": eni_id, "InstanceId": self.instance_id, "DeviceIndex": di}
-                if self.network_card_count > 1:
-                    params["NetworkCardIndex"] = ci
-
-                resp = self.ec2_client.attach_network_interface(**params)
-                att_id = resp["AttachmentId"]
-                attached.append((eni_id, att_id))
-
-                self.ec2_client.modify_network_interface_attribute(
-                    NetworkInterfaceId=eni_id,
-                    Attachment={"AttachmentId": att_id, "DeleteOnTermination": True},
-                )
-                log.info("Attached ENI %s at device=%d card=%s", eni_id, di, ci if self.network_card_count > 1 else "N/A")
+            claimed_at = int(claim.split("/")[1])
+        except (IndexError, ValueError):
+            return True
+        # a claim only lives between tagging and attach; an old one on an available ENI is stale
+        return time.time() - claimed_at > POOL_CLAIM_STALE_S
+
+    def claim_pool_enis(self, pool: str, count: int, security_groups: Optional[List[str]]) -> List[str]:
+        """
+        Claim up to `count` available ENIs tagged with `pool` in this instance's subnet.
+        EC2 has no conditional tagging, so the lock is optimistic: write a unique claim tag,
+        wait for it to settle, and keep only the ENIs whose tag is still ours. A claim lost
+        after that window is caught by attach, since an ENI can only be attached once.
+        """
+        filters = [
+            {"Name": "subnet-id", "Values": [self.subnet_id]},
+            {"Name": "status", "Values": ["available"]},
+            {"Name": f"tag:{POOL_TAG}", "Values": [pool]},
+        ]
+        want_groups = set(security_groups or [])
+        candidates: List[str] = []
+        for page in self.ec2_client.get_paginator("describe_network_interfaces").paginate(Filters=filters):
+            for ni in page["NetworkInterfaces"]:
+                tags = {t["Key"]: t["Value"] for t in ni.get("TagSet", [])}
+                groups = {g["GroupId"] for g in ni.get("Groups", [])}
+                if want_groups and groups != want_groups:
+                    continue
+                if self._claim_is_free(tags):
+                    candidates.append(ni["NetworkInterfaceId"])
+        if not candidates or count <= 0:
+            log.info("ENI pool %s: no free ENIs to claim", pool)
+            return []
+
+        # spread concurrently booting nodes over different ENIs
+        random.shuffle(candidates)
+        wanted = candidates[:count]
+        token = self._claim_token()
+        self.ec2_client.create_tags(Resources=wanted, Tags=[{"Key": POOL_CLAIM_TAG, "Value": token}])
+        time.sleep(POOL_CLAIM_SETTLE_S)
+
+        won: List[str] = []
+        for ni in self.ec2_client.describe_network_interfaces(NetworkInterfaceIds=wanted)["NetworkInterfaces"]:
+            tags = {t["Key"]: t["Value"] for t in ni.get("TagSet", [])}
+            if tags.get(POOL_CLAIM_TAG) == token and ni["Status"] == "available":
+                won.append(ni["NetworkInterfaceId"])
+                self.eni_macs[ni["NetworkInterfaceId"]] = ni["MacAddress"]
+        log.info("ENI pool %s: claimed %d of %d requested (%s)", pool, len(won), count, ", ".join(won) or "-")
+        return won
+
+    def _release_pool_enis(self, eni_ids: List[str]) -> None:
+        if not eni_ids:
+            return
+        try:
+            self.ec2_client.delete_tags(Resources=eni_ids, Tags=[{"Key": POOL_CLAIM_TAG}])
+            log.info("Released pool ENIs %s (cleanup)", ", ".join(eni_ids))
+        except Exception:
+            pass
+
+    def provision_enis(self, count: int, security_groups: Optional[List[str]], pool: Optional[str] = None) -> List[str]:
+        """
+        Attach `count` ENIs: with `pool`, first claim free pool ENIs, then create the
+        shortfall concurrently and attach each one as soon as it becomes available.
+        Pool ENIs keep DeleteOnTermination off so they return to the pool on scale-in; the
+        shortfall ENIs are ordinary ones (no pool tag, deleted on termination), so a
+        shortfall never grows the pool.
+        On failure every attached ENI is detached, created ENIs are deleted and claimed
+        pool ENIs are released; rollback() does the same after a later failure.
+        """
+        slots = self.plan_slots(count)
+        attached = self.attached
+        pooled = self.pooled
+        created: List[str] = []
 
-            self.refresh()
+        def attach(eni_id: str, delete_on_termination: bool = True) -> None:
+            # ENIs take the planned slots in the order they become available
+            with SPANS.span("eni.attach", eni_id=eni_id):
+                self._attach_eni(eni_id, slots[len(attached)], attached, delete_on_termination)
+
+        try:
+            if pool:
+                with SPANS.span("eni.pool_claim", pool=pool) as sp:
+                    claimed = self.claim_pool_enis(pool, count, security_groups)
+                    sp["claimed"] = len(claimed)
+                for eni_id in claimed:
+                    try:
+                        attach(eni_id, delete_on_termination=False)
+                    except ClientError as e:
+                        if any(e_id == eni_id for e_id, _ in attached):
+                            # attached, but setting DeleteOnTermination failed: roll back
+                            raise
+                        # lost the claim to another node after the settle window
+                        log.warning("Pool ENI %s could not be attached (%s); creating a replacement", eni_id, e)
+                        continue
+                    pooled.append(eni_id)
+
+            check_cancelled(self.cancel)
+            with SPANS.span("eni.create", count=count - len(pooled)):
+                created = self._create_concurrently(count - len(pooled), security_groups)
+            self.created = created
+            with SPANS.span("eni.wait_attach", count=len(created)):
+                self._wait_enis_status(created, "available", on_ready=attach)
+            self._record_attached(len(attached))
+            return pooled + created
         except Exception:
-            for eni_id, att_id in attached:
-                try:
-                    self.ec2_client.detach_network_interface(AttachmentId=att_id, Force=True)
-                    log.info("Detached ENI %s (cleanup)", eni_id)
-                except Exception:
-                    pass
+            self.rollback()
             raise
 
+    def rollback(self) -> None:
+        """Undo provision_enis(): detach, delete the created ENIs and release the pool ENIs."""
+        attached, created = list(self.attached), list(self.created)
+        # every attached ENI we did not create is a claimed pool ENI, even if its attach did not finish
+        pooled = list(dict.fromkeys(self.pooled + [e for e, _ in attached if e not in created]))
+        self.attached[:], self.pooled[:], self.created = [], [], []
+        self.cancel = None  # cleanup must not be cut short
+        self._detach_enis(attached)
+        if attached:
+            # detached ENIs must settle back to available before they can be deleted
+            try:
+                self._wait_enis_status([e for e, _ in attached if e not in pooled], "available")
+            except Exception:
+                pass
+        self._delete_enis(created)
+        self._release_pool_enis(pooled)
+
+
+# --- NIC discovery ---
+# rtnetlink constants (linux/netlink.h, linux/rtnetlink.h, linux/if_link.h)
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFINFOMSG = struct.Struct("=BxHiII")
+_RTATTR = struct.Struct("=HH")
+
+UDEV_DB_DIR = "/run/udev/data"
+
+
+def _skip_ifname(ifname: str) -> bool:
+    return ifname == "lo" or ifname.startswith(("docker", "veth"))
+
+
+def parse_link_messages(data: bytes) -> List[Tuple[int, int, str, str]]:
+    """Decode one netlink datagram into (msg_type, ifindex, ifname, mac) link records."""
+    out: List[Tuple[int, int, str, str]] = []
+    off = 0
+    while off + _NLMSGHDR.size <= len(data):
+        msg_len, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, off)
+        if msg_len < _NLMSGHDR.size:
+            break
+        if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+            body = off + _NLMSGHDR.size
+            _, _, ifindex, _, _ = _IFINFOMSG.unpack_from(data, body)
+            ifname, mac = "", ""
+            a = body + _IFINFOMSG.size
+            end = off + msg_len
+            while a + _RTATTR.size <= end:
+                rta_len, rta_type = _RTATTR.unpack_from(data, a)
+                if rta_len < _RTATTR.size:
+                    break
+                payload = data[a + _RTATTR.size:a + rta_len]
+                if rta_type == IFLA_IFNAME:
+                    ifname = payload.split(b"\0", 1)[0].decode()
+                elif rta_type == IFLA_ADDRESS:
+                    mac = ":".join(f"{b:02x}" for b in payload)
+                a += (rta_len + 3) & ~3
+            out.append((msg_type, ifindex, ifname, mac))
+        off += (msg_len + 3) & ~3
+    return out
+
+
+class NetlinkLinkSource:
+    """
+    Live RTNETLINK link events. The socket joins RTMGRP_LINK before requesting a dump of
+    the current links, so no hot-plug can fall between the initial index and the events.
+    With `record_path` every datagram is appended there for later replay.
+    """
+
+    live = True
+
+    def __init__(self, record_path: Optional[str] = None, header: Optional[Dict] = None) -> None:
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK))
+        req = _NLMSGHDR.pack(_NLMSGHDR.size + _IFINFOMSG.size, RTM_GETLINK, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        self.sock.send(req + _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        self.exhausted = False
+
+        self._t0 = time.monotonic()
+        self._record = open(record_path, "w") if record_path else None
+        if self._record:
+            self._record.write(json.dumps(header or {}) + "\n")
+
+    def recv(self, timeout: float) -> Optional[bytes]:
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return None
+        data = self.sock.recv(65536)
+        if self._record:
+            self._record.write(json.dumps({"t": round(time.monotonic() - self._t0, 6), "data": data.hex()}) + "\n")
+        return data
+
+    def close(self) -> None:
+        self.sock.close()
+        if self._record:
+            self._record.close()
+
+
+class ReplayLinkSource:
+    """
+    Test mode: replays datagrams recorded by NetlinkLinkSource(record_path=...).
+    The first line of a recording is a JSON header ({"eni_macs": {...}}); each following
+    line is {"t": seconds_since_start, "data": hex}. Timing is honoured unless `realtime`
+    is False.
+    """
+
+    def __init__(self, path: str, realtime: bool = False) -> None:
+        with open(path, "r") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        self.header: Dict = lines[0] if lines else {}
+        self.events: List[Tuple[float, bytes]] = [(e["t"], bytes.fromhex(e["data"])) for e in lines[1:]]
+        self.realtime = realtime
+        self.live = False
+        self.exhausted = not self.events
+        self._pos = 0
+        self._t0 = time.monotonic()
+
+    def recv(self, timeout: float) -> Optional[bytes]:
+        if self._pos >= len(self.events):
+            self.exhausted = True
+            return None
+        t, data = self.events[self._pos]
+        if self.realtime:
+            wait = t - (time.monotonic() - self._t0)
+            if wait > timeout:
+                time.sleep(timeout)
+                return None
+            if wait > 0:
+                time.sleep(wait)
+        self._pos += 1
+        return data
+
+    def close(self) -> None:
+        pass
+
 
-def resolve_eni_ifnames(imds: EC2MetadataClient, eni_ids: List[str], attempts: int = 40, sleep_s: int = 3) -> List[str]:
+class LinkIndex:
+    """MAC -> (ifindex, ifname) index maintained from RTM_NEWLINK/RTM_DELLINK records."""
+
+    def __init__(self) -> None:
+        self.by_mac: Dict[str, Tuple[int, str]] = {}
+
+    def apply(self, data: bytes) -> None:
+        for msg_type, ifindex, ifname, mac in parse_link_messages(data):
+            if not mac or _skip_ifname(ifname):
+                continue
+            if msg_type == RTM_DELLINK:
+                if self.by_mac.get(mac, (None,))[0] == ifindex:
+                    del self.by_mac[mac]
+            else:
+                self.by_mac[mac] = (ifindex, ifname)
+
+
+def _udev_settled(ifindex: int) -> bool:
+    # udev writes its db entry after naming the device; without udev there is nothing to wait for
+    if not os.path.isdir(UDEV_DB_DIR):
+        return True
+    return os.path.exists(os.path.join(UDEV_DB_DIR, f"n{ifindex}"))
+
+
+def _poll_eni_ifnames(imds: EC2MetadataClient, eni_ids: List[str], attempts: int = 40, sleep_s: int = 3) -> List[str]:
     eni_set = set(eni_ids)
 
     def ifname_for_mac(mac: str) -> Optional[str]:
         mac = mac.lower()
         for ifname in os.listdir("/sys/class/net"):
-            if ifname == "lo" or ifname.startswith(("docker", "veth")):
+            if _skip_ifname(ifname):
                 continue
             try:
                 with open(f"/sys/class/net/{ifname}/address", "r") as f:
@@ -463,12 +2573,10 @@ def resolve_eni_ifnames(imds: EC2MetadataClient, eni_ids: List[str], attempts: i
         return None
 
     for attempt in range(1, attempts + 1):
-        macs = imds.get("network/interfaces/macs/").strip().splitlines()
-        macs = [m.strip("/").lower() for m in macs if m.strip()]
+        eni_to_mac = imds.snapshot(max_age=0).eni_to_mac()
 
         eni_to_if: Dict[str, str] = {}
-        for mac in macs:
-            iface_id = imds.get(f"network/interfaces/macs/{mac}/interface-id").strip()
+        for iface_id, mac in eni_to_mac.items():
             if iface_id not in eni_set:
                 continue
             ifname = ifname_for_mac(mac)
@@ -485,16 +2593,223 @@ def resolve_eni_ifnames(imds: EC2MetadataClient, eni_ids: List[str], attempts: i
     return []
 
 
+def resolve_eni_ifnames(
+    imds: Optional[EC2MetadataClient],
+    eni_ids: List[str],
+    eni_macs: Optional[Dict[str, str]] = None,
+    timeout_s: float = NIC_RESOLVE_TIMEOUT_S,
+    source=None,
+    record_path: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+) -> List[str]:
+    """
+    Map ENI IDs to kernel ifnames, returning as soon as every ENI's interface has appeared
+    (and udev has finished naming it). MACs missing from `eni_macs` are looked up in IMDS.
+    Falls back to sysfs polling when netlink is unavailable.
+    """
+    macs = {e: m.lower() for e, m in (eni_macs or {}).items() if e in eni_ids}
+    if source is None:
+        try:
+            source = NetlinkLinkSource(record_path, header={"eni_macs": macs})
+        except OSError as e:
+            if imds is None:
+                raise
+            log.warning("netlink unavailable (%s); falling back to sysfs polling", e)
+            return _poll_eni_ifnames(imds, eni_ids)
+
+    index = LinkIndex()
+    deadline = time.monotonic() + timeout_s
+    next_imds = 0.0
+    try:
+        while True:
+            check_cancelled(cancel)
+            if len(macs) < len(eni_ids) and imds is not None and time.monotonic() >= next_imds:
+                for eni_id, mac in imds.snapshot(max_age=0).eni_to_mac().items():
+                    if eni_id in eni_ids:
+                        macs[eni_id] = mac
+                next_imds = time.monotonic() + NIC_IMDS_RECHECK_S
+
+            found = {e: index.by_mac[m] for e, m in macs.items() if m in index.by_mac}
+            if len(found) == len(eni_ids) and (not source.live or all(_udev_settled(i) for i, _ in found.values())):
+                # drain anything already queued (e.g. a udev rename) before answering
+                while True:
+                    data = source.recv(0)
+                    if data is None:
+                        break
+                    index.apply(data)
+                found = {e: index.by_mac[m] for e, m in macs.items() if m in index.by_mac}
+                if len(found) == len(eni_ids):
+                    return sorted({name for _, name in found.values()})
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or source.exhausted:
+                missing = sorted(set(eni_ids) - set(found))
+                log.warning("Resolve ifnames gave up; missing ENIs=%s", missing)
+                return []
+            data = source.recv(min(remaining, NIC_RECHECK_S))
+            if data is not None:
+                index.apply(data)
+    finally:
+        source.close()
+
+
 # --- systemd management ---
 class SystemdManager:
+    def __init__(self) -> None:
+        self.reload_needed = False
+        self.exporter_changed = False
+        # (instance, mount point) pairs the state file records as mounted by a previous run
+        self.managed_mounts: Set[Tuple[str, str]] = set()
+
+    def _write_unit(self, path: str, content: str) -> bool:
+        try:
+            with open(path, "r") as f:
+                if f.read() == content:
+                    return False
+        except FileNotFoundError:
+            pass
+        write_file(path, content, 0o644)
+        self.reload_needed = True
+        return True
+
     def ensure_base(self) -> None:
         os.makedirs(ENV_DIR, exist_ok=True)
         write_file(MOUNT_SH_PATH, MOUNT_SH, 0o755)
         write_file(UMOUNT_SH_PATH, UMOUNT_SH, 0o755)
+        self._write_unit(SYSTEMD_TEMPLATE_UNIT_PATH, TEMPLATE_UNIT)
+
+    def ensure_exporter(self, textfile_dir: str, script: str) -> None:
+        """Install the metrics exporter `script`; it is (re)started by start_exporter()."""
+        os.makedirs(textfile_dir, exist_ok=True)
+        script_changed = sha256_file(EXPORTER_PY_PATH) != hashlib.sha256(script.encode()).hexdigest()
+        if script_changed:
+            write_file(EXPORTER_PY_PATH, script, 0o755)
+        unit_changed = self._write_unit(EXPORTER_UNIT_PATH, exporter_unit(textfile_dir))
+        self.exporter_changed = script_changed or unit_changed
+
+    def start_exporter(self) -> None:
+        unit = os.path.basename(EXPORTER_UNIT_PATH)
+        if self.reload_needed:
+            sh(["systemctl", "daemon-reload"], check=True)
+            self.reload_needed = False
+        sh(["systemctl", "enable", "--now", unit], check=True)
+        if self.exporter_changed:
+            sh(["systemctl", "restart", unit], check=True)
+
+    def _write_stage(
+        self, script: Tuple[str, str], conf: Tuple[str, str], unit: Tuple[str, str], dropin: Tuple[str, str]
+    ) -> bool:
+        """Write a boot stage's (path, content) script, config, unit and weka-mount@ drop-in; True if any changed."""
+        changed = False
+        for (path, content), mode in ((script, 0o755), (conf, 0o644)):
+            if sha256_file(path) != hashlib.sha256(content.encode()).hexdigest():
+                write_file(path, content, mode)
+                changed = True
+        changed = self._write_unit(*unit) or changed
+        return self._write_unit(*dropin) or changed
+
+    def remove_dropin(self, path: str) -> None:
+        """Stop requiring a boot stage from weka-mount@ (e.g. after switching to UDP mode)."""
+        if os.path.exists(path):
+            os.remove(path)
+            self.reload_needed = True
+
+    def _run_stage(self, unit_path: str, restart: bool) -> bool:
+        """Enable a oneshot boot stage and run it now; False if it failed."""
+        unit = os.path.basename(unit_path)
+        if self.reload_needed:
+            sh(["systemctl", "daemon-reload"], check=True)
+            self.reload_needed = False
+        sh(["systemctl", "enable", unit], check=True)
+        return sh(["systemctl", "restart" if restart else "start", unit], check=False).returncode == 0
+
+    @staticmethod
+    def _read_status(path: str) -> List[List[str]]:
+        try:
+            with open(path, "r") as f:
+                return [line.split(None, 2) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def ensure_hugepages(self, plan: Dict[int, int]) -> bool:
+        """Install the hugepage reservation unit and require it from weka-mount@; True if anything changed."""
+        conf = (
+            f'HUGEPAGE_KB="{HUGEPAGE_KB}"\n'
+            f'NODE_PAGES="{" ".join(f"{n}:{pages}" for n, pages in sorted(plan.items()))}"\n'
+        )
+        return self._write_stage(
+            (HUGEPAGES_SH_PATH, HUGEPAGES_SH),
+            (HUGEPAGES_CONF_PATH, conf),
+            (HUGEPAGES_UNIT_PATH, HUGEPAGES_UNIT),
+            (HUGEPAGES_DROPIN_PATH, HUGEPAGES_DROPIN),
+        )
 
-        if not os.path.exists(SYSTEMD_TEMPLATE_UNIT_PATH):
-            write_file(SYSTEMD_TEMPLATE_UNIT_PATH, TEMPLATE_UNIT, 0o644)
+    def reserve_hugepages(self, restart: bool) -> None:
+        """Run the reservation now, so a shortfall is reported before the mount is attempted."""
+        if self._run_stage(HUGEPAGES_UNIT_PATH, restart):
+            return
+        rows = self._read_status(HUGEPAGES_STATUS_PATH)
+        short = [f"node{n}: {have}/{want}" for n, want, have in rows if int(have) < int(want)]
+        raise RuntimeError(
+            f"Hugepage reservation failed (have/need {HUGEPAGE_KB}kB pages): "
+            f"{', '.join(short) or 'see journalctl -u ' + os.path.basename(HUGEPAGES_UNIT_PATH)}"
+        )
+
+    def ensure_nettune(self, conf: str) -> bool:
+        """Install the NIC/IRQ tuning unit and order weka-mount@ after it; True if anything changed."""
+        return self._write_stage(
+            (NETTUNE_SH_PATH, NETTUNE_SH),
+            (NETTUNE_CONF_PATH, conf),
+            (NETTUNE_UNIT_PATH, NETTUNE_UNIT),
+            (NETTUNE_DROPIN_PATH, NETTUNE_DROPIN),
+        )
+
+    def tune_nics(self, restart: bool) -> None:
+        """Apply and verify the tuning now; problems are logged, the mount goes ahead regardless."""
+        ok = self._run_stage(NETTUNE_UNIT_PATH, restart)
+        for level, what, detail in (r for r in self._read_status(NETTUNE_STATUS_PATH) if len(r) == 3):
+            if level == "ok":
+                log.info("NIC tuning: %s %s", what, detail)
+            else:
+                log.warning("NIC tuning %s: %s %s", level, what, detail)
+        if not ok:
+            log.warning(
+                "NIC tuning did not verify; see journalctl -u %s and %s",
+                os.path.basename(NETTUNE_UNIT_PATH), NETTUNE_STATUS_PATH,
+            )
+
+    def isolate_cores(self, cores: List[str], textfile_dir: str, script: str) -> None:
+        """Reserve `cores` for weka.slice (weka_cpuset.sh `script` apply); the verify timer re-checks it."""
+        if sha256_file(CPUSET_SH_PATH) != hashlib.sha256(script.encode()).hexdigest():
+            write_file(CPUSET_SH_PATH, script, 0o755)
+        self._write_unit(CPUSET_VERIFY_UNIT_PATH, cpuset_verify_unit(cores, textfile_dir))
+        self._write_unit(CPUSET_VERIFY_TIMER_PATH, CPUSET_VERIFY_TIMER)
+        cp = sh([CPUSET_SH_PATH, "apply", " ".join(cores)], check=False, capture=True)
+        if cp.returncode != 0:
+            raise RuntimeError(f"WEKA core isolation failed: {cp.stderr.strip() or cp.stdout.strip()}")
+
+    def verify_isolation(self, cores: List[str]) -> None:
+        """Check isolation once the client runs and start the periodic check; stray tasks are logged."""
+        if self.reload_needed:
             sh(["systemctl", "daemon-reload"], check=True)
+            self.reload_needed = False
+        sh(["systemctl", "enable", "--now", os.path.basename(CPUSET_VERIFY_TIMER_PATH)], check=True)
+        if sh([CPUSET_SH_PATH, "verify", " ".join(cores)], check=False, capture=True).returncode == 0:
+            log.info("WEKA cores %s are used only by weka.slice", ",".join(cores))
+            return
+        for level, what, detail in (r for r in self._read_status(CPUSET_STATUS_PATH) if len(r) == 3):
+            log.warning("Core isolation %s: %s %s", level, what, detail)
+
+    def remove_isolation(self) -> None:
+        """Undo isolate_cores() after --isolate-cores was dropped."""
+        if not os.path.exists(CPUSET_SH_PATH):
+            return
+        sh(["systemctl", "disable", "--now", os.path.basename(CPUSET_VERIFY_TIMER_PATH)], check=False)
+        sh([CPUSET_SH_PATH, "remove"], check=False)
+        for path in (CPUSET_VERIFY_UNIT_PATH, CPUSET_VERIFY_TIMER_PATH, CPUSET_SH_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+        self.reload_needed = True
 
     def _env_path(self, fs_instance: str) -> str:
         return os.path.join(ENV_DIR, f"{fs_instance}.conf")
@@ -520,6 +2835,19 @@ class SystemdManager:
     def _mountpoint_active(self, mount_point: str) -> bool:
         return sh(["mountpoint", "-q", mount_point], check=False).returncode == 0
 
+    def check_mount_point(self, fs_instance: str, mount_point: str) -> None:
+        # uniqueness: mount point cannot be used by another fs env
+        existing = self._scan_mountpoints()
+        owner = existing.get(mount_point)
+        if owner and owner != fs_instance:
+            raise RuntimeError(f"Mount point '{mount_point}' already assigned to filesystem '{owner}'")
+
+        if self._mountpoint_active(mount_point):
+            if (fs_instance, mount_point) in self.managed_mounts and mount_point in active_wekafs_mounts():
+                log.info("Mount point '%s' is already mounted by weka-mount@%s; leaving it", mount_point, fs_instance)
+                return
+            raise RuntimeError(f"Mount point '{mount_point}' is already mounted")
+
     def write_env(
         self,
         fs_instance: str,
@@ -530,15 +2858,19 @@ class SystemdManager:
         mgmt_ip: str,
         dpdk_nets: Optional[List[str]],
         cores: Optional[List[str]],
+        mount_options: Optional[List[str]] = None,
+        dpdk_enis: Optional[Dict[str, Tuple[str, str]]] = None,
+        profile: Optional[str] = None,
+        udp_cores: int = 0,
+        backends: Optional[List[str]] = None,
+        umount_budget: int = UMOUNT_BUDGET_S,
+        umount_phases: Tuple[str, ...] = UMOUNT_PHASES,
+        umount_holders: str = "kill",
+        ena_express: bool = False,
+        check: bool = True,
     ) -> str:
-        # uniqueness: mount point cannot be used by another fs env
-        existing = self._scan_mountpoints()
-        owner = existing.get(mount_point)
-        if owner and owner != fs_instance:
-            raise RuntimeError(f"Mount point '{mount_point}' already assigned to filesystem '{owner}'")
-
-        if self._mountpoint_active(mount_point):
-            raise RuntimeError(f"Mount point '{mount_point}' is already mounted")
+        if check:
+            self.check_mount_point(fs_instance, mount_point)
 
         lines: List[str] = [
             f'ALB_HOST="{alb_host}"',
@@ -546,102 +2878,961 @@ class SystemdManager:
             f'MOUNT_POINT="{mount_point}"',
             f'MODE="{mode}"',
             f'MGMT_IP="{mgmt_ip}"',
+            f'PROFILE="{profile or ""}"',
+            f'PROFILE_OPTIONS="{",".join(MOUNT_PROFILES[profile]) if profile else ""}"',
+            f'MOUNT_OPTIONS="{",".join(mount_options or [])}"',
+            f'BACKENDS="{" ".join(backends or [])}"',
+            f'UMOUNT_BUDGET="{umount_budget}"',
+            f'UMOUNT_PHASES="{" ".join(umount_phases)}"',
+            f'UMOUNT_HOLDERS="{umount_holders}"',
+            f'ENA_EXPRESS="{"on" if ena_express else "off"}"',
         ]
 
         if mode == "dpdk":
             if not dpdk_nets or not cores:
                 raise RuntimeError("DPDK mode requires resolved NICs and cores")
             lines.append(f'DPDK_NETS="{ " ".join(dpdk_nets) }"')
+            # ifname -> (ENI ID, MAC); weka_mount.sh re-resolves the ifnames from the MACs
+            enis = dpdk_enis or {}
+            if all(enis.get(n, ("", ""))[1] for n in dpdk_nets):
+                lines.append(f'DPDK_ENIS="{ " ".join("=".join(enis[n]) for n in dpdk_nets) }"')
+            else:
+                lines.append('DPDK_ENIS=""')
             lines.append(f'CORES="{ " ".join(cores) }"')
         else:
             lines.append('DPDK_NETS=""')
+            lines.append('DPDK_ENIS=""')
             lines.append('CORES=""')
+            lines.append(f'UDP_CORES="{udp_cores or ""}"')
 
         path = self._env_path(fs_instance)
         write_file(path, "\n".join(lines) + "\n", 0o600)
         return path
 
-    def enable_now(self, fs_instance: str) -> str:
-        unit = f"weka-mount@{fs_instance}.service"
-        log.info("Enabling/starting: %s", unit)
-        sh(["systemctl", "daemon-reload"], check=True)
-        sh(["systemctl", "enable", "--now", unit], check=True)
-        return unit
+    def ensure_async(self, fs_instances: List[str]) -> None:
+        """
+        Install the --async-mount drop-ins of these instances: Type=notify mounts, ordered after
+        the first, each holding slurmd. They are per instance, so the drop-ins of filesystems
+        mounted by other runs are left alone.
+        """
+        units = [f"weka-mount@{i}.service" for i in fs_instances]
+        for i, unit in zip(fs_instances, units):
+            self._write_unit(MOUNT_NOTIFY_DROPIN_PATH.format(instance=i), MOUNT_NOTIFY_DROPIN)
+            self._write_unit(SLURMD_DROPIN_PATH.format(instance=i), slurmd_dropin(unit))
+        for i in fs_instances[1:]:
+            self._write_unit(MOUNT_ORDER_DROPIN_PATH.format(instance=i), mount_order_dropin(units[0]))
+        self.remove_dropin(MOUNT_ORDER_DROPIN_PATH.format(instance=fs_instances[0]))
+
+    def remove_async(self, fs_instances: List[str]) -> None:
+        for i in fs_instances:
+            for path in (MOUNT_NOTIFY_DROPIN_PATH, SLURMD_DROPIN_PATH, MOUNT_ORDER_DROPIN_PATH):
+                self.remove_dropin(path.format(instance=i))
+
+    def enable_now(self, fs_instances: List[str], block: bool = True) -> List[str]:
+        """
+        Reload systemd once (only if a unit file changed) and start all mount units.
+        The first unit runs alone so it brings up the client container; the others
+        then start together in one systemd transaction and share that container.
+        With block=False the start jobs are only queued (--async-mount); the order
+        drop-ins then keep the other units behind the first one.
+        """
+        units = [f"weka-mount@{i}.service" for i in fs_instances]
+        if self.reload_needed:
+            sh(["systemctl", "daemon-reload"], check=True)
+            self.reload_needed = False
+        if not block:
+            log.info("Enabling/queueing: %s", " ".join(units))
+            sh(["systemctl", "enable", "--now", "--no-block", *units], check=True)
+            return units
+        log.info("Enabling/starting: %s", " ".join(units))
+        sh(["systemctl", "enable", "--now", units[0]], check=True)
+        if len(units) > 1:
+            sh(["systemctl", "enable", "--now", *units[1:]], check=True)
+        return units
+
+
+# --- reconcile state ---
+def sha256_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def weka_fingerprint() -> Optional[Dict]:
+    """Identify the installed `weka` binary without running it."""
+    path = shutil.which("weka")
+    if not path:
+        return None
+    st = os.stat(os.path.realpath(path))
+    return {"path": os.path.realpath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def active_wekafs_mounts() -> Set[str]:
+    mounts: Set[str] = set()
+    with open("/proc/self/mounts", "r") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 3 and fields[2] == "wekafs":
+                mounts.add(fields[1].replace("\\040", " "))
+    return mounts
+
+
+def nic_macs(ifnames: List[str]) -> Dict[str, str]:
+    macs: Dict[str, str] = {}
+    for ifname in ifnames:
+        try:
+            with open(f"/sys/class/net/{ifname}/address", "r") as f:
+                macs[ifname] = f.read().strip().lower()
+        except OSError:
+            continue
+    return macs
+
+
+def ifnames_by_mac() -> Dict[str, str]:
+    """MAC -> ifname for every netdev in /sys/class/net."""
+    return {mac: ifname for ifname, mac in nic_macs(sorted(os.listdir("/sys/class/net"))).items()}
+
+
+class MounterState:
+    """
+    The desired state of a run (derived from its arguments) and the state it observed on
+    success (NICs, cores, written files, installed client), persisted in STATE_PATH.
+    A rerun compares both against the node locally and only redoes the parts that drifted.
+    """
+
+    def __init__(self, desired: Dict, observed: Optional[Dict] = None) -> None:
+        self.desired = desired
+        self.observed = observed or {}
+
+    @staticmethod
+    def desired_from_args(args: argparse.Namespace, filesystems: List["FilesystemSpec"]) -> Dict:
+        core_spec: Optional[CoreSpec] = args.cores
+        return {
+            "alb_host": args.alb_dns_name,
+            "filesystems": [[fs.name, fs.mount_point, fs.options] for fs in filesystems],
+            "cores": None if core_spec is None else (
+                f"auto:{core_spec.count}" if core_spec.auto else ",".join(core_spec.cores)
+            ),
+            "security_groups": args.security_groups or [],
+            "eni_pool": args.eni_pool,
+            "weka_min_version": args.weka_min_version,
+            "weka_version": args.weka_version,
+            "mount_profile": args.mount_profile,
+            "mount_options": args.mount_option or [],
+            "udp_cores": args.udp_cores,
+            "backends": args.backends or [],
+            "discover_backends": args.discover_backends,
+            "umount_budget": args.umount_budget,
+            "umount_phases": list(args.umount_phases),
+            "umount_holders": args.umount_holders,
+            "metrics_exporter": args.metrics_exporter,
+            "metrics_textfile_dir": args.metrics_textfile_dir,
+            "hugepages": args.hugepages,
+            "nic_tuning": args.nic_tuning,
+            "nic_mtu": args.nic_mtu,
+            "isolate_cores": args.isolate_cores,
+            "ena_express": args.ena_express,
+            "async_mount": args.async_mount,
+        }
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MounterState"]:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable state file %s: %s", path, e)
+            return None
+        if data.get("version") != STATE_SCHEMA_VERSION:
+            return None
+        return cls(data.get("desired", {}), data.get("observed", {}))
+
+    def save(self, path: str) -> None:
+        data = {"version": STATE_SCHEMA_VERSION, "desired": self.desired, "observed": self.observed}
+        write_file(path, json.dumps(data, indent=1, sort_keys=True) + "\n", 0o600)
+
+    def drift(self, desired: Dict) -> Set[str]:
+        """
+        Return the drifted parts: "desired" (arguments changed, or a filesystem is not in the
+        stored ones; a run that reused the client added its own), "nics" (a DPDK NIC's MAC is
+        gone, i.e. it is neither a netdev nor, per IMDS, attached; while a mount or the client
+        container is up, only IMDS is asked), "install" (client binary changed), "files" (scripts, unit or env files differ,
+        or a DPDK NIC was renamed; its observed ifname is updated) and "mounts" (a mount
+        point is not mounted).
+        """
+        if not self.observed or not self.desired:
+            return {"desired"}
+        stored = {k: v for k, v in self.desired.items() if k != "filesystems"}
+        if {k: v for k, v in desired.items() if k != "filesystems"} != stored:
+            return {"desired"}
+        if any(fs not in self.desired["filesystems"] for fs in desired["filesystems"]):
+            return {"desired"}
+        drift: Set[str] = set()
+        mounted = active_wekafs_mounts()
+
+        nics = [n for n in self.observed.get("nics", []) if n["mac"]]
+        current = nic_macs([n["ifname"] for n in nics])
+        if nics and (
+            any(mp in mounted for _, mp, _ in self.desired["filesystems"]) or running_client_container()
+        ):
+            # the client container owns the DPDK NICs, which are no netdevs then: check that the
+            # ENIs are still attached instead
+            attached = imds_attached_macs()
+            if attached is None or any(n["mac"] not in attached for n in nics):
+                drift.add("nics")
+        elif any(current.get(n["ifname"]) != n["mac"] for n in nics):
+            by_mac = ifnames_by_mac()
+            attached: Optional[Set[str]] = None
+            for n in nics:
+                if current.get(n["ifname"]) == n["mac"]:
+                    continue
+                if n["mac"] not in by_mac:
+                    # not a netdev (e.g. still bound to DPDK): fine while its ENI is attached;
+                    # weka_mount.sh keeps the recorded name for it
+                    if attached is None:
+                        attached = imds_attached_macs() or set()
+                    if n["mac"] not in attached:
+                        drift.add("nics")
+                        break
+                    continue
+                log.info("DPDK NIC %s (%s) is now %s", n["ifname"], n["eni_id"], by_mac[n["mac"]])
+                n["ifname"] = by_mac[n["mac"]]
+                drift.add("files")
+
+        if weka_fingerprint() != self.observed.get("weka"):
+            drift.add("install")
+
+        if any(sha256_file(p) != h for p, h in self.observed.get("files", {}).items()):
+            drift.add("files")
+
+        if any(mp not in mounted for _, mp, _ in desired["filesystems"]):
+            drift.add("mounts")
+        return drift
+
+
+# --- phase executor ---
+class PhaseGraph:
+    """
+    Runs the provisioning phases concurrently, each as soon as the phases it depends on
+    have finished. On the first failure `cancel` is set (long waits in the running phases
+    check it and raise PhaseCancelled), no further phase is started, the running ones are
+    joined, the finished ones are undone in reverse order and the failure is re-raised.
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, Tuple[Callable[[], object], Tuple[str, ...], Optional[Callable[[object], None]]]] = {}
+        self.cancel = threading.Event()
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], object],
+        deps: Tuple[str, ...] = (),
+        undo: Optional[Callable[[object], None]] = None,
+    ) -> None:
+        unknown = [d for d in deps if d not in self.phases]
+        if unknown:
+            raise ValueError(f"phase {name} depends on unknown phases {unknown}")
+        self.phases[name] = (fn, deps, undo)
+
+    def run(self) -> Dict[str, object]:
+        """Run every phase; returns name -> result."""
+        results: Dict[str, object] = {}
+        finished: List[str] = []
+        error: Optional[BaseException] = None
+        pending = dict(self.phases)
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(self.phases))) as pool:
+            while pending or running:
+                if error is None:
+                    for name, (fn, deps, _) in list(pending.items()):
+                        if all(d in results for d in deps):
+                            running[pool.submit(fn)] = name
+                            del pending[name]
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    try:
+                        results[name] = fut.result()
+                        finished.append(name)
+                    except BaseException as e:
+                        # keep the root cause, not the cancellations it triggered
+                        if error is None or (isinstance(error, PhaseCancelled) and not isinstance(e, PhaseCancelled)):
+                            error = e
+                        log.error("Phase %s failed: %s", name, e)
+                        self.cancel.set()
+                if error is not None and not running:
+                    break
+        if error is None:
+            return results
+        for name in reversed(finished):
+            undo = self.phases[name][2]
+            if undo is None:
+                continue
+            log.info("Undoing phase %s", name)
+            try:
+                undo(results[name])
+            except Exception as e:
+                log.warning("Undoing phase %s failed: %s", name, e)
+        raise error
 
 
 # --- args / main ---
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Mount a WEKA filesystem (optional DPDK ENI provisioning).")
-    p.add_argument("--alb-dns-name", required=True, help="ALB hostname only (no scheme/path)")
+    p.add_argument(
+        "--alb-dns-name",
+        default="",
+        help="ALB hostname only (no scheme/path); required unless --refresh-catalog or --netlink-replay",
+    )
     p.add_argument("--filesystem-name", default="default", help="Filesystem name (also systemd instance)")
     p.add_argument("--mount-point", default="/mnt/weka", help="Mount point")
-    p.add_argument("--cores", type=lambda x: x.split(","), help="Comma-separated CPU cores (DPDK mode; 1 core per NIC)")
+    p.add_argument(
+        "--filesystem",
+        action="append",
+        type=FilesystemSpec.parse,
+        help="name:/mount/point[:options]; repeat to mount several filesystems "
+        "(overrides --filesystem-name/--mount-point)",
+    )
+    p.add_argument(
+        "--backends",
+        type=backends_arg,
+        default=None,
+        help="Comma-separated backend hosts/IPs to probe and mount from, fastest first (the ALB is always a fallback)",
+    )
+    p.add_argument(
+        "--discover-backends",
+        action="store_true",
+        help="Add the healthy targets behind the ALB to the backend candidates (needs elasticloadbalancing:Describe*)",
+    )
+    p.add_argument(
+        "--umount-budget",
+        type=int,
+        default=UMOUNT_BUDGET_S,
+        help="Hard time budget in seconds for weka_umount.sh (shutdown/scale-in)",
+    )
+    p.add_argument(
+        "--umount-phases",
+        type=umount_phases_arg,
+        default=list(UMOUNT_PHASES),
+        help=f"Comma-separated unmount phases, run in order until unmounted (from: {','.join(UMOUNT_PHASES)})",
+    )
+    p.add_argument(
+        "--umount-holders",
+        choices=["kill", "report"],
+        default="kill",
+        help="'kill' phase: kill processes holding the mount, or only log them",
+    )
+    p.add_argument(
+        "--metrics-textfile-dir",
+        default=TEXTFILE_DIR,
+        help="node_exporter textfile collector directory for the WEKA client metrics exporter",
+    )
+    p.add_argument(
+        "--timings",
+        action="store_true",
+        help="Log a per-phase timing summary at exit",
+    )
+    p.add_argument(
+        "--timings-file",
+        default=SPANS_PATH,
+        help="JSON-lines file each phase span is appended to ('' to disable)",
+    )
+    p.add_argument(
+        "--no-metrics-exporter",
+        dest="metrics_exporter",
+        action="store_false",
+        help="Do not install the weka-exporter.service metrics exporter",
+    )
+    p.add_argument(
+        "--assets",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="Directory or s3://bucket/prefix/ holding the scripts shared with HyperPod "
+        f"({EXPORTER_PY_ASSET}, {CPUSET_SH_ASSET}; default: beside this script)",
+    )
+    p.add_argument(
+        "--no-hugepages",
+        dest="hugepages",
+        action="store_false",
+        help="DPDK mode: do not reserve hugepages per NUMA node before mounting (weka-hugepages.service)",
+    )
+    p.add_argument(
+        "--no-nic-tuning",
+        dest="nic_tuning",
+        action="store_false",
+        help="Do not move IRQs off the DPDK cores or tune the UDP-mode data interface (weka-nettune.service)",
+    )
+    p.add_argument(
+        "--nic-mtu",
+        type=int,
+        default=NIC_MTU,
+        help="UDP mode: MTU of the data interface (0 = leave unchanged)",
+    )
+    p.add_argument(
+        "--isolate-cores",
+        action="store_true",
+        help="DPDK mode: reserve the DPDK cores for the WEKA client with cgroup v2 cpusets (weka.slice) "
+        "and verify it every 5 minutes",
+    )
+    p.add_argument(
+        "--scale-up",
+        action="store_true",
+        help="DPDK mode: provision new NICs and cores even if a WEKA client container is already running "
+        "(default: mount through it)",
+    )
+    p.add_argument(
+        "--async-mount",
+        action="store_true",
+        help="Return once the mount units are queued; weka-mount@ reports readiness (Type=notify) "
+        "and slurmd is held until the mounts are ready",
+    )
+    p.add_argument(
+        "--ena-express",
+        action="store_true",
+        help="Enable ENA Express (SRD, including UDP) on the primary ENI (UDP mode) or the DPDK ENIs, "
+        "if the instance type supports it",
+    )
+    p.add_argument(
+        "--mount-profile",
+        choices=sorted(MOUNT_PROFILES),
+        default=None,
+        help="Named set of wekafs mount options for every filesystem (overridable per --filesystem)",
+    )
+    p.add_argument(
+        "--mount-option",
+        action="append",
+        type=mount_option_arg,
+        default=None,
+        help="Extra wekafs mount option passed through as-is (repeatable), e.g. sync_on_close",
+    )
+    p.add_argument("--udp-cores", type=int, default=0, help="UDP mode: number of frontend cores (num_cores)")
+    p.add_argument(
+        "--cores",
+        type=CoreSpec.parse,
+        help="DPDK mode (1 core per NIC): comma-separated CPU cores, or auto[:N] to pick N NUMA-local "
+        "physical cores (default N: one per NUMA node)",
+    )
     p.add_argument("--security-groups", type=lambda x: x.split(","), help="Comma-separated security group IDs for new ENIs")
+    p.add_argument(
+        "--eni-pool",
+        default=None,
+        help="DPDK mode: claim available ENIs tagged weka-eni-pool=<name> before creating new ones "
+        "(see weka-eni-pool.py)",
+    )
+    p.add_argument("--ec2-rate", type=float, default=EC2_RATE, help="Client-side EC2 request rate per node (requests/s, 0 = unlimited)")
+    p.add_argument("--ec2-burst", type=int, default=EC2_BURST, help="Client-side EC2 request burst per node")
+    p.add_argument(
+        "--ec2-fleet-rate",
+        type=float,
+        default=None,
+        help="EC2 request budget for the whole fleet (requests/s); with --fleet-size overrides --ec2-rate",
+    )
+    p.add_argument("--fleet-size", type=int, default=None, help="Number of nodes sharing --ec2-fleet-rate")
+    p.add_argument("--ec2-max-retries", type=int, default=EC2_MAX_RETRIES, help="Retries per throttled EC2 call")
     p.add_argument("--weka-min-version", default=None, help="Minimum WEKA version, e.g. 4.2.13")
+    p.add_argument(
+        "--weka-version",
+        default=None,
+        help="WEKA client version to install (default: the version the backend serves); lets a cache hit "
+        "skip contacting the backend",
+    )
+    p.add_argument(
+        "--installer-cache",
+        action="append",
+        default=None,
+        help="Installer cache directory, e.g. on a shared filesystem; repeatable, searched before "
+        f"{', '.join(INSTALLER_CACHE_DIRS)}",
+    )
+    p.add_argument("--installer-sha256", default=None, help="Expected sha256 of the client release tarball")
+    p.add_argument("--instance-catalog", default=CATALOG_PATH, help="Instance-type network catalog (JSON)")
+    p.add_argument(
+        "--refresh-catalog",
+        action="store_true",
+        help="Rebuild --instance-catalog from describe_instance_types for this region and exit",
+    )
+    p.add_argument("--netlink-record", default=None, help="Record netlink link events seen during NIC resolution to this file")
+    p.add_argument(
+        "--netlink-replay",
+        default=None,
+        help="Test mode: resolve NICs from a --netlink-record file and exit (no IMDS/EC2/systemd)",
+    )
+    p.add_argument("--state-file", default=STATE_PATH, help="Desired/observed state used to skip unchanged reruns")
+    p.add_argument("--force", action="store_true", help="Ignore the state file and run every phase")
     p.add_argument("--dry-run", action="store_true")
     p.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"])
     return p.parse_args()
 
 
+def provision_dpdk(
+    eni: EC2NetworkInterfaceManager,
+    args: argparse.Namespace,
+    topo: CpuTopology,
+    core_spec: CoreSpec,
+    nic_count: int,
+) -> Tuple[List[Dict], List[str], List[str], bool]:
+    """
+    Create, attach and resolve the DPDK NICs; returns (nic records, ifnames, cores, ENA Express on).
+    The ENIs are rolled back if anything after provisioning fails.
+    """
+    created = eni.provision_enis(nic_count, args.security_groups, pool=args.eni_pool)
+    try:
+        ena_express = False
+        if eni.ena_express:
+            # requested in AttachNetworkInterface; confirm EC2 applied it
+            with SPANS.span("ena_express", enis=len(created)):
+                ena_express = eni.verify_ena_express(created)
+
+        with SPANS.span("nic.resolve", count=len(created)):
+            dpdk_ifnames = resolve_eni_ifnames(
+                eni.imds, created, eni.eni_macs, record_path=args.netlink_record, cancel=eni.cancel,
+            )
+        if len(dpdk_ifnames) != nic_count:
+            raise RuntimeError(
+                f"DPDK requires 1 NIC per core: cores={nic_count} nics={len(dpdk_ifnames)} ({dpdk_ifnames})"
+            )
+
+        nic_nodes = [topo.nic_node(i) for i in dpdk_ifnames]
+        if core_spec.auto:
+            cores = topo.select_dpdk_cores(nic_nodes)
+            log.info("Selected DPDK cores %s for NICs %s (NUMA nodes %s)", cores, dpdk_ifnames, nic_nodes)
+        else:
+            cores = core_spec.cores
+            topo.check_numa(cores, nic_nodes)
+    except Exception:
+        eni.rollback()
+        raise
+
+    mac_to_eni = {m.lower(): e for e, m in eni.eni_macs.items()}
+    nics = [
+        {"eni_id": mac_to_eni.get(mac, ""), "mac": mac, "ifname": ifname, "ena_express": ena_express}
+        for ifname, mac in nic_macs(dpdk_ifnames).items()
+    ]
+    return nics, dpdk_ifnames, cores, ena_express
+
+
+def reuse_client(
+    client: Dict, prior: Optional["MounterState"], core_spec: Optional[CoreSpec]
+) -> Optional[Tuple[List[Dict], List[str], List[str], bool]]:
+    """
+    The running client container's DPDK NICs and cores, in provision_dpdk()'s shape, or None if
+    it has none (e.g. a UDP client). ENI IDs and MACs come from the previous run's state; a NIC
+    missing there keeps its ifname with an empty ENI ID and MAC. Raises if `--cores` asks for
+    other cores or another NIC count than the client has (that needs --scale-up).
+    """
+    if not client["nets"] or not client["cores"]:
+        log.warning(
+            "Client container %s runs without DPDK NICs/cores (%s); provisioning new ones",
+            client["name"], " ".join(client["nets"]) or "udp",
+        )
+        return None
+    if core_spec and not core_spec.auto and sorted(core_spec.cores, key=int) != sorted(client["cores"], key=int):
+        raise RuntimeError(
+            f"--cores {','.join(core_spec.cores)} differs from the running client container's cores "
+            f"{','.join(client['cores'])}; pass --scale-up to add NICs/cores"
+        )
+    if core_spec and core_spec.auto and core_spec.count and core_spec.count != len(client["nets"]):
+        raise RuntimeError(
+            f"--cores auto:{core_spec.count} asks for {core_spec.count} NICs/cores; the running client "
+            f"container has {len(client['nets'])}; pass --scale-up to add NICs/cores"
+        )
+    observed = prior.observed if prior else {}
+    known = {n["ifname"]: n for n in observed.get("nics", [])}
+    nics = []
+    for n in client["nets"]:
+        if n not in known:
+            log.warning("DPDK NIC %s of the running client is not in the previous run's state; ENI and MAC unknown", n)
+        nics.append(known.get(n, {"eni_id": "", "mac": "", "ifname": n}))
+    log.info(
+        "Mounting through the running client container %s (nets=%s cores=%s); use --scale-up for new NICs/cores",
+        client["name"], " ".join(client["nets"]), " ".join(client["cores"]),
+    )
+    return nics, client["nets"], client["cores"], bool(observed.get("ena_express", False))
+
+
+def load_assets(args: argparse.Namespace, mode: str) -> Dict[str, Optional[str]]:
+    """The --assets scripts this run installs, read before any change is made."""
+    names = [EXPORTER_PY_ASSET] if args.metrics_exporter else []
+    if mode == "dpdk" and args.isolate_cores:
+        names.append(CPUSET_SH_ASSET)
+    assets = {name: read_asset(args.assets, name) for name in names}
+    if EXPORTER_PY_ASSET in assets and assets[EXPORTER_PY_ASSET] is None:
+        log.warning(
+            "%s not found in %s; the metrics exporter is not installed (upload it beside weka-install.py "
+            "and pass --assets, or use --no-metrics-exporter)", EXPORTER_PY_ASSET, args.assets,
+        )
+    if CPUSET_SH_ASSET in assets and assets[CPUSET_SH_ASSET] is None:
+        raise RuntimeError(
+            f"--isolate-cores needs {CPUSET_SH_ASSET}, which is not in {args.assets} "
+            "(upload it beside weka-install.py and pass --assets)"
+        )
+    return assets
+
+
+def write_and_start(
+    sd: SystemdManager,
+    args: argparse.Namespace,
+    filesystems: List[FilesystemSpec],
+    mode: str,
+    mgmt_ip: str,
+    dpdk_ifnames: Optional[List[str]],
+    cores: Optional[List[str]],
+    backends: Optional[List[str]] = None,
+    ena_express: bool = False,
+    nics: Optional[List[Dict]] = None,
+    reused: bool = False,
+    check: bool = True,
+    assets: Optional[Dict[str, Optional[str]]] = None,
+) -> List[str]:
+    assets = assets or {}
+    exporter = assets.get(EXPORTER_PY_ASSET)
+    cpuset = assets.get(CPUSET_SH_ASSET)
+    isolate = mode == "dpdk" and args.isolate_cores and cpuset is not None
+    with SPANS.span("env.write", filesystems=len(filesystems)):
+        sd.ensure_base()
+        if exporter:
+            sd.ensure_exporter(args.metrics_textfile_dir, exporter)
+        env_paths = [
+            sd.write_env(
+                fs_instance=fs.instance,
+                alb_host=args.alb_dns_name,
+                fs_name=fs.instance,
+                mount_point=fs.mount_point,
+                mode=mode,
+                mgmt_ip=mgmt_ip,
+                dpdk_nets=dpdk_ifnames,
+                cores=cores,
+                mount_options=(args.mount_option or []) + fs.mount_options,
+                dpdk_enis={n["ifname"]: (n["eni_id"], n["mac"]) for n in nics or []},
+                profile=fs.profile or args.mount_profile,
+                udp_cores=args.udp_cores,
+                backends=backends,
+                umount_budget=args.umount_budget,
+                umount_phases=tuple(args.umount_phases),
+                umount_holders=args.umount_holders,
+                ena_express=ena_express,
+                check=check,
+            )
+            for fs in filesystems
+        ]
+    if reused:
+        # the running client keeps the hugepages and tuning of the run that started it
+        log.info("Running client reused; hugepage and NIC tuning stages left unchanged")
+    else:
+        if mode == "dpdk" and args.hugepages:
+            memory_mb = client_memory_mb([
+                (MOUNT_PROFILES[fs.profile or args.mount_profile] if fs.profile or args.mount_profile else [])
+                + (args.mount_option or []) + fs.mount_options
+                for fs in filesystems
+            ])
+            plan = hugepage_plan(CpuTopology(), cores, dpdk_ifnames, memory_mb)
+            with SPANS.span("hugepages", pages=sum(plan.values())):
+                log.info("Hugepages per NUMA node (%dkB): %s", HUGEPAGE_KB, plan)
+                sd.reserve_hugepages(restart=sd.ensure_hugepages(plan))
+        else:
+            sd.remove_dropin(HUGEPAGES_DROPIN_PATH)
+        if args.nic_tuning:
+            mtu = args.nic_mtu
+            if ena_express and mtu > ENA_EXPRESS_MAX_MTU:
+                log.info("Capping MTU at %d so traffic uses ENA Express", ENA_EXPRESS_MAX_MTU)
+                mtu = ENA_EXPRESS_MAX_MTU
+            dpdk_cores = sorted(int(c) for c in cores) if mode == "dpdk" else []
+            online = CpuTopology().online if dpdk_cores else set()
+            conf = "".join(f'{k}="{v}"\n' for k, v in (
+                ("WEKA_CORES", ",".join(map(str, dpdk_cores))),
+                ("ALLOWED_CPUS", ",".join(str(c) for c in sorted(online - set(dpdk_cores)))),
+                ("WEKA_CPU_MASK", cpu_mask(dpdk_cores) if dpdk_cores else ""),
+                ("UDP_MGMT_IP", mgmt_ip if mode == "udp" else ""),
+                ("MTU", (mtu or "") if mode == "udp" else ""),
+                ("RINGS", NIC_RINGS if mode == "udp" else ""),
+                ("QUEUES", NIC_QUEUES if mode == "udp" else ""),
+            ))
+            with SPANS.span("nic.tune"):
+                sd.tune_nics(restart=sd.ensure_nettune(conf))
+        else:
+            sd.remove_dropin(NETTUNE_DROPIN_PATH)
+    if isolate:
+        # before the mount, so the client container starts in weka.slice
+        with SPANS.span("cpuset.apply", cores=len(cores)):
+            sd.isolate_cores(cores, args.metrics_textfile_dir, cpuset)
+    else:
+        sd.remove_isolation()
+    instances = [fs.instance for fs in filesystems]
+    if args.async_mount:
+        sd.ensure_async(instances)
+    else:
+        sd.remove_async(instances)
+    # weka-mount@ is a oneshot unit, so starting it includes the mount itself, unless --async-mount
+    with SPANS.span("systemd.start_mount", filesystems=len(filesystems), block=not args.async_mount):
+        units = sd.enable_now(instances, block=not args.async_mount)
+    if isolate and not args.async_mount:
+        with SPANS.span("cpuset.verify"):
+            sd.verify_isolation(cores)
+    if exporter:
+        with SPANS.span("systemd.start_exporter"):
+            sd.start_exporter()
+    if args.async_mount:
+        log.info("Mounts continue in the background; follow them with: systemctl status %s", " ".join(units))
+    log.info("Done. units=%s env=%s", " ".join(units), " ".join(env_paths))
+    return env_paths
+
+
+def managed_files(args: argparse.Namespace, env_paths: List[str], mode: str) -> Dict[str, Optional[str]]:
+    """Hashes of every file a run writes, for drift detection on reruns."""
+    paths = [MOUNT_SH_PATH, UMOUNT_SH_PATH, SYSTEMD_TEMPLATE_UNIT_PATH, *env_paths]
+    if args.metrics_exporter:
+        paths += [EXPORTER_PY_PATH, EXPORTER_UNIT_PATH]
+    if mode == "dpdk" and args.hugepages:
+        paths += [HUGEPAGES_SH_PATH, HUGEPAGES_UNIT_PATH, HUGEPAGES_DROPIN_PATH, HUGEPAGES_CONF_PATH]
+    if mode == "dpdk" and args.isolate_cores:
+        paths += [CPUSET_SH_PATH, CPUSET_VERIFY_UNIT_PATH, CPUSET_VERIFY_TIMER_PATH]
+    if args.nic_tuning:
+        paths += [NETTUNE_SH_PATH, NETTUNE_UNIT_PATH, NETTUNE_DROPIN_PATH, NETTUNE_CONF_PATH]
+    if args.async_mount:
+        instances = [os.path.basename(p)[:-len(".conf")] for p in env_paths]
+        paths += [p.format(instance=i) for i in instances for p in (MOUNT_NOTIFY_DROPIN_PATH, SLURMD_DROPIN_PATH)]
+        paths += [MOUNT_ORDER_DROPIN_PATH.format(instance=i) for i in instances[1:]]
+    return {p: sha256_file(p) for p in paths}
+
+
 def main() -> None:
     args = parse_args()
     log.setLevel(getattr(logging, args.log_level))
+    SPANS.configure(
+        args.timings_file or None,
+        args.metrics_textfile_dir if args.metrics_exporter else None,
+        args.timings,
+    )
+
+    if args.netlink_replay:
+        src = ReplayLinkSource(args.netlink_replay)
+        eni_macs = src.header.get("eni_macs", {})
+        ifnames = resolve_eni_ifnames(None, list(eni_macs), eni_macs, source=src)
+        log.info("REPLAY: ENIs=%s -> ifnames=%s", sorted(eni_macs), ifnames)
+        return
 
     ensure_root()
 
+    if not args.alb_dns_name and not args.refresh_catalog:
+        raise ValueError("--alb-dns-name is required")
     # Force HTTP usage by ensuring user provided a hostname only
-    if "://" in args.alb_dns_name or "/" in args.alb_dns_name:
+    if args.alb_dns_name and not valid_host(args.alb_dns_name):
         raise ValueError("--alb-dns-name must be a hostname only (no scheme or path)")
 
-    fs_instance = sanitize_instance_name(args.filesystem_name)
-    mode = "dpdk" if args.cores else "udp"
+    filesystems: List[FilesystemSpec] = args.filesystem or [FilesystemSpec(args.filesystem_name, args.mount_point)]
+    if len({fs.instance for fs in filesystems}) != len(filesystems):
+        raise ValueError("--filesystem names must be unique")
+    if len({fs.mount_point for fs in filesystems}) != len(filesystems):
+        raise ValueError("--filesystem mount points must be unique")
+    core_spec: Optional[CoreSpec] = args.cores
+    mode = "dpdk" if core_spec else "udp"
+    if args.umount_budget <= 0:
+        raise ValueError("--umount-budget must be > 0")
+    if args.udp_cores < 0:
+        raise ValueError("--udp-cores must be >= 0")
+    if args.udp_cores and mode == "dpdk":
+        log.warning("--udp-cores is ignored in DPDK mode (cores come from --cores)")
+    if args.isolate_cores and mode != "dpdk":
+        log.warning("--isolate-cores only applies to DPDK mode (--cores)")
+
+    # fast path: compare desired and observed state locally before touching IMDS/EC2
+    desired = MounterState.desired_from_args(args, filesystems)
+    with SPANS.span("state.drift") as sp:
+        state = None if args.force or args.refresh_catalog else MounterState.load(args.state_file)
+        drift = state.drift(desired) if state else {"desired"}
+        sp["drift"] = sorted(drift)
+    if not drift:
+        log.info("No drift against %s; nothing to do", args.state_file)
+        return
+    log.info("Drift: %s", ", ".join(sorted(drift)))
+    assets = load_assets(args, mode)
+
+    load_cloud_deps()
+    ec2_rate = args.ec2_rate
+    if args.ec2_fleet_rate and args.fleet_size:
+        ec2_rate = args.ec2_fleet_rate / args.fleet_size
+    EC2_LAYER.configure(ec2_rate, args.ec2_burst, args.ec2_max_retries)
+    sd = SystemdManager()
+
+    if state and "desired" not in drift and "nics" not in drift and not args.dry_run:
+        # NICs, cores and mgmt IP are unchanged: redo only the local parts that drifted
+        obs = state.observed
+        if "install" in drift:
+            with SPANS.span("install"):
+                obs["weka_version"] = list(ensure_weka_installed(
+                    obs.get("install_host", args.alb_dns_name),
+                    args.weka_min_version,
+                    (args.installer_cache or []) + INSTALLER_CACHE_DIRS,
+                    args.weka_version,
+                    args.installer_sha256,
+                ))
+            obs["weka"] = weka_fingerprint()
+        ifnames = [n["ifname"] for n in obs.get("nics", [])] or None
+        env_paths = write_and_start(
+            sd, args, filesystems, obs["mode"], obs["mgmt_ip"], ifnames, obs.get("cores"),
+            obs.get("backends"), obs.get("ena_express", False), obs.get("nics"), obs.get("reused_client", False),
+            check=False, assets=assets,
+        )
+        obs["files"] = {**obs.get("files", {}), **managed_files(args, env_paths, obs["mode"])}
+        state.save(args.state_file)
+        return
+
+    topo: Optional[CpuTopology] = None
+    nic_count = 0
+    if core_spec:
+        topo = CpuTopology()
+        nic_count = len(core_spec.cores) or core_spec.count or len(topo.nodes)
+        if not core_spec.auto:
+            topo.check_cores(core_spec.cores)
+
+    # a running DPDK client container serves further mounts; new NICs/cores only with --scale-up
+    reuse: Optional[Tuple[List[Dict], List[str], List[str], bool]] = None
+    prior = state or MounterState.load(args.state_file)
+    if mode == "dpdk" and not args.scale_up:
+        with SPANS.span("client.detect") as sp:
+            client = running_client_container()
+            sp["found"] = bool(client)
+        if client:
+            reuse = reuse_client(client, prior, core_spec)
 
     imds = EC2MetadataClient()
-    mgmt_ip = imds.get("local-ipv4").strip()  # IMDS local-ipv4
+    with SPANS.span("imds"):
+        mgmt_ip = imds.snapshot().private_ip  # primary private IP (IMDS local-ipv4)
 
-    if args.dry_run:
-        log.info("DRY RUN: filesystem=%s mode=%s mount=%s mgmt_ip=%s", fs_instance, mode, args.mount_point, mgmt_ip)
-        if mode == "dpdk":
-            log.info("DRY RUN: would create+attach %d ENIs (1 per core)", len(args.cores))
-        log.info("DRY RUN: would write env and enable weka-mount@%s.service", fs_instance)
+    if args.refresh_catalog:
+        region = imds.snapshot().region
+        n = InstanceCatalog(args.instance_catalog).refresh_from_api(EC2_LAYER.client(region))
+        log.info("Wrote %d instance types to %s", n, args.instance_catalog)
         return
 
-    ensure_weka_installed(args.alb_dns_name, args.weka_min_version)
+    backends: List[str] = []
+    install_host = args.alb_dns_name
+    if args.backends or args.discover_backends:
+        candidates = list(args.backends or [])
+        if args.discover_backends:
+            candidates += [h for h in discover_backends(imds.snapshot().region, args.alb_dns_name) if valid_host(h)]
+        with SPANS.span("backends.probe", candidates=len(candidates) + 1):
+            backends = rank_backends(list(dict.fromkeys(candidates + [args.alb_dns_name])))
+        install_host = backends[0]
+        log.info("Backend order: %s (installing from %s)", " ".join(backends), install_host)
 
-    dpdk_ifnames: Optional[List[str]] = None
-    if mode == "dpdk":
-        cores = args.cores or []
-        eni = EC2NetworkInterfaceManager(imds)
-        created = eni.create_enis(len(cores), args.security_groups)
-        eni.attach_enis(created)
-
-        dpdk_ifnames = resolve_eni_ifnames(imds, created)
-        if len(dpdk_ifnames) != len(cores):
-            raise RuntimeError(
-                f"DPDK requires 1 NIC per core: cores={len(cores)} nics={len(dpdk_ifnames)} ({dpdk_ifnames})"
+    if args.dry_run:
+        for fs in filesystems:
+            log.info(
+                "DRY RUN: filesystem=%s mode=%s mount=%s profile=%s options=%s mgmt_ip=%s",
+                fs.instance, mode, fs.mount_point, fs.profile or args.mount_profile or "-",
+                ",".join((args.mount_option or []) + fs.mount_options) or "-", mgmt_ip,
+            )
+        if args.async_mount:
+            log.info("DRY RUN: would queue the mounts (Type=notify) and hold slurmd until they are ready")
+        if args.ena_express:
+            log.info("DRY RUN: would enable ENA Express on the %s", "DPDK ENIs" if mode == "dpdk" else "primary ENI")
+        if reuse:
+            log.info("DRY RUN: would mount through the running client (nets=%s cores=%s)", reuse[1], reuse[2])
+        elif mode == "dpdk":
+            log.info(
+                "DRY RUN: would create+attach %d ENIs (1 per core, cores=%s)",
+                nic_count,
+                "auto (NUMA-local)" if core_spec.auto else ",".join(core_spec.cores),
+            )
+            EC2NetworkInterfaceManager(imds, InstanceCatalog(args.instance_catalog)).plan_slots(nic_count)
+        log.info(
+            "DRY RUN: would write env and enable %s",
+            " ".join(f"weka-mount@{fs.instance}.service" for fs in filesystems),
+        )
+        return
+
+    if prior:
+        sd.managed_mounts = {(sanitize_instance_name(n), mp) for n, mp, _ in prior.desired.get("filesystems", [])}
+    for fs in filesystems:
+        sd.check_mount_point(fs.instance, fs.mount_point)
+
+    # the client install and the ENI work do not depend on each other until write_env
+    graph = PhaseGraph()
+
+    def install() -> Tuple[int, int, int]:
+        with SPANS.span("install", host=install_host):
+            return ensure_weka_installed(
+                install_host,
+                args.weka_min_version,
+                (args.installer_cache or []) + INSTALLER_CACHE_DIRS,
+                args.weka_version,
+                args.installer_sha256,
+                cancel=graph.cancel,
             )
 
-    sd = SystemdManager()
-    sd.ensure_base()
-
-    env_path = sd.write_env(
-        fs_instance=fs_instance,
-        alb_host=args.alb_dns_name,
-        fs_name=fs_instance,
-        mount_point=args.mount_point,
-        mode=mode,
-        mgmt_ip=mgmt_ip,
-        dpdk_nets=dpdk_ifnames,
-        cores=args.cores,
+    def enable_udp_ena_express() -> bool:
+        eni = EC2NetworkInterfaceManager(imds, InstanceCatalog(args.instance_catalog), ena_express=True)
+        if not eni.ena_express:
+            return False
+        primary = imds.snapshot().primary_interface()["interface-id"]
+        with SPANS.span("ena_express", enis=1):
+            eni.enable_ena_express([primary])
+            return eni.verify_ena_express([primary])
+
+    def dpdk() -> Tuple[EC2NetworkInterfaceManager, Tuple[List[Dict], List[str], List[str], bool]]:
+        with SPANS.span("dpdk", nics=nic_count):
+            eni = EC2NetworkInterfaceManager(imds, InstanceCatalog(args.instance_catalog), ena_express=args.ena_express)
+            eni.cancel = graph.cancel
+            return eni, provision_dpdk(eni, args, topo, core_spec, nic_count)
+
+    graph.add("install", install)
+    if mode == "dpdk" and not reuse:
+        graph.add("dpdk", dpdk, undo=lambda r: r[0].rollback())
+    elif args.ena_express:
+        graph.add("ena_express", enable_udp_ena_express)
+    results = graph.run()
+
+    weka_version = results["install"]
+    nics: List[Dict] = []
+    dpdk_ifnames: Optional[List[str]] = None
+    cores: Optional[List[str]] = None
+    ena_express = bool(results.get("ena_express", False))
+    if reuse:
+        nics, dpdk_ifnames, cores, ena_express = reuse
+    elif mode == "dpdk":
+        nics, dpdk_ifnames, cores, ena_express = results["dpdk"][1]
+
+    env_paths = write_and_start(
+        sd, args, filesystems, mode, mgmt_ip, dpdk_ifnames, cores, backends, ena_express, nics, bool(reuse),
+        assets=assets,
     )
-    unit = sd.enable_now(fs_instance)
-    log.info("Done. unit=%s env=%s", unit, env_path)
+
+    files = managed_files(args, env_paths, mode)
+    if reuse and prior:
+        # the client also serves the earlier runs' filesystems: add ours to them
+        ours = {fs.instance for fs in filesystems}
+        desired["filesystems"] = [
+            fs for fs in prior.desired.get("filesystems", []) if sanitize_instance_name(fs[0]) not in ours
+        ] + desired["filesystems"]
+        files = {**prior.observed.get("files", {}), **files}
+
+    MounterState(desired, {
+        "mode": mode,
+        "mgmt_ip": mgmt_ip,
+        "nics": nics,
+        "cores": cores,
+        "backends": backends,
+        "install_host": install_host,
+        "ena_express": ena_express,
+        "reused_client": bool(reuse),
+        "weka_version": list(weka_version),
+        "weka": weka_fingerprint(),
+        "files": files,
+    }).save(args.state_file)
 
 
 if __name__ == "__main__":
     try:
-        main()
+        with SPANS.span("main"):
+            main()
     except Exception as e:
         log.error("Fatal: %s", e)
         sys.exit(1)
+    finally:
+        EC2_LAYER.log_summary()
+        SPANS.finish()
 
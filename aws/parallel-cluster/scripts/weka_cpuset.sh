@@ -0,0 +1 @@
+../../sagemaker-hyperpod/LifecycleScripts/weka_cpuset.sh
\ No newline at end of file
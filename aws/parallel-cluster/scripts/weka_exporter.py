@@ -0,0 +1 @@
+../../sagemaker-hyperpod/LifecycleScripts/weka_exporter.py
\ No newline at end of file
@@ -30,6 +30,14 @@ class Config:
     # Set true to build and configure WEKA file system
     enable_weka = True
 
+    # Set true to install the WEKA client metrics exporter (node_exporter textfile collector).
+    # With enable_observability, the EFA Node Exporter serves the metrics on port 9100.
+    enable_weka_exporter = True
+
+    # Set true to reserve the WEKA DPDK cores for the WEKA client with cgroup v2 cpusets
+    # (everything else, Slurm jobs included, is kept off them) and verify it every 5 minutes.
+    enable_weka_cpuset_isolation = False
+
 # Configuration parameters for ActiveDirectory/LDAP/SSSD
 class SssdConfig:
 
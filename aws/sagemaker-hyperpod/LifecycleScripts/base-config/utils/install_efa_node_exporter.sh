@@ -12,6 +12,9 @@ else
     docker rm -f $CONTAINER_NAME && echo "Container $CONTAINER_NAME has been removed."
     echo "Proceeding with script..."
     
+    # Textfile collector directory, e.g. for the WEKA client metrics exporter
+    sudo mkdir -p /var/lib/node_exporter/textfile_collector
+
     # Run the Docker container with appropriate configurations
     sudo docker run -d --restart always \
     --name=$CONTAINER_NAME \
@@ -19,5 +22,6 @@ else
     --pid="host" \
     -v "/:/host:ro,rslave" \
     public.ecr.aws/hpc-cloud/efa-node-exporter:latest \
-    --path.rootfs=/host && { echo "Successfully started EFA Node Exporter on node"; exit 0; } || { echo "Failed to run Docker container"; exit 1; }
+    --path.rootfs=/host \
+    --collector.textfile.directory=/host/var/lib/node_exporter/textfile_collector && { echo "Successfully started EFA Node Exporter on node"; exit 0; } || { echo "Failed to run Docker container"; exit 1; }
 fi
\ No newline at end of file
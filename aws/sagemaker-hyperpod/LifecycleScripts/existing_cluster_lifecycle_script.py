@@ -14,7 +14,7 @@ import shutil
 from config import Config
 
 
-from weka.utils import get_ips_to_core_ids_map, get_nics
+from weka.utils import SPANS, get_ips_to_core_ids_map, get_nics
 
 SLURM_CONF = os.getenv("SLURM_CONF", "/opt/slurm/etc/slurm.conf")
 
@@ -30,8 +30,9 @@ class ExecuteBashScript:
 
     def run(self, *args):
         print(f"Execute script: {self.script_name} {' '.join([str(x) for x in args])}")
-        result = subprocess.run(["sudo", "bash", self.script_name, *args])
-        result.check_returncode()
+        with SPANS.span(self.script_name):
+            result = subprocess.run(["sudo", "bash", self.script_name, *args])
+            result.check_returncode()
         print(f"Script {self.script_name} executed successully")
 
 
@@ -152,7 +153,8 @@ def main(args):
     if params.workload_manager == "slurm":
         # Wait until slurm will be configured
         controllers = resource_config.get_list_of_addresses(params.controller_group)
-        wait_for_slurm_conf(controllers)
+        with SPANS.span("wait_for_slurm_conf"):
+            wait_for_slurm_conf(controllers)
 
         print("This is a slurm cluster. Do additional slurm setup")
         self_ip = get_ip_address()
@@ -180,7 +182,11 @@ def main(args):
         nics = get_nics(group["InstanceType"])
         cores = get_ips_to_core_ids_map()[instance["CustomerIpAddress"]]
         print(f"NICs: {nics}, Cores: {cores}")
+        if Config.enable_weka_cpuset_isolation:
+            ExecuteBashScript("./weka/install_weka_cpuset.sh").run(" ".join(cores))
         ExecuteBashScript("./weka/set_weka.sh").run(" ".join(nics), " ".join(cores))
+        if Config.enable_weka_exporter:
+            ExecuteBashScript("./weka/install_weka_exporter.sh").run(" ".join(nics), " ".join(cores))
 
     print("[INFO]: Success: WEKA setup scripts completed")
 
@@ -189,6 +195,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-rc", "--resource_config", help="Resource config JSON file containing Ip_address of head, login and compute nodes")
     parser.add_argument("-pp", "--provisioning_parameters", help="Provisioning Parameters containing the head, login and compute ID/names")
+    parser.add_argument("--timings", action="store_true", help="Print a per-step timing summary at exit")
     args=parser.parse_args()
 
-    main(args)
+    try:
+        with SPANS.span("main"):
+            main(args)
+    finally:
+        SPANS.finish(summary=args.timings)
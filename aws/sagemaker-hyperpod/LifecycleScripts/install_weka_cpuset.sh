@@ -0,0 +1,40 @@
+#!/bin/bash
+
+# Install WEKA core isolation (cgroup v2 cpusets, see weka_cpuset.sh). weka_mount.sh (set_weka.sh)
+# applies it once the WEKA agent is installed; weka-cpuset-verify.timer then re-checks it every
+# 5 minutes and logs any stray task found on the WEKA cores.
+# Usage: install_weka_cpuset.sh "<dpdk cores>"
+
+set -e
+
+if [ -z "$1" ]; then
+  echo "No WEKA cores for this instance type; nothing to isolate"
+  exit 0
+fi
+
+cp "$(dirname "$0")/weka_cpuset.sh" /usr/local/bin/weka_cpuset.sh
+chmod 755 /usr/local/bin/weka_cpuset.sh
+
+cat >/etc/systemd/system/weka-cpuset-verify.service <<EOL
+[Unit]
+Description=Verify that only WEKA runs on the WEKA client cores
+After=weka-agent.service
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/weka_cpuset.sh verify "$1"
+EOL
+
+cat >/etc/systemd/system/weka-cpuset-verify.timer <<EOL
+[Unit]
+Description=Periodic WEKA core isolation check
+
+[Timer]
+OnBootSec=5min
+OnUnitActiveSec=5min
+
+[Install]
+WantedBy=timers.target
+EOL
+systemctl daemon-reload
+systemctl enable --now weka-cpuset-verify.timer
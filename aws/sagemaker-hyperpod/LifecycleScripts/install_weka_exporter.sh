@@ -0,0 +1,32 @@
+#!/bin/bash
+
+# Install the WEKA client metrics exporter. It writes node_exporter textfile metrics to
+# $TEXTFILE_DIR, which the EFA node exporter reads (see utils/install_efa_node_exporter.sh).
+# Usage: install_weka_exporter.sh "<dpdk nics>" "<dpdk cores>"
+
+set -e
+
+TEXTFILE_DIR="/var/lib/node_exporter/textfile_collector"
+
+mkdir -p "$TEXTFILE_DIR" /usr/local/bin
+cp "$(dirname "$0")/weka_exporter.py" /usr/local/bin/weka_exporter.py
+chmod 755 /usr/local/bin/weka_exporter.py
+
+cat >/etc/systemd/system/weka_exporter.service <<EOL
+[Unit]
+Description=WEKA client metrics exporter (node_exporter textfile)
+After=weka_mount.service
+
+[Service]
+Type=simple
+ExecStart=/usr/bin/python3 /usr/local/bin/weka_exporter.py --textfile-dir $TEXTFILE_DIR --nics "$1" --cores "$2"
+Restart=always
+RestartSec=15
+Nice=10
+
+[Install]
+WantedBy=multi-user.target
+EOL
+systemctl daemon-reload
+systemctl enable weka_exporter.service
+systemctl restart weka_exporter.service
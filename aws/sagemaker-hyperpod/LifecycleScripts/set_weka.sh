@@ -26,6 +26,11 @@ while true;do
   chmod -R 755 /opt/weka/data/agent/tmpfss/cgroup
   sudo sed -i 's/isolate_cpusets=true/isolate_cpusets=false/g' /etc/wekaio/service.conf && systemctl restart weka-agent
 
+  # cgroup v2 core isolation instead of WEKA's isolate_cpusets (see install_weka_cpuset.sh)
+  if [ -x /usr/local/bin/weka_cpuset.sh ] && [ \${#CORES[@]} -gt 0 ]; then
+    /usr/local/bin/weka_cpuset.sh apply "\${CORES[*]}" || echo "WEKA core isolation failed"
+  fi
+
   FILESYSTEM_NAME='<place holder>'
   MOUNT_POINT="/mnt/weka" # replace with a different mount point at need
   mkdir -p "\$MOUNT_POINT"
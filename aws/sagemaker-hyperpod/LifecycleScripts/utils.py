@@ -1,5 +1,7 @@
 import json
 import os
+import time
+from contextlib import contextmanager
 
 INSTANCE_TYPE_TO_CORE_IDS = {
     "ml.p5.48xlarge": ['40', '41', '42', '43'],
@@ -37,3 +39,95 @@ def get_nics(instance_type):
                 break
 
     return nics
+
+
+class SpanRecorder:
+    """
+    Spans (name, start, end, duration, outcome, attributes) of the lifecycle steps, appended to a
+    JSON-lines file as they finish; finish() writes the per-step totals as node_exporter textfile
+    metrics. Records and metrics use the schema of the ParallelCluster weka-install.py SpanRecorder
+    (weka_boot.prom), so boot timings of both can be compared.
+    """
+
+    def __init__(self, path="/var/log/provision/boot-spans.jsonl",
+                 textfile_dir="/var/lib/node_exporter/textfile_collector"):
+        self.path = path
+        self.textfile_dir = textfile_dir
+        self.spans = []
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+
+    @staticmethod
+    def _uptime():
+        try:
+            with open("/proc/uptime") as f:
+                return float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        rec = {"run_id": self.run_id, "name": name, "start": time.time(), "uptime_s": self._uptime(), "attrs": attrs}
+        t0 = time.monotonic()
+        outcome = "ok"
+        try:
+            yield rec["attrs"]
+        except BaseException as e:
+            outcome = "error"
+            rec["error"] = str(e)[:200]
+            raise
+        finally:
+            rec.update(end=time.time(), duration_s=round(time.monotonic() - t0, 6), outcome=outcome)
+            self.spans.append(rec)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(rec, sort_keys=True) + "\n")
+            except OSError as e:
+                print(f"[WARN]: cannot write span to {self.path}: {e}")
+
+    def write_prometheus(self):
+        totals = {}
+        for rec in self.spans:
+            t = totals.setdefault((rec["name"], rec["outcome"]), [0.0, 0])
+            t[0] += rec["duration_s"]
+            t[1] += 1
+        lines = [
+            "# HELP weka_boot_phase_duration_seconds Time spent in each provisioning phase during the last run",
+            "# TYPE weka_boot_phase_duration_seconds gauge",
+        ]
+        lines += [
+            f'weka_boot_phase_duration_seconds{{phase="{n}",outcome="{o}"}} {t[0]!r}'
+            for (n, o), t in sorted(totals.items())
+        ]
+        lines += [
+            "# HELP weka_boot_phase_count Spans recorded for each phase during the last run",
+            "# TYPE weka_boot_phase_count gauge",
+        ]
+        lines += [f'weka_boot_phase_count{{phase="{n}",outcome="{o}"}} {t[1]}' for (n, o), t in sorted(totals.items())]
+        uptime = self._uptime()
+        if uptime is not None:
+            lines += [
+                "# HELP weka_boot_uptime_at_finish_seconds System uptime when the last run finished (boot-to-mount)",
+                "# TYPE weka_boot_uptime_at_finish_seconds gauge",
+                f"weka_boot_uptime_at_finish_seconds {uptime!r}",
+            ]
+        os.makedirs(self.textfile_dir, exist_ok=True)
+        path = os.path.join(self.textfile_dir, "weka_boot.prom")
+        with open(path + ".tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def finish(self, summary=False):
+        if not self.spans:
+            return
+        try:
+            self.write_prometheus()
+        except OSError as e:
+            print(f"[WARN]: cannot write boot timings to {self.textfile_dir}: {e}")
+        if summary:
+            print("[INFO]: Timings: phase duration_ms outcome")
+            for rec in sorted(self.spans, key=lambda r: r["start"]):
+                print(f"  {rec['name']} {rec['duration_s'] * 1000:.0f} {rec['outcome']}")
+
+
+SPANS = SpanRecorder()
@@ -0,0 +1,208 @@
+#!/bin/bash
+# Fence the WEKA client cores off from everything except the WEKA client (cgroup v2 cpusets).
+#
+# Usage: weka_cpuset.sh apply|verify|remove ["<cores>"]   (space- or comma-separated CPU ids)
+#
+# apply:  weka-agent.service, and with it the client containers it starts, runs in weka.slice,
+#         which keeps every CPU. system.slice (including Slurm's slurmstepd.scope), user.slice,
+#         machine.slice and init.scope get only the other CPUs (persistent AllowedCPUs=), so the
+#         WEKA cores belong to weka.slice alone. Slurm must not allocate the WEKA cores either
+#         (CpuSpecList); WEKA's own isolate_cpusets stays off so it does not fight over cpusets.
+# verify: checks the effective cpusets and reports every user-space task outside weka.slice that
+#         may run, or is running, on a WEKA core; exits 1 if isolation is broken.
+# remove: undoes apply.
+# apply and verify write $TEXTFILE_DIR/weka_cpuset.prom when that directory exists.
+
+set -uo pipefail
+
+SLICE="weka.slice"
+FENCED=(system.slice user.slice machine.slice init.scope)
+AGENT="weka-agent.service"
+AGENT_DROPIN="/etc/systemd/system/$AGENT.d/50-weka-slice.conf"
+STATUS="/run/weka/cpuset.status"
+TEXTFILE_DIR="${TEXTFILE_DIR:-/var/lib/node_exporter/textfile_collector}"
+CGROOT="/sys/fs/cgroup"
+
+log() {
+  logger -t weka_cpuset "$1"
+  echo "$1" >&2
+}
+
+action="${1:-}"
+cores="${2:-}"
+if [ -z "$action" ] || { [ -z "$cores" ] && [ "$action" != "remove" ]; }; then
+  echo "Usage: $0 apply|verify|remove <cores>" >&2
+  exit 2
+fi
+
+expand_cpus() {
+  local part
+  for part in ${1//,/ }; do
+    if [[ "$part" == *-* ]]; then seq "${part%-*}" "${part#*-}"; else echo "$part"; fi
+  done
+}
+
+declare -A weka=()
+for c in $(expand_cpus "${cores// /,}"); do weka[$c]=1; done
+weka_list="$(expand_cpus "${cores// /,}" | paste -sd, -)"
+online=($(expand_cpus "$(cat /sys/devices/system/cpu/online)"))
+housekeeping=()
+for c in "${online[@]}"; do
+  if [ -z "${weka[$c]:-}" ]; then housekeeping+=("$c"); fi
+done
+
+on_weka_cores() {
+  local c
+  for c in $(expand_cpus "$1"); do
+    if [ -n "${weka[$c]:-}" ]; then return 0; fi
+  done
+  return 1
+}
+
+agent_cgroup() {
+  systemctl show -p ControlGroup --value "$AGENT" 2>/dev/null
+}
+
+write_prom() {
+  # write_prom <isolated 0|1> <stray tasks>
+  [ -d "$TEXTFILE_DIR" ] || return 0
+  local tmp="$TEXTFILE_DIR/weka_cpuset.prom.$$"
+  cat > "$tmp" <<EOF
+# HELP weka_cpuset_isolated 1 if the WEKA cores are fenced off from everything outside $SLICE
+# TYPE weka_cpuset_isolated gauge
+weka_cpuset_isolated $1
+# HELP weka_cpuset_stray_tasks User-space tasks outside $SLICE allowed on or running on a WEKA core
+# TYPE weka_cpuset_stray_tasks gauge
+weka_cpuset_stray_tasks $2
+# HELP weka_cpuset_verify_timestamp_seconds Time of the last verification
+# TYPE weka_cpuset_verify_timestamp_seconds gauge
+weka_cpuset_verify_timestamp_seconds $(date +%s)
+EOF
+  chmod 644 "$tmp"
+  mv -f "$tmp" "$TEXTFILE_DIR/weka_cpuset.prom"
+}
+
+stray_candidates() {
+  # "<pid> <comm> <detail>" for every user-space task allowed on, or running on, a WEKA core
+  local awk_cpus='
+    function has(list,   n, parts, i, r, c) {
+      n = split(list, parts, ",")
+      for (i = 1; i <= n; i++) {
+        if (split(parts[i], r, "-") == 2) {
+          for (c = r[1] + 0; c <= r[2] + 0; c++) if (c in W) return 1
+        } else if ((parts[i] + 0) in W) return 1
+      }
+      return 0
+    }
+    BEGIN { n = split(weka, w, ","); for (i = 1; i <= n; i++) W[w[i] + 0] = 1 }'
+  # kernel threads (children of kthreadd) are not in any cpuset
+  printf '%s\n' /proc/[0-9]*/status | xargs awk -v weka="$weka_list" "$awk_cpus"'
+    FNR == 1 { pid = ""; ppid = ""; name = "" }
+    $1 == "Name:" { name = $2 }
+    $1 == "Pid:" { pid = $2 }
+    $1 == "PPid:" { ppid = $2 }
+    $1 == "Cpus_allowed_list:" && pid != 2 && ppid != 2 && has($2) { print pid, name, "allowed=" $2 }
+  ' 2>/dev/null
+  # runnable threads whose current CPU is a WEKA core; flag 0x00200000 is PF_KTHREAD
+  printf '%s\n' /proc/[0-9]*/task/[0-9]*/stat | xargs awk -v weka="$weka_list" "$awk_cpus"'
+    {
+      rest = $0; sub(/^.*\) /, "", rest); split(rest, f, " ")
+      comm = $0; sub(/^[^(]*\(/, "", comm); sub(/\) [^)]*$/, "", comm); gsub(/ /, "_", comm)
+      split(FILENAME, p, "/")
+      if (f[1] == "R" && int(f[7] / 2097152) % 2 == 0 && (f[37] + 0) in W) print p[3], comm, "running_on=" f[37]
+    }
+  ' 2>/dev/null
+}
+
+apply() {
+  local unit want
+  if [ "${#housekeeping[@]}" -eq 0 ]; then
+    log "No CPU left outside the WEKA cores $weka_list"
+    return 1
+  fi
+  systemctl set-property "$SLICE" AllowedCPUs="${online[*]}" || return 1
+  for unit in "${FENCED[@]}"; do
+    systemctl set-property "$unit" AllowedCPUs="${housekeeping[*]}" || log "Could not restrict $unit"
+  done
+  want="$(printf '[Service]\nSlice=%s' "$SLICE")"
+  if [ "$(cat "$AGENT_DROPIN" 2>/dev/null)" != "$want" ]; then
+    mkdir -p "$(dirname "$AGENT_DROPIN")"
+    echo "$want" > "$AGENT_DROPIN"
+    systemctl daemon-reload
+  fi
+  if systemctl is-active -q "$AGENT" && [[ "$(agent_cgroup)" != "/$SLICE/"* ]]; then
+    if grep -q " - wekafs " /proc/self/mountinfo; then
+      log "wekafs is mounted; $AGENT moves to $SLICE at its next restart"
+    else
+      systemctl restart "$AGENT"
+    fi
+  fi
+  log "WEKA cores $weka_list reserved for $SLICE; other slices limited to ${#housekeeping[@]} CPUs"
+}
+
+verify() {
+  local unit eff failed=0 pid name detail cg
+  declare -A strays=()
+  mkdir -p "$(dirname "$STATUS")"
+  : > "$STATUS"
+  for unit in "${FENCED[@]}"; do
+    [ -f "$CGROOT/$unit/cpuset.cpus.effective" ] || continue
+    eff="$(cat "$CGROOT/$unit/cpuset.cpus.effective")"
+    if on_weka_cores "$eff"; then
+      echo "fail $unit cpus $eff include WEKA cores $weka_list" >> "$STATUS"
+      failed=1
+    fi
+  done
+  if systemctl is-active -q "$AGENT" && [[ "$(agent_cgroup)" != "/$SLICE/"* ]]; then
+    echo "fail $AGENT runs in $(agent_cgroup), not $SLICE" >> "$STATUS"
+    failed=1
+  fi
+  while read -r pid name detail; do
+    cg="$(sed -n 's/^0:://p' "/proc/$pid/cgroup" 2>/dev/null)"
+    case "$cg" in
+      "" | "/$SLICE/"*) continue ;;
+    esac
+    strays[$pid]="${strays[$pid]:-$name $cg} $detail"
+  done < <(stray_candidates)
+  for pid in "${!strays[@]}"; do
+    echo "stray $pid ${strays[$pid]}" >> "$STATUS"
+  done
+  if [ "${#strays[@]}" -gt 0 ]; then failed=1; fi
+
+  if [ "$failed" = 1 ]; then
+    log "WEKA cores $weka_list are not isolated (${#strays[@]} stray tasks):"
+    while read -r line; do log "  $line"; done < "$STATUS"
+  else
+    echo "ok WEKA cores $weka_list used only by $SLICE" >> "$STATUS"
+  fi
+  write_prom "$((1 - failed))" "${#strays[@]}"
+  return "$failed"
+}
+
+remove() {
+  local unit
+  for unit in "$SLICE" "${FENCED[@]}"; do
+    systemctl set-property "$unit" AllowedCPUs= || true
+  done
+  if [ -f "$AGENT_DROPIN" ]; then
+    rm -f "$AGENT_DROPIN"
+    systemctl daemon-reload
+  fi
+  rm -f "$TEXTFILE_DIR/weka_cpuset.prom"
+  log "WEKA core isolation removed; $AGENT leaves $SLICE at its next restart"
+}
+
+if [ "$(stat -fc %T "$CGROOT")" != "cgroup2fs" ]; then
+  log "cgroup v2 (unified hierarchy) is required; $CGROOT is $(stat -fc %T "$CGROOT")"
+  exit 1
+fi
+
+case "$action" in
+  apply) apply ;;
+  verify) verify ;;
+  remove) remove ;;
+  *)
+    echo "Usage: $0 apply|verify|remove <cores>" >&2
+    exit 2
+    ;;
+esac
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+WEKA client metrics for the node_exporter textfile collector.
+
+Samples `weka local ps`/`weka local stats`, the wekafs mounts and the DPDK NICs and cores
+every --interval seconds and atomically rewrites <textfile-dir>/weka.prom.
+Only the Python standard library is used, so it runs with the system python3.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# `weka local stats` names -> (metric, help); values are per-second rates or averages
+STATS = {
+    "OPS": ("weka_client_ops_per_second", "Operations per second"),
+    "READS": ("weka_client_reads_per_second", "Read operations per second"),
+    "WRITES": ("weka_client_writes_per_second", "Write operations per second"),
+    "READ_BYTES": ("weka_client_read_bytes_per_second", "Read throughput in bytes per second"),
+    "WRITE_BYTES": ("weka_client_write_bytes_per_second", "Write throughput in bytes per second"),
+    "READ_LATENCY": ("weka_client_read_latency_microseconds", "Average read latency"),
+    "WRITE_LATENCY": ("weka_client_write_latency_microseconds", "Average write latency"),
+}
+
+
+def run_json(cmd: List[str], timeout_s: float) -> Optional[object]:
+    try:
+        cp = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout_s)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if cp.returncode != 0:
+        return None
+    try:
+        return json.loads(cp.stdout)
+    except ValueError:
+        return None
+
+
+def label_value(v: object) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def read_env(path: str) -> Dict[str, str]:
+    env: Dict[str, str] = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                m = re.match(r'^([A-Z_]+)="?(.*?)"?$', line.strip())
+                if m:
+                    env[m.group(1)] = m.group(2)
+    except OSError:
+        pass
+    return env
+
+
+def wekafs_mounts() -> Dict[str, str]:
+    """mount point -> source for every mounted wekafs filesystem."""
+    mounts: Dict[str, str] = {}
+    with open("/proc/self/mountinfo", "r") as f:
+        for line in f:
+            pre, _, post = line.partition(" - ")
+            fields = post.split()
+            if len(fields) >= 2 and fields[0] == "wekafs":
+                mounts[pre.split()[4].replace("\\040", " ")] = fields[1]
+    return mounts
+
+
+def cpu_times() -> Dict[str, Tuple[int, int]]:
+    """cpu id -> (busy, total) jiffies from /proc/stat."""
+    times: Dict[str, Tuple[int, int]] = {}
+    with open("/proc/stat", "r") as f:
+        for line in f:
+            if line.startswith("cpu") and line[3].isdigit():
+                parts = line.split()
+                vals = [int(x) for x in parts[1:]]
+                idle = vals[3] + (vals[4] if len(vals) > 4 else 0)
+                times[parts[0][3:]] = (sum(vals) - idle, sum(vals))
+    return times
+
+
+def walk_stats(node: object, out: Dict[str, float]) -> None:
+    """Collect known stat names from `weka local stats -J`, whatever its nesting."""
+    if isinstance(node, list):
+        for item in node:
+            walk_stats(item, out)
+    elif isinstance(node, dict):
+        name = str(node.get("stat") or node.get("name") or "").upper()
+        if name in STATS and isinstance(node.get("value"), (int, float)):
+            out[name] = out.get(name, 0.0) + float(node["value"])
+        for k, v in node.items():
+            if str(k).upper() in STATS and isinstance(v, (int, float)):
+                out[str(k).upper()] = out.get(str(k).upper(), 0.0) + float(v)
+            elif isinstance(v, (list, dict)):
+                walk_stats(v, out)
+
+
+class Collector:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.first_seen: Dict[str, float] = {}
+        self.prev_cpu: Dict[str, Tuple[int, int]] = {}
+
+    def _mount_specs(self) -> List[Dict[str, str]]:
+        """Filesystems managed by weka-mount@ (env files) plus the --nics/--cores given on the command line."""
+        specs: List[Dict[str, str]] = []
+        if os.path.isdir(self.args.env_dir):
+            for name in sorted(os.listdir(self.args.env_dir)):
+                if name.endswith(".conf"):
+                    env = read_env(os.path.join(self.args.env_dir, name))
+                    env["FS_INSTANCE"] = name[:-5]
+                    specs.append(env)
+        if self.args.nics or self.args.cores:
+            specs.append({"FS_INSTANCE": "", "DPDK_NETS": self.args.nics, "CORES": self.args.cores})
+        return specs
+
+    def collect(self) -> List[str]:
+        t0 = time.monotonic()
+        out: List[str] = []
+
+        def metric(name: str, help_: str, samples: List[Tuple[Dict[str, object], float]]) -> None:
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lbl = ",".join(f'{k}="{label_value(v)}"' for k, v in labels.items())
+                out.append(f"{name}{{{lbl}}} {float(value)!r}" if lbl else f"{name} {float(value)!r}")
+
+        now = time.time()
+        specs = self._mount_specs()
+        mounted = wekafs_mounts()
+
+        # mounts: the managed ones even when down, plus any other wekafs mount
+        mount_points = {s["MOUNT_POINT"]: s for s in specs if s.get("MOUNT_POINT")}
+        for mp in mounted:
+            mount_points.setdefault(mp, {})
+        up, uptime, info = [], [], []
+        for mp, spec in sorted(mount_points.items()):
+            is_up = mp in mounted
+            up.append(({"mount_point": mp}, 1.0 if is_up else 0.0))
+            if not is_up:
+                self.first_seen.pop(mp, None)
+                continue
+            # weka_mount.sh records the winning backend at mount time, so its mtime is the mount time
+            since = None
+            if spec.get("FS_INSTANCE"):
+                try:
+                    since = os.stat(f"/run/weka/mount.d/{spec['FS_INSTANCE']}.backend").st_mtime
+                except OSError:
+                    pass
+            since = since or self.first_seen.setdefault(mp, now)
+            uptime.append(({"mount_point": mp}, max(0.0, now - since)))
+            info.append(({
+                "mount_point": mp,
+                "source": mounted[mp],
+                "filesystem": spec.get("FS_NAME", ""),
+                "mode": spec.get("MODE", ""),
+                "profile": spec.get("PROFILE", ""),
+                "ena_express": spec.get("ENA_EXPRESS", ""),
+            }, 1.0))
+        metric("weka_mount_up", "1 if the filesystem is mounted", up)
+        metric("weka_mount_uptime_seconds", "Seconds since the filesystem was mounted", uptime)
+        metric("weka_mount_info", "Mounted wekafs filesystems", info)
+
+        # client containers
+        ps = run_json(["weka", "local", "ps", "-J"], self.args.timeout)
+        containers = []
+        for c in ps if isinstance(ps, list) else []:
+            if not isinstance(c, dict):
+                continue
+            name = c.get("name") or c.get("container") or "?"
+            state = str(c.get("state") or c.get("runStatus") or c.get("status") or "").lower()
+            containers.append(({"container": name, "state": state}, 1.0 if state in ("running", "ready") else 0.0))
+        metric("weka_container_up", "1 if the WEKA client container is running", containers)
+
+        # client I/O; WEKA reports these per client container, which all mounts on the node share
+        stats: Dict[str, float] = {}
+        raw = run_json(["weka", "local", "stats", "-J"], self.args.timeout)
+        if raw is not None:
+            walk_stats(raw, stats)
+        metric("weka_client_stats_up", "1 if `weka local stats` returned data", [({}, 1.0 if stats else 0.0)])
+        for key, value in sorted(stats.items()):
+            metric(STATS[key][0], STATS[key][1], [({}, value)])
+
+        # DPDK NICs: a NIC handed to DPDK is no longer a kernel netdev
+        nics, cores = [], []
+        for spec in specs:
+            fs = spec.get("FS_INSTANCE", "")
+            nets = spec.get("DPDK_NETS", "")
+            # weka_mount.sh records the names it resolved from the ENI MACs at mount time
+            if fs:
+                try:
+                    with open(f"/run/weka/mount.d/{fs}.nets", "r") as f:
+                        nets = f.read().strip() or nets
+                except OSError:
+                    pass
+            for nic in nets.split():
+                try:
+                    with open(f"/sys/class/net/{nic}/operstate", "r") as f:
+                        state = f.read().strip()
+                except OSError:
+                    state = "dpdk"
+                nics.append(({"filesystem": fs, "nic": nic, "state": state}, 1.0))
+            cores.extend((fs, c) for c in spec.get("CORES", "").split())
+        metric("weka_dpdk_nic_info", "DPDK NICs used by WEKA mounts and their kernel state", nics)
+
+        # DPDK cores poll continuously, so a busy ratio well below 1 means the frontend is not running there
+        cpu = cpu_times()
+        busy = []
+        for fs, core in sorted(set(cores)):
+            prev, cur = self.prev_cpu.get(core), cpu.get(core)
+            if prev and cur and cur[1] > prev[1]:
+                busy.append(({"filesystem": fs, "core": core}, (cur[0] - prev[0]) / (cur[1] - prev[1])))
+        self.prev_cpu = cpu
+        metric("weka_dpdk_core_busy_ratio", "Busy fraction of each WEKA DPDK core since the last sample", busy)
+
+        metric("weka_exporter_last_run_timestamp_seconds", "Time of the last collection", [({}, now)])
+        metric("weka_exporter_duration_seconds", "Duration of the last collection", [({}, time.monotonic() - t0)])
+        return out
+
+    def write(self, lines: List[str]) -> None:
+        os.makedirs(self.args.textfile_dir, exist_ok=True)
+        path = os.path.join(self.args.textfile_dir, "weka.prom")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Write WEKA client metrics for the node_exporter textfile collector.")
+    p.add_argument("--textfile-dir", default="/var/lib/node_exporter/textfile_collector")
+    p.add_argument("--interval", type=float, default=15.0, help="Seconds between samples")
+    p.add_argument("--timeout", type=float, default=10.0, help="Timeout for each weka command")
+    p.add_argument("--env-dir", default="/etc/weka/mount.d", help="weka-mount@ env files (ParallelCluster)")
+    p.add_argument("--nics", default="", help="Space-separated DPDK NICs, when there are no env files")
+    p.add_argument("--cores", default="", help="Space-separated DPDK cores, when there are no env files")
+    p.add_argument("--once", action="store_true", help="Collect once and exit")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    collector = Collector(args)
+    while True:
+        started = time.monotonic()
+        try:
+            collector.write(collector.collect())
+        except Exception as e:
+            print(f"weka_exporter: collection failed: {e}", file=sys.stderr)
+        if args.once:
+            return
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -58,7 +58,7 @@ EOL
 if [[ "$ENABLE_WEKA" == "true" ]]; then
   cp lifecycle_script.py base-config
   mkdir -p base-config/weka
-  cp set_weka.sh weka_slurm.py utils.py update_slurm_conf.sh base-config/weka
+  cp set_weka.sh weka_slurm.py utils.py update_slurm_conf.sh weka_exporter.py install_weka_exporter.sh weka_cpuset.sh install_weka_cpuset.sh base-config/weka
   if [[ "$OSTYPE" == "darwin"* ]]; then
     sed -i '' "s/backend_ip=.*/backend_ip=$BACKEND_IP/" base-config/weka/set_weka.sh
     sed -i '' "s/FILESYSTEM_NAME=.*/FILESYSTEM_NAME=$FILESYSTEM_NAME/" base-config/weka/set_weka.sh
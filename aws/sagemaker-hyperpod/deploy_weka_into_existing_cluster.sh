@@ -29,7 +29,7 @@ cd LifecycleScripts
 mkdir -p existing-cluster-base-config
 cp existing_cluster_lifecycle_script.py base-config/config.py existing-cluster-base-config
 mkdir -p existing-cluster-base-config/weka
-cp set_weka.sh weka_slurm.py utils.py update_slurm_conf.sh existing-cluster-base-config/weka
+cp set_weka.sh weka_slurm.py utils.py update_slurm_conf.sh weka_exporter.py install_weka_exporter.sh weka_cpuset.sh install_weka_cpuset.sh existing-cluster-base-config/weka
 if [[ "$OSTYPE" == "darwin"* ]]; then
   sed -i '' "s/backend_ip=.*/backend_ip=$BACKEND_IP/" existing-cluster-base-config/weka/set_weka.sh
   sed -i '' "s/FILESYSTEM_NAME=.*/FILESYSTEM_NAME=$FILESYSTEM_NAME/" existing-cluster-base-config/weka/set_weka.sh